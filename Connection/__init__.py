@@ -1,3 +1,3 @@
-from .connection import get_supabase_client, SUPABASE_URL, SUPABASE_ANON_KEY, SUPABASE_SERVICE_ROLE_KEY
+from .connection import get_supabase_client, get_service_client, manager, SUPABASE_URL, SUPABASE_ANON_KEY, SUPABASE_SERVICE_ROLE_KEY
 
-__all__ = ['get_supabase_client', 'SUPABASE_URL', 'SUPABASE_ANON_KEY', 'SUPABASE_SERVICE_ROLE_KEY']
+__all__ = ['get_supabase_client', 'get_service_client', 'manager', 'SUPABASE_URL', 'SUPABASE_ANON_KEY', 'SUPABASE_SERVICE_ROLE_KEY']
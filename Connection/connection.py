@@ -1,6 +1,8 @@
-from supabase import create_client, Client
+from supabase import AsyncClient, AsyncClientOptions
 from dotenv import load_dotenv
+import httpx
 import os
+import threading
 
 load_dotenv()
 
@@ -10,26 +12,115 @@ SUPABASE_SERVICE_ROLE_KEY = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
 
 SUPABASE_KEY = SUPABASE_SERVICE_ROLE_KEY or SUPABASE_ANON_KEY
 
-# Create Supabase client
-supabase: Client = None
-if SUPABASE_KEY:
-    try:
-        supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
-        print("Supabase client initialized successfully")
-    except Exception as e:
-        print(f"Failed to create Supabase client: {e}")
-        print("Please check your SUPABASE_ANON_KEY in .env file")
-        print("Get it from: Supabase Dashboard > Settings > API > Project API keys")
-else:
+# Cấu hình HTTP connection pool dùng chung cho mọi request tới Supabase
+SUPABASE_HTTP2 = os.getenv("SUPABASE_HTTP2", "true").lower() == "true"
+SUPABASE_MAX_CONNECTIONS = int(os.getenv("SUPABASE_MAX_CONNECTIONS", "100"))
+SUPABASE_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("SUPABASE_MAX_KEEPALIVE_CONNECTIONS", "20"))
+SUPABASE_KEEPALIVE_EXPIRY = float(os.getenv("SUPABASE_KEEPALIVE_EXPIRY", "60"))
+SUPABASE_TIMEOUT = float(os.getenv("SUPABASE_TIMEOUT", "30"))
+
+
+class SupabaseConnectionManager:
+    """Giữ các Supabase async client sống lâu dài cho cả process thay vì tạo mới mỗi request
+
+    - service client: dùng service_role key cho đọc/ghi dữ liệu (bypass RLS)
+    - auth client: dùng cho login/register/get_user, tách riêng vì sign in
+      sẽ gắn session của user vào client
+    """
+
+    def __init__(self, url: str, service_role_key: str = None, auth_key: str = None):
+        self.url = url
+        self.service_role_key = service_role_key
+        self.auth_key = auth_key
+        self._service_client: AsyncClient = None
+        self._auth_client: AsyncClient = None
+        self._http_clients = []
+        self._lock = threading.Lock()
+
+    def _create_http_client(self) -> httpx.AsyncClient:
+        return httpx.AsyncClient(
+            http2=SUPABASE_HTTP2,
+            limits=httpx.Limits(
+                max_connections=SUPABASE_MAX_CONNECTIONS,
+                max_keepalive_connections=SUPABASE_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=SUPABASE_KEEPALIVE_EXPIRY,
+            ),
+            timeout=httpx.Timeout(SUPABASE_TIMEOUT),
+            follow_redirects=True,
+        )
+
+    def _create_client(self, key: str) -> AsyncClient:
+        http_client = self._create_http_client()
+        options = AsyncClientOptions(
+            httpx_client=http_client,
+            auto_refresh_token=False,
+            persist_session=False,
+        )
+        # Khởi tạo trực tiếp (không qua acreate_client) vì server không cần đọc session
+        client = AsyncClient(self.url, key, options=options)
+        self._http_clients.append(http_client)
+        return client
+
+    @property
+    def service_client(self) -> AsyncClient:
+        if self._service_client is None:
+            with self._lock:
+                if self._service_client is None:
+                    self._service_client = self._create_client(self.service_role_key)
+        return self._service_client
+
+    @property
+    def auth_client(self) -> AsyncClient:
+        if self._auth_client is None:
+            with self._lock:
+                if self._auth_client is None:
+                    self._auth_client = self._create_client(self.auth_key)
+        return self._auth_client
+
+    def start(self):
+        """Khởi tạo sẵn các client (gọi từ lifespan của FastAPI)"""
+        try:
+            if self.auth_key:
+                self.auth_client
+            if self.service_role_key:
+                self.service_client
+            print("Supabase client initialized successfully")
+        except Exception as e:
+            print(f"Failed to create Supabase client: {e}")
+            print("Please check your SUPABASE_ANON_KEY in .env file")
+            print("Get it from: Supabase Dashboard > Settings > API > Project API keys")
+
+    async def close(self):
+        """Đóng connection pool (gọi khi app shutdown)"""
+        with self._lock:
+            http_clients = self._http_clients
+            self._http_clients = []
+            self._service_client = None
+            self._auth_client = None
+        for http_client in http_clients:
+            await http_client.aclose()
+
+
+manager = SupabaseConnectionManager(SUPABASE_URL, SUPABASE_SERVICE_ROLE_KEY, SUPABASE_KEY)
+
+if not SUPABASE_KEY:
     print("SUPABASE_ANON_KEY not found in .env file")
     print("Please add it from: Supabase Dashboard > Settings > API")
 
-def get_supabase_client():
-    if supabase is None:
+
+def get_supabase_client() -> AsyncClient:
+    """Client dùng cho Supabase Auth (login, register, verify token)"""
+    if not SUPABASE_KEY:
         raise Exception(
             "Supabase client is not initialized.\n"
             "Please add SUPABASE_ANON_KEY to your .env file.\n"
             "Get it from: Supabase Dashboard > Settings > API > Project API keys"
         )
-    return supabase
+    return manager.auth_client
+
 
+def get_service_client() -> AsyncClient:
+    """Client dùng chung với service_role key cho các thao tác dữ liệu, fallback về client thường"""
+    if not SUPABASE_SERVICE_ROLE_KEY:
+        return get_supabase_client()
+    return manager.service_client
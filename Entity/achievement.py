@@ -11,3 +11,6 @@ class UpdateAchievementRequest(BaseModel):
     achievement_name: Optional[str] = None
     description: Optional[str] = None
 
+
+class BatchUpdateAchievementRequest(UpdateAchievementRequest):
+    id: str
@@ -0,0 +1,19 @@
+from pydantic import BaseModel
+from typing import Any, List, Optional
+
+
+class BatchDeleteRequest(BaseModel):
+    ids: List[str]
+
+
+class SubRequest(BaseModel):
+    id: Optional[str] = None  # Client tự đặt để ghép kết quả, mặc định là vị trí trong danh sách
+    method: str = "GET"
+    path: str  # Ví dụ: "/jobs?limit=10"
+    body: Optional[Any] = None
+    sequential: bool = False  # True: chờ tất cả sub-request phía trước chạy xong rồi mới chạy
+
+
+class BatchRequest(BaseModel):
+    requests: List[SubRequest]
+    token: Optional[str] = None  # Tự thêm vào query của sub-request nào chưa có token
@@ -11,3 +11,6 @@ class UpdateContractRequest(BaseModel):
     contract_name: Optional[str] = None
     status: Optional[str] = None
 
+
+class BatchUpdateContractRequest(UpdateContractRequest):
+    id: str
@@ -16,3 +16,6 @@ class UpdateEducationRequest(BaseModel):
     end_year: Optional[date] = None  # Format: "YYYY-MM-DD" (date type)
     description: Optional[str] = None
 
+
+class BatchUpdateEducationRequest(UpdateEducationRequest):
+    id: str
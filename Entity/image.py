@@ -5,9 +5,20 @@ from typing import Optional
 class CreateImageRequest(BaseModel):
     images_url: str
     image_type: str
+    width: Optional[int] = None
+    height: Optional[int] = None
+    dominant_color: Optional[str] = None  # "#rrggbb"
+    blurhash: Optional[str] = None
 
 
 class UpdateImageRequest(BaseModel):
     images_url: Optional[str] = None
     image_type: Optional[str] = None
+    width: Optional[int] = None
+    height: Optional[int] = None
+    dominant_color: Optional[str] = None  # "#rrggbb"
+    blurhash: Optional[str] = None
 
+
+class BatchUpdateImageRequest(UpdateImageRequest):
+    id: str
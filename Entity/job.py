@@ -18,3 +18,6 @@ class UpdateJobRequest(BaseModel):
     end_date: Optional[str] = None  # Text type - có thể là "Now" hoặc date string
     description: Optional[str] = None
 
+
+class BatchUpdateJobRequest(UpdateJobRequest):
+    id: str
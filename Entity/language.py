@@ -11,3 +11,6 @@ class UpdateLanguageRequest(BaseModel):
     language: Optional[str] = None
     level: Optional[str] = None
 
+
+class BatchUpdateLanguageRequest(UpdateLanguageRequest):
+    id: str
@@ -13,3 +13,6 @@ class UpdateProductRequest(BaseModel):
     product_url: Optional[str] = None
     product_image: Optional[str] = None
 
+
+class BatchUpdateProductRequest(UpdateProductRequest):
+    id: str
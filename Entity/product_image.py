@@ -6,9 +6,20 @@ class CreateProductImageRequest(BaseModel):
     product_id: str
     image_url: str
     description: Optional[str] = None
+    width: Optional[int] = None
+    height: Optional[int] = None
+    dominant_color: Optional[str] = None  # "#rrggbb"
+    blurhash: Optional[str] = None
 
 
 class UpdateProductImageRequest(BaseModel):
     image_url: Optional[str] = None
     description: Optional[str] = None
+    width: Optional[int] = None
+    height: Optional[int] = None
+    dominant_color: Optional[str] = None  # "#rrggbb"
+    blurhash: Optional[str] = None
 
+
+class BatchUpdateProductImageRequest(UpdateProductImageRequest):
+    id: str
@@ -9,3 +9,5 @@ class UpdateSkillRequest(BaseModel):
     skill_name: Optional[str] = None
     level: Optional[str] = None
 
+class BatchUpdateSkillRequest(UpdateSkillRequest):
+    id: str
@@ -7,3 +7,5 @@ class CreateTargetRequest(BaseModel):
 class UpdateTargetRequest(BaseModel):
     target: Optional[str] = None
 
+class BatchUpdateTargetRequest(UpdateTargetRequest):
+    id: str
@@ -0,0 +1,8 @@
+from pydantic import BaseModel
+
+
+class ConfirmUploadRequest(BaseModel):
+    # Lấy từ response của Cloudinary sau khi client upload trực tiếp
+    public_id: str
+    version: int
+    signature: str
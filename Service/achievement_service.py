@@ -1,6 +1,14 @@
+from typing import List
 from fastapi import HTTPException
-from Entity.achievement import CreateAchievementRequest, UpdateAchievementRequest
-from Service.base_service import get_user_and_client, serialize_dates
+from postgrest import CountMethod, ReturnMethod
+from Entity.achievement import CreateAchievementRequest, UpdateAchievementRequest, BatchUpdateAchievementRequest
+from Entity.batch import BatchDeleteRequest
+from Service.base_service import get_user_and_client, serialize_dates, page_limit, select_page, page_result, allowed_columns, select_columns, update_or_select
+from Service.public_cache import get_public_cache, set_public_cache, invalidate_public_cache
+from Service.batch_service import BatchService
+
+# Các cột client được chọn qua fields=
+ACHIEVEMENT_COLUMNS = allowed_columns(CreateAchievementRequest, UpdateAchievementRequest)
 
 
 class AchievementService:
@@ -8,13 +16,14 @@ class AchievementService:
     async def create_achievement(data: CreateAchievementRequest, token: str):
         """Tạo achievement mới"""
         try:
-            user_id, client = get_user_and_client(token)
+            user_id, client = await get_user_and_client(token)
             insert_data = data.model_dump()
             insert_data["profile_id"] = user_id
             insert_data = serialize_dates(insert_data)
-            response = client.table("achievements").insert(insert_data).execute()
+            response = await client.table("achievements").insert(insert_data).execute()
             if not response.data:
                 raise HTTPException(status_code=500, detail="Failed to create achievement")
+            await invalidate_public_cache(user_id, "achievements")
             return {"status": "success", "message": "Achievement created successfully", "data": response.data[0]}
         except HTTPException:
             raise
@@ -22,23 +31,24 @@ class AchievementService:
             raise HTTPException(status_code=500, detail=f"Failed to create achievement: {str(e)}")
     
     @staticmethod
-    async def get_achievements(token: str):
+    async def get_achievements(token: str, limit: int = None, cursor: str = None, fields: str = None):
         """Lấy tất cả achievements của user"""
         try:
-            user_id, client = get_user_and_client(token)
-            response = client.table("achievements").select("*").eq("profile_id", user_id).execute()
-            return {"status": "success", "data": response.data if response.data else [], "count": len(response.data) if response.data else 0}
+            user_id, client = await get_user_and_client(token)
+            limit = page_limit(limit)
+            response = await select_page(client.table("achievements"), select_columns(fields, ACHIEVEMENT_COLUMNS), limit, cursor).eq("profile_id", user_id).execute()
+            return page_result(response.data, limit, response.count)
         except HTTPException:
             raise
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Failed to get achievements: {str(e)}")
     
     @staticmethod
-    async def get_achievement(achievement_id: str, token: str):
+    async def get_achievement(achievement_id: str, token: str, fields: str = None):
         """Lấy achievement theo ID"""
         try:
-            user_id, client = get_user_and_client(token)
-            response = client.table("achievements").select("*").eq("id", achievement_id).eq("profile_id", user_id).execute()
+            user_id, client = await get_user_and_client(token)
+            response = await client.table("achievements").select(select_columns(fields, ACHIEVEMENT_COLUMNS)).eq("id", achievement_id).eq("profile_id", user_id).execute()
             if not response.data:
                 raise HTTPException(status_code=404, detail="Achievement not found")
             return {"status": "success", "data": response.data[0]}
@@ -51,16 +61,14 @@ class AchievementService:
     async def update_achievement(achievement_id: str, data: UpdateAchievementRequest, token: str):
         """Cập nhật achievement"""
         try:
-            user_id, client = get_user_and_client(token)
-            check = client.table("achievements").select("id").eq("id", achievement_id).eq("profile_id", user_id).execute()
-            if not check.data:
-                raise HTTPException(status_code=404, detail="Achievement not found")
-            
+            user_id, client = await get_user_and_client(token)
             update_data = data.model_dump(exclude_none=True)
             update_data = serialize_dates(update_data)
-            response = client.table("achievements").update(update_data).eq("id", achievement_id).execute()
+            response = await update_or_select(client, "achievements", update_data).eq("id", achievement_id).eq("profile_id", user_id).execute()
             if not response.data:
-                raise HTTPException(status_code=500, detail="Failed to update achievement")
+                raise HTTPException(status_code=404, detail="Achievement not found")
+            if update_data:
+                await invalidate_public_cache(user_id, "achievements")
             return {"status": "success", "message": "Achievement updated successfully", "data": response.data[0]}
         except HTTPException:
             raise
@@ -71,12 +79,12 @@ class AchievementService:
     async def delete_achievement(achievement_id: str, token: str):
         """Xóa achievement"""
         try:
-            user_id, client = get_user_and_client(token)
-            check = client.table("achievements").select("id").eq("id", achievement_id).eq("profile_id", user_id).execute()
-            if not check.data:
+            user_id, client = await get_user_and_client(token)
+            # Không cần trả về dòng đã xóa, chỉ cần số dòng bị xóa
+            response = await client.table("achievements").delete(count=CountMethod.exact, returning=ReturnMethod.minimal).eq("id", achievement_id).eq("profile_id", user_id).execute()
+            if not response.count:
                 raise HTTPException(status_code=404, detail="Achievement not found")
-            
-            response = client.table("achievements").delete().eq("id", achievement_id).execute()
+            await invalidate_public_cache(user_id, "achievements")
             return {"status": "success", "message": "Achievement deleted successfully"}
         except HTTPException:
             raise
@@ -84,13 +92,56 @@ class AchievementService:
             raise HTTPException(status_code=500, detail=f"Failed to delete achievement: {str(e)}")
     
     @staticmethod
-    async def get_public_achievements(user_id: str):
+    async def create_achievements(data: List[CreateAchievementRequest], token: str):
+        """Tạo nhiều achievement trong 1 câu insert"""
+        try:
+            user_id, client = await get_user_and_client(token)
+            return await BatchService.create(client, user_id, "achievements", ("achievements",), data)
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Failed to create achievements: {str(e)}")
+    
+    @staticmethod
+    async def update_achievements(data: List[BatchUpdateAchievementRequest], token: str):
+        """Cập nhật nhiều achievement, trả về kết quả từng item"""
+        try:
+            user_id, client = await get_user_and_client(token)
+            return await BatchService.update(client, user_id, "achievements", ("achievements",), data)
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Failed to update achievements: {str(e)}")
+    
+    @staticmethod
+    async def delete_achievements(data: BatchDeleteRequest, token: str):
+        """Xóa nhiều achievement trong 1 câu delete, trả về kết quả từng item"""
+        try:
+            user_id, client = await get_user_and_client(token)
+            return await BatchService.delete(client, user_id, "achievements", ("achievements",), data.ids)
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Failed to delete achievements: {str(e)}")
+    
+    @staticmethod
+    async def get_public_achievements(user_id: str, limit: int = None, cursor: str = None, fields: str = None):
         """Lấy tất cả achievements public của user (không cần token)"""
         try:
+            # Chỉ cache trang đầu với limit và fields mặc định
+            first_page = limit is None and cursor is None and fields is None
+            if first_page:
+                cached = get_public_cache(user_id, "achievements")
+                if cached is not None:
+                    return cached
             from Service.base_service import get_public_client
             client = get_public_client()
-            response = client.table("achievements").select("*").eq("profile_id", user_id).execute()
-            return {"status": "success", "data": response.data if response.data else [], "count": len(response.data) if response.data else 0}
+            limit = page_limit(limit)
+            response = await select_page(client.table("achievements"), select_columns(fields, ACHIEVEMENT_COLUMNS), limit, cursor).eq("profile_id", user_id).execute()
+            result = page_result(response.data, limit, response.count)
+            return set_public_cache(user_id, "achievements", result) if first_page else result
+        except HTTPException:
+            raise
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Failed to get public achievements: {str(e)}")
 
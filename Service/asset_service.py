@@ -0,0 +1,220 @@
+import asyncio
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+from supabase import PostgrestAPIError
+from Service.base_service import get_public_client
+from Service.upload_service import sharded_path
+
+# Index hash nội dung ảnh -> asset đã lưu (URL, public_id/filename) kèm số dòng dữ liệu đang dùng URL đó
+# "table": bảng Supabase (dùng chung giữa các instance, vd: Vercel), "file": file JSON local, "off": tắt dedup
+ASSET_INDEX = os.getenv("ASSET_INDEX", "table" if os.getenv("VERCEL") == "1" else "file")
+ASSET_INDEX_FILE = Path(os.getenv("ASSET_INDEX_FILE", "uploads/assets.json"))
+# PostgREST trả về mã lỗi này khi chưa tạo các function trong sql/image_assets.sql
+FUNCTION_NOT_FOUND_CODE = "PGRST202"
+
+# Thư mục gốc của file upload local (URL local có dạng .../uploads/<folder>/<filename>)
+UPLOAD_ROOT = Path("uploads")
+
+
+class FileAssetIndex:
+    """Index lưu trong file JSON (chỉ dùng cho local development, 1 process)"""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._lock = asyncio.Lock()
+        self._assets: Optional[Dict[str, Dict[str, Any]]] = None
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        if self._assets is None:
+            try:
+                self._assets = json.loads(self.path.read_text())
+            except (FileNotFoundError, ValueError):
+                self._assets = {}
+        return self._assets
+
+    def _save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(self._assets))
+        os.replace(tmp_path, self.path)
+
+    def _by_url(self) -> Dict[str, str]:
+        return {asset["data"].get("image_url"): content_hash for content_hash, asset in self._load().items()}
+
+    async def find(self, content_hash: str) -> Optional[Dict[str, Any]]:
+        async with self._lock:
+            asset = self._load().get(content_hash)
+            return asset["data"] if asset is not None else None
+
+    async def register(self, content_hash: str, data: Dict[str, Any]) -> None:
+        async with self._lock:
+            self._load().setdefault(content_hash, {"data": data, "refcount": 0})
+            self._save()
+
+    async def reference(self, urls: List[str]) -> None:
+        async with self._lock:
+            assets, by_url = self._load(), self._by_url()
+            for url in urls:
+                if url in by_url:
+                    assets[by_url[url]]["refcount"] += 1
+            self._save()
+
+    async def release(self, urls: List[str]) -> List[Dict[str, Any]]:
+        async with self._lock:
+            assets, by_url = self._load(), self._by_url()
+            released = []
+            for url in urls:
+                content_hash = by_url.get(url)
+                asset = assets.get(content_hash)
+                # refcount = 0: dòng dữ liệu chưa từng được tính (vd: tạo khi dedup đang tắt) -> không xóa file
+                if asset is None or asset["refcount"] <= 0:
+                    continue
+                asset["refcount"] -= 1
+                if asset["refcount"] == 0:
+                    del assets[content_hash]
+                    released.append(asset["data"])
+            self._save()
+            return released
+
+
+class TableAssetIndex:
+    """Index lưu trong bảng image_assets, tăng/giảm refcount bằng RPC (atomic)"""
+
+    async def find(self, content_hash: str) -> Optional[Dict[str, Any]]:
+        response = await get_public_client().rpc("find_image_asset", {"p_hash": content_hash}).execute()
+        return response.data[0]["data"] if response.data else None
+
+    async def register(self, content_hash: str, data: Dict[str, Any]) -> None:
+        await get_public_client().rpc("register_image_asset", {
+            "p_hash": content_hash,
+            "p_url": data["image_url"],
+            "p_data": data,
+        }).execute()
+
+    async def reference(self, urls: List[str]) -> None:
+        await get_public_client().rpc("reference_image_assets", {"p_urls": urls}).execute()
+
+    async def release(self, urls: List[str]) -> List[Dict[str, Any]]:
+        response = await get_public_client().rpc("release_image_assets", {"p_urls": urls}).execute()
+        return [row["data"] for row in response.data or []]
+
+
+def _create_index():
+    if ASSET_INDEX == "file":
+        return FileAssetIndex(ASSET_INDEX_FILE)
+    if ASSET_INDEX == "table":
+        return TableAssetIndex()
+    return None
+
+
+asset_index = _create_index()
+
+
+def _disable_on_missing_function(e: PostgrestAPIError) -> None:
+    global asset_index
+    if e.code != FUNCTION_NOT_FOUND_CODE:
+        raise e
+    print("Image asset functions not found, disabling upload deduplication")
+    asset_index = None
+
+
+async def _delete_stored_asset(data: Dict[str, Any]) -> None:
+    """Xóa file trên Cloudinary hoặc local (kèm các bản resize) khi không còn tham chiếu nào"""
+    if data.get("public_id"):
+        from Service.cloudinary_service import delete_image_from_cloudinary
+        await delete_image_from_cloudinary(data["public_id"])
+    elif data.get("filename") and data.get("folder"):
+        directory = UPLOAD_ROOT / data["folder"]
+        # File cũ (trước khi chia thư mục con) nằm trực tiếp trong uploads/<folder>
+        for path in (sharded_path(directory, data["filename"]), directory / data["filename"]):
+            for file_path in [path, *path.parent.glob(f"{path.stem}-*")]:
+                file_path.unlink(missing_ok=True)
+
+
+def _present(urls: Iterable[Optional[str]]) -> List[str]:
+    return [url for url in urls if url]
+
+
+class AssetService:
+    """Dedup ảnh upload theo nội dung và đếm số dòng dữ liệu (images, productImages, duong) dùng mỗi URL
+
+    Upload chỉ tìm/lưu asset (refcount không đổi); refcount tăng khi dòng được tạo hoặc đổi sang URL đó,
+    giảm khi dòng bị xóa hoặc đổi sang URL khác. File chỉ bị xóa khi không còn dòng nào dùng
+    (user khác tạo dòng với cùng URL cũng được tính nên không xóa được file của nhau)
+    """
+
+    @staticmethod
+    def enabled() -> bool:
+        return asset_index is not None
+
+    @staticmethod
+    async def find(content_hash: str) -> Optional[Dict[str, Any]]:
+        """Tìm asset có cùng nội dung; None nếu chưa có (hoặc dedup bị tắt)"""
+        if asset_index is None:
+            return None
+        try:
+            return await asset_index.find(content_hash)
+        except PostgrestAPIError as e:
+            _disable_on_missing_function(e)
+            return None
+
+    @staticmethod
+    async def register(content_hash: str, data: Dict[str, Any]) -> None:
+        """Lưu asset vừa upload vào index (refcount = 0 tới khi có dòng dữ liệu dùng URL)"""
+        if asset_index is None:
+            return
+        try:
+            await asset_index.register(content_hash, data)
+        except PostgrestAPIError as e:
+            _disable_on_missing_function(e)
+
+    @staticmethod
+    async def add_references(urls: Iterable[Optional[str]]) -> None:
+        """Tăng refcount của các URL vừa được dòng dữ liệu mới dùng (URL không có trong index bị bỏ qua)
+
+        Chạy sau khi đã ghi dữ liệu nên lỗi chỉ được log, không làm hỏng request
+        """
+        urls = _present(urls)
+        if asset_index is None or not urls:
+            return
+        try:
+            await asset_index.reference(urls)
+        except Exception as e:
+            print(f"Failed to reference image assets {urls}: {e}")
+
+    @staticmethod
+    async def release_urls(urls: Iterable[Optional[str]]) -> None:
+        """Giảm refcount của các URL không còn được dòng dữ liệu dùng, xóa file khi refcount về 0
+
+        Chạy sau khi đã xóa dữ liệu nên lỗi chỉ được log, không làm hỏng request
+        """
+        urls = _present(urls)
+        if asset_index is None or not urls:
+            return
+        try:
+            released = await asset_index.release(urls)
+        except Exception as e:
+            print(f"Failed to release image assets {urls}: {e}")
+            return
+        for data in released:
+            try:
+                await _delete_stored_asset(data)
+            except Exception as e:
+                print(f"Failed to delete image asset {data.get('image_url')}: {e}")
+
+    @staticmethod
+    async def replace_urls(old_urls: Dict[str, Optional[str]], rows: Iterable[Dict[str, Any]], column: str) -> None:
+        """Sau khi update: tăng refcount URL mới, giảm refcount URL cũ của các dòng có URL thay đổi
+
+        old_urls: id -> URL trước khi update (lấy trước câu update)
+        """
+        changed = []
+        for row in rows:
+            row_id = str(row["id"])
+            if row_id in old_urls and old_urls[row_id] != row.get(column):
+                changed.append((old_urls[row_id], row.get(column)))
+        # Tăng trước rồi mới giảm để asset được chuyển giữa các dòng không bị xóa nhầm
+        await AssetService.add_references(new_url for _, new_url in changed)
+        await AssetService.release_urls(old_url for old_url, _ in changed)
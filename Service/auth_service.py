@@ -1,6 +1,7 @@
 from fastapi import HTTPException
 from Connection import connection
 from Entity.auth import LoginRequest, RegisterRequest
+from Service.token_service import remember_token, resolve_user_details
 
 
 class AuthService:
@@ -11,7 +12,7 @@ class AuthService:
             client = connection.get_supabase_client()
             
             # Xác thực người dùng với Supabase Auth
-            response = client.auth.sign_in_with_password({
+            response = await client.auth.sign_in_with_password({
                 "email": credentials.email,
                 "password": credentials.password
             })
@@ -23,14 +24,18 @@ class AuthService:
             if not response.session:
                 raise HTTPException(status_code=401, detail="Session not created. Please check your credentials.")
             
+            # Lưu token vào cache để các request sau không phải verify lại
+            user = {
+                "id": response.user.id,
+                "email": response.user.email,
+                "created_at": response.user.created_at,
+            }
+            remember_token(response.session.access_token, user, response.session.expires_at)
+            
             return {
                 "status": "success",
                 "message": "Login successful",
-                "user": {
-                    "id": response.user.id,
-                    "email": response.user.email,
-                    "created_at": response.user.created_at,
-                },
+                "user": user,
                 "access_token": response.session.access_token,
             }
         except Exception as e:
@@ -46,7 +51,7 @@ class AuthService:
             client = connection.get_supabase_client()
             
             # Tạo tài khoản mới
-            response = client.auth.sign_up({
+            response = await client.auth.sign_up({
                 "email": user_data.email,
                 "password": user_data.password
             })
@@ -73,22 +78,19 @@ class AuthService:
     async def get_current_user(token: str):
         """Lấy thông tin user hiện tại từ access token"""
         try:
-            client = connection.get_supabase_client()
-            
-            # Lấy thông tin user từ token
-            user_response = client.auth.get_user(token)
-            
-            if user_response.user is None:
-                raise HTTPException(status_code=401, detail="Invalid token")
+            # Lấy thông tin user từ token (verify tại server, có cache; created_at lấy từ Supabase Auth nếu cache chưa có)
+            user = await resolve_user_details(token)
             
             return {
                 "status": "success",
                 "user": {
-                    "id": user_response.user.id,
-                    "email": user_response.user.email,
-                    "created_at": user_response.user.created_at,
+                    "id": user["id"],
+                    "email": user["email"],
+                    "created_at": user["created_at"],
                 }
             }
+        except HTTPException:
+            raise
         except Exception as e:
             raise HTTPException(status_code=401, detail=f"Invalid token: {str(e)}")
 
@@ -1,30 +1,47 @@
+import asyncio
+import base64
+import binascii
+import os
 from fastapi import HTTPException
-from supabase import create_client
 from Connection import connection
+from Service.token_service import resolve_user
 from datetime import date, datetime
-from typing import Any, Dict
+from typing import Any, Awaitable, Callable, Dict, Iterable, NamedTuple, Optional, Tuple
 
+# Keyset pagination cho các list endpoint (sort theo id)
+DEFAULT_PAGE_LIMIT = int(os.getenv("DEFAULT_PAGE_LIMIT", "100"))
+MAX_PAGE_LIMIT = int(os.getenv("MAX_PAGE_LIMIT", "500"))
+# exact | planned | estimated (planned/estimated dùng thống kê của Postgres, rẻ hơn với bảng lớn)
+LIST_COUNT_METHOD = os.getenv("LIST_COUNT_METHOD", "exact")
 
-def get_user_and_client(token: str):
+# Cột có ở mọi bảng section ngoài các field trong Entity models
+SECTION_BASE_COLUMNS = ("id", "profile_id")
+# Cột metadata ảnh (sql/image_metadata.sql): chỉ gửi khi có giá trị để insert vẫn chạy khi database chưa có các cột này
+IMAGE_METADATA_COLUMNS = ("width", "height", "dominant_color", "blurhash")
+
+
+async def get_user_and_client(token: str):
     """Verify token và trả về user_id và Supabase client với service_role key"""
-    # Verify token và lấy user id
-    client_auth = connection.get_supabase_client()
-    user_response = client_auth.auth.get_user(token)
-    
-    if user_response.user is None:
-        raise HTTPException(status_code=401, detail="Invalid token")
+    # Verify token tại server (có cache), không gọi Supabase Auth mỗi request
+    user_id = (await resolve_user(token))["id"]
     
-    user_id = user_response.user.id
-    
-    # Dùng service_role key cho backend operations (bypass RLS)
-    if connection.SUPABASE_SERVICE_ROLE_KEY:
-        client = create_client(connection.SUPABASE_URL, connection.SUPABASE_SERVICE_ROLE_KEY)
-    else:
-        client = connection.get_supabase_client()
+    # Dùng client service_role dùng chung cho backend operations (bypass RLS)
+    client = connection.get_service_client()
     
     return user_id, client
 
 
+class UserContext(NamedTuple):
+    user_id: str
+    client: Any
+
+
+async def get_user_context(token: str) -> UserContext:
+    """FastAPI dependency: verify token 1 lần cho mỗi request (FastAPI cache kết quả trong request)"""
+    user_id, client = await get_user_and_client(token)
+    return UserContext(user_id, client)
+
+
 def serialize_dates(data: Dict[str, Any]) -> Dict[str, Any]:
     """Convert date và datetime objects thành ISO format strings cho Supabase"""
     serialized = {}
@@ -40,17 +57,129 @@ def serialize_dates(data: Dict[str, Any]) -> Dict[str, Any]:
     return serialized
 
 
+def update_or_select(client, table: str, update_data: Dict[str, Any]):
+    """Câu update, hoặc select dòng hiện tại khi không có field nào (PostgREST không trả về dòng nào cho update rỗng)
+
+    Giống batch update báo "unchanged": dòng tồn tại thì trả về nguyên trạng thay vì 404
+    """
+    if update_data:
+        return client.table(table).update(update_data)
+    return client.table(table).select("*")
+
+
+def insert_payload(model) -> Dict[str, Any]:
+    """Dữ liệu insert từ Entity model (bỏ các cột metadata ảnh không có giá trị, serialize date)"""
+    empty_metadata = {column for column in IMAGE_METADATA_COLUMNS if getattr(model, column, None) is None}
+    return serialize_dates(model.model_dump(exclude=empty_metadata))
+
+
+def image_metadata_params(model) -> Dict[str, Any]:
+    """Tham số p_<cột> của các RPC product image, chỉ gồm metadata có giá trị (khớp cả function phiên bản cũ)"""
+    return {f"p_{column}": getattr(model, column) for column in IMAGE_METADATA_COLUMNS if getattr(model, column, None) is not None}
+
+
 def get_public_client():
-    """Tạo Supabase client mới với service role key để bypass RLS cho public endpoints"""
-    import os
-    from dotenv import load_dotenv
-    
-    load_dotenv()
-    SUPABASE_URL = os.getenv("SUPABASE_URL")
-    SUPABASE_SERVICE_ROLE_KEY = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
-    
-    if not SUPABASE_SERVICE_ROLE_KEY:
+    """Trả về Supabase client dùng chung với service role key để bypass RLS cho public endpoints"""
+    if not connection.SUPABASE_SERVICE_ROLE_KEY:
         raise HTTPException(status_code=500, detail="SUPABASE_SERVICE_ROLE_KEY not configured")
     
-    # Tạo client mới mỗi lần để tránh bị ảnh hưởng bởi authentication state
-    return create_client(SUPABASE_URL, SUPABASE_SERVICE_ROLE_KEY)
+    # Client này tách biệt với client dùng cho auth nên không bị ảnh hưởng bởi authentication state
+    return connection.get_service_client()
+
+
+def section_error(message: str) -> Dict[str, Any]:
+    """Error marker cho một section bị lỗi/timeout (giữ data rỗng để frontend không bị vỡ)"""
+    return {"status": "error", "error": message, "data": [], "count": 0}
+
+
+async def gather_sections(
+    loaders: Dict[str, Callable[[], Awaitable[Dict[str, Any]]]],
+    concurrency: int,
+    timeout: float,
+) -> Dict[str, Any]:
+    """Chạy các section loader đồng thời (giới hạn concurrency, timeout riêng từng section)
+
+    Section lỗi hoặc chậm sẽ trả về error marker thay vì làm hỏng cả response
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run(loader):
+        async with semaphore:
+            try:
+                return await asyncio.wait_for(loader(), timeout)
+            except asyncio.TimeoutError:
+                return section_error(f"Timed out after {timeout}s")
+            except HTTPException as e:
+                return section_error(str(e.detail))
+            except Exception as e:
+                return section_error(str(e))
+
+    results = await asyncio.gather(*(run(loader) for loader in loaders.values()))
+    return dict(zip(loaders.keys(), results))
+
+
+def page_limit(limit: Optional[int] = None) -> int:
+    """Số dòng mỗi trang, giới hạn trong [1, MAX_PAGE_LIMIT]"""
+    if not limit:
+        return DEFAULT_PAGE_LIMIT
+    return max(1, min(limit, MAX_PAGE_LIMIT))
+
+
+def encode_cursor(row_id: Any) -> str:
+    return base64.urlsafe_b64encode(str(row_id).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> str:
+    try:
+        return base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+    except (binascii.Error, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def select_page(table_query, columns: str, limit: int, cursor: Optional[str] = None):
+    """select() kèm keyset pagination theo id (lấy dư 1 dòng để biết còn trang sau)
+
+    Count do database tính và chỉ tính ở trang đầu (khi không có cursor)
+    """
+    query = table_query.select(columns, count=None if cursor else LIST_COUNT_METHOD)
+    if cursor:
+        query = query.gt("id", decode_cursor(cursor))
+    return query.order("id").limit(limit + 1)
+
+
+def page_result(rows, limit: int, count: Optional[int] = None) -> Dict[str, Any]:
+    """Response chuẩn cho list endpoint: data, count (tổng số dòng, None nếu không tính) và next_cursor"""
+    rows = rows or []
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    return {
+        "status": "success",
+        "data": rows,
+        "count": count,
+        "next_cursor": encode_cursor(rows[-1]["id"]) if has_more else None,
+    }
+
+
+def allowed_columns(*models, base: Iterable[str] = SECTION_BASE_COLUMNS) -> Tuple[str, ...]:
+    """Allow-list cột cho fields= : base columns + các field của Entity models"""
+    columns = list(base)
+    for model in models:
+        columns.extend(model.model_fields)
+    return tuple(dict.fromkeys(columns))
+
+
+def select_columns(fields: Optional[str], allowed: Tuple[str, ...], default: str = "*") -> str:
+    """Chuyển fields= (vd: "job_name,company_name") thành column projection cho select()
+
+    Luôn kèm id (cần cho cursor), field không nằm trong allow-list -> 400
+    """
+    if not fields:
+        return default
+    requested = [name.strip() for name in fields.split(",") if name.strip()]
+    unknown = [name for name in requested if name not in allowed]
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown fields: {', '.join(unknown)}. Allowed fields: {', '.join(allowed)}",
+        )
+    return ", ".join(dict.fromkeys(["id"] + requested))
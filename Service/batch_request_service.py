@@ -0,0 +1,104 @@
+import asyncio
+import os
+from typing import Any, Dict, List
+from urllib.parse import parse_qsl, unquote, urlencode, urlsplit
+import httpx
+from fastapi import HTTPException
+from Entity.batch import BatchRequest, SubRequest
+
+# Số sub-request tối đa trong 1 batch, số sub-request chạy đồng thời và timeout (giây) cho từng sub-request
+BATCH_MAX_REQUESTS = int(os.getenv("BATCH_MAX_REQUESTS", "20"))
+BATCH_REQUEST_CONCURRENCY = int(os.getenv("BATCH_REQUEST_CONCURRENCY", "10"))
+BATCH_REQUEST_TIMEOUT = float(os.getenv("BATCH_REQUEST_TIMEOUT", "10"))
+
+ALLOWED_METHODS = ("GET", "POST", "PUT", "DELETE")
+# Header của sub-response được trả về cho client
+FORWARDED_HEADERS = ("etag", "last-modified", "cache-control")
+# Header gắn vào mọi sub-request; /batch nhận được header này là batch lồng nhau (chặn dù path bị encode/biến đổi)
+SUB_REQUEST_HEADER = "x-batch-sub-request"
+
+
+def _sub_request_url(sub_request: SubRequest, token: str = None) -> str:
+    """Kiểm tra path của sub-request và thêm token vào query nếu cần"""
+    parts = urlsplit(sub_request.path)
+    if parts.scheme or parts.netloc or not parts.path.startswith("/"):
+        raise HTTPException(status_code=400, detail=f"Invalid sub-request path: {sub_request.path}")
+    # So sánh path đã decode (vd: /%62atch) giống cách router xử lý
+    if unquote(parts.path).rstrip("/") == "/batch":
+        raise HTTPException(status_code=400, detail="Nested /batch requests are not allowed")
+    if sub_request.method.upper() not in ALLOWED_METHODS:
+        raise HTTPException(status_code=400, detail=f"Method not allowed in batch: {sub_request.method}")
+
+    query = parse_qsl(parts.query, keep_blank_values=True)
+    if token and not any(key == "token" for key, _ in query):
+        query.append(("token", token))
+    return parts.path + ("?" + urlencode(query) if query else "")
+
+
+def _stages(requests: List[SubRequest]) -> List[List[int]]:
+    """Chia sub-request thành các stage chạy lần lượt, mỗi sub-request sequential bắt đầu 1 stage mới"""
+    stages: List[List[int]] = []
+    for index, sub_request in enumerate(requests):
+        if not stages or sub_request.sequential:
+            stages.append([])
+        stages[-1].append(index)
+    return stages
+
+
+def _sub_response(sub_request_id: str, response: httpx.Response) -> Dict[str, Any]:
+    if response.headers.get("content-type", "").startswith("application/json"):
+        body = response.json()
+    else:
+        body = response.text or None
+    return {
+        "id": sub_request_id,
+        "status": response.status_code,
+        "headers": {name: response.headers[name] for name in FORWARDED_HEADERS if name in response.headers},
+        "body": body,
+    }
+
+
+class BatchRequestService:
+    @staticmethod
+    async def execute(app, data: BatchRequest, headers=None):
+        """Chạy các sub-request trong cùng process (gọi thẳng ASGI app, không qua network)
+
+        Sub-request trong cùng stage chạy đồng thời, các stage chạy lần lượt theo thứ tự
+        """
+        if headers is not None and SUB_REQUEST_HEADER in headers:
+            raise HTTPException(status_code=400, detail="Nested /batch requests are not allowed")
+        if not data.requests:
+            raise HTTPException(status_code=400, detail="Batch is empty")
+        if len(data.requests) > BATCH_MAX_REQUESTS:
+            raise HTTPException(status_code=400, detail=f"Batch too large: {len(data.requests)} requests (max {BATCH_MAX_REQUESTS})")
+        urls = [_sub_request_url(sub_request, data.token) for sub_request in data.requests]
+
+        results: List[Dict[str, Any]] = [None] * len(data.requests)
+        semaphore = asyncio.Semaphore(BATCH_REQUEST_CONCURRENCY)
+        transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+
+        async with httpx.AsyncClient(transport=transport, base_url="http://batch") as client:
+            async def run(index: int):
+                sub_request = data.requests[index]
+                sub_request_id = sub_request.id if sub_request.id is not None else str(index)
+                async with semaphore:
+                    try:
+                        response = await asyncio.wait_for(
+                            client.request(
+                                sub_request.method.upper(),
+                                urls[index],
+                                json=sub_request.body,
+                                headers={SUB_REQUEST_HEADER: "1"},
+                            ),
+                            BATCH_REQUEST_TIMEOUT,
+                        )
+                        results[index] = _sub_response(sub_request_id, response)
+                    except asyncio.TimeoutError:
+                        results[index] = {"id": sub_request_id, "status": 504, "headers": {}, "body": {"detail": f"Timed out after {BATCH_REQUEST_TIMEOUT}s"}}
+                    except Exception as e:
+                        results[index] = {"id": sub_request_id, "status": 500, "headers": {}, "body": {"detail": str(e)}}
+
+            for stage in _stages(data.requests):
+                await asyncio.gather(*(run(index) for index in stage))
+
+        return {"status": "success", "results": results}
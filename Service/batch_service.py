@@ -0,0 +1,180 @@
+import asyncio
+import json
+import os
+from typing import Any, Dict, List, Sequence
+from fastapi import HTTPException
+from pydantic import BaseModel
+from supabase import PostgrestAPIError
+from Service.base_service import serialize_dates, insert_payload
+from Service.public_cache import invalidate_public_cache
+from Service.asset_service import AssetService
+
+# Số item tối đa trong 1 batch request
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "100"))
+# Số câu update chạy đồng thời khi database chưa có function update_owned_rows
+BATCH_UPDATE_CONCURRENCY = int(os.getenv("BATCH_UPDATE_CONCURRENCY", "10"))
+# PostgREST trả về mã lỗi này khi chưa tạo function trong sql/batch_functions.sql
+FUNCTION_NOT_FOUND_CODE = "PGRST202"
+
+_rpc_supported = True
+
+
+def check_batch_size(count: int) -> None:
+    if count == 0:
+        raise HTTPException(status_code=400, detail="Batch is empty")
+    if count > BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"Batch too large: {count} items (max {BATCH_MAX_ITEMS})")
+
+
+def unique_ids(ids: Sequence[str]) -> List[str]:
+    return list(dict.fromkeys(ids))
+
+
+def delete_results(ids: Sequence[str], deleted_ids) -> List[Dict[str, Any]]:
+    """Kết quả từng item của batch delete theo thứ tự ids gửi lên"""
+    deleted_ids = {str(row_id) for row_id in deleted_ids}
+    return [{"id": row_id, "status": "deleted" if row_id in deleted_ids else "not_found"} for row_id in ids]
+
+
+def update_results(ids: Sequence[str], rows: List[Dict[str, Any]], unchanged_ids=()) -> List[Dict[str, Any]]:
+    """Kết quả từng item của batch update theo thứ tự ids gửi lên (unchanged: item không có field nào)"""
+    rows_by_id = {str(row["id"]): row for row in rows}
+    results = []
+    for row_id in ids:
+        if row_id in rows_by_id:
+            results.append({"id": row_id, "status": "updated", "data": rows_by_id[row_id]})
+        elif row_id in unchanged_ids:
+            results.append({"id": row_id, "status": "unchanged"})
+        else:
+            results.append({"id": row_id, "status": "not_found"})
+    return results
+
+
+async def update_rows_by_id(client, table: str, updates: Dict[str, Dict[str, Any]], owner_filter=None) -> List[Dict[str, Any]]:
+    """Update từng dòng theo id (các dòng có cùng payload được gộp thành 1 câu update), chạy đồng thời"""
+    groups: Dict[str, List[str]] = {}
+    for row_id, values in updates.items():
+        groups.setdefault(json.dumps(values, sort_keys=True, default=str), []).append(row_id)
+
+    semaphore = asyncio.Semaphore(BATCH_UPDATE_CONCURRENCY)
+
+    async def run(payload: str, ids: List[str]):
+        async with semaphore:
+            query = client.table(table).update(json.loads(payload)).in_("id", ids)
+            if owner_filter is not None:
+                query = owner_filter(query)
+            response = await query.execute()
+            return response.data or []
+
+    results = await asyncio.gather(*(run(payload, ids) for payload, ids in groups.items()))
+    return [row for rows in results for row in rows]
+
+
+async def current_urls(client, table: str, column: str, ids: Sequence[str], owner_filter=None) -> Dict[str, Any]:
+    """id -> URL ảnh hiện tại, đọc trước câu update để trả lại refcount của URL cũ (rỗng nếu dedup tắt)"""
+    if not ids or not AssetService.enabled():
+        return {}
+    query = client.table(table).select(f"id, {column}").in_("id", list(ids))
+    if owner_filter is not None:
+        query = owner_filter(query)
+    response = await query.execute()
+    return {str(row["id"]): row.get(column) for row in response.data or []}
+
+
+class BatchService:
+    """Batch create/update/delete cho các bảng section có cột profile_id"""
+
+    @staticmethod
+    async def create(client, user_id: str, table: str, sections: Sequence[str], items: List[BaseModel], url_column: str = None) -> Dict[str, Any]:
+        """Insert tất cả item trong 1 câu insert nhiều dòng
+
+        url_column: cột chứa URL ảnh, các URL của dòng mới được tính vào refcount của asset index
+        """
+        check_batch_size(len(items))
+        rows = []
+        for item in items:
+            row = insert_payload(item)
+            row["profile_id"] = user_id
+            rows.append(row)
+        response = await client.table(table).insert(rows).execute()
+        if not response.data or len(response.data) != len(rows):
+            raise HTTPException(status_code=500, detail=f"Failed to create {table}")
+        await invalidate_public_cache(user_id, *sections)
+        if url_column:
+            await AssetService.add_references(row.get(url_column) for row in response.data)
+        return {
+            "status": "success",
+            "message": f"{len(response.data)} {table} created successfully",
+            "data": response.data,
+            "results": [{"index": index, "status": "created", "id": row["id"]} for index, row in enumerate(response.data)],
+        }
+
+    @staticmethod
+    async def update(client, user_id: str, table: str, sections: Sequence[str], items: List[BaseModel], url_column: str = None) -> Dict[str, Any]:
+        """Update nhiều dòng, mỗi dòng giá trị khác nhau (chỉ những dòng thuộc về user)
+
+        url_column: cột chứa URL ảnh, dòng đổi URL được chuyển refcount từ URL cũ sang URL mới
+        """
+        global _rpc_supported
+        check_batch_size(len(items))
+        # id trùng lặp thì item sau ghi đè item trước
+        updates = {}
+        for item in items:
+            values = serialize_dates(item.model_dump(exclude_none=True))
+            row_id = str(values.pop("id"))
+            updates[row_id] = values
+        ids = list(updates)
+        unchanged_ids = {row_id for row_id, values in updates.items() if not values}
+        updates = {row_id: values for row_id, values in updates.items() if values}
+        owner_filter = lambda query: query.eq("profile_id", user_id)
+        old_urls = {}
+        if url_column:
+            old_urls = await current_urls(client, table, url_column, [row_id for row_id, values in updates.items() if url_column in values], owner_filter)
+
+        # Item không có field nào được báo "unchanged" (giống batch update product image), không gọi database
+        rows = [] if not updates else None
+        if rows is None and _rpc_supported:
+            try:
+                response = await client.rpc("update_owned_rows", {
+                    "p_table": table,
+                    "p_profile_id": user_id,
+                    "p_rows": [{"id": row_id, **values} for row_id, values in updates.items()],
+                }).execute()
+                rows = response.data or []
+            except PostgrestAPIError as e:
+                if e.code != FUNCTION_NOT_FOUND_CODE:
+                    raise
+                _rpc_supported = False
+                print("Function update_owned_rows not found, falling back to concurrent updates")
+        if rows is None:
+            rows = await update_rows_by_id(client, table, updates, owner_filter)
+
+        if rows:
+            await invalidate_public_cache(user_id, *sections)
+        if old_urls:
+            await AssetService.replace_urls(old_urls, rows, url_column)
+        return {
+            "status": "success",
+            "message": f"{len(rows)} {table} updated successfully",
+            "results": update_results(ids, rows, unchanged_ids),
+        }
+
+    @staticmethod
+    async def delete(client, user_id: str, table: str, sections: Sequence[str], ids: List[str], url_column: str = None) -> Dict[str, Any]:
+        """Xóa nhiều dòng trong 1 câu delete (chỉ những dòng thuộc về user)
+
+        url_column: cột chứa URL ảnh, các URL của dòng đã xóa được trả lại cho asset index
+        """
+        ids = unique_ids(ids)
+        check_batch_size(len(ids))
+        response = await client.table(table).delete().in_("id", ids).eq("profile_id", user_id).execute()
+        deleted = [row["id"] for row in response.data or []]
+        if deleted:
+            await invalidate_public_cache(user_id, *sections)
+        if url_column:
+            await AssetService.release_urls(row.get(url_column) for row in response.data or [])
+        return {
+            "status": "success",
+            "message": f"{len(deleted)} {table} deleted successfully",
+            "results": delete_results(ids, deleted),
+        }
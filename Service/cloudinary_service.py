@@ -1,11 +1,46 @@
 import cloudinary
+import cloudinary.api
 import cloudinary.uploader
-from cloudinary.utils import cloudinary_url
+from cloudinary.exceptions import NotFound
+from cloudinary.utils import cloudinary_url, api_sign_request, verify_api_response_signature
+import asyncio
 import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache, partial
+from typing import Any, Dict, Optional
+from fastapi import HTTPException
 from dotenv import load_dotenv
 
 load_dotenv()
 
+# SDK Cloudinary là blocking nên chạy trên thread pool riêng, giới hạn số lời gọi đồng thời
+CLOUDINARY_MAX_WORKERS = int(os.getenv("CLOUDINARY_MAX_WORKERS", "4"))
+# Số lời gọi được xếp hàng chờ tối đa, vượt quá thì trả về 503 ngay thay vì chờ
+CLOUDINARY_MAX_QUEUE = int(os.getenv("CLOUDINARY_MAX_QUEUE", "32"))
+CLOUDINARY_TIMEOUT = float(os.getenv("CLOUDINARY_TIMEOUT", "60"))
+
+# Preset cho ?img=: tên -> chiều rộng tối đa của URL Cloudinary (f_auto,q_auto, không phóng to ảnh)
+CLOUDINARY_IMAGE_PRESETS = {
+    name: int(width)
+    for name, width in (
+        item.split(":") for item in os.getenv("CLOUDINARY_IMAGE_PRESETS", "thumb:320,card:768,full:1600").split(",") if item
+    )
+}
+# ?img=srcset: srcset theo chiều rộng của tất cả preset, src là preset mặc định
+CLOUDINARY_SRCSET = "srcset"
+CLOUDINARY_DEFAULT_PRESET = os.getenv("CLOUDINARY_DEFAULT_PRESET", "card")
+# ?img=<preset>: srcset theo mật độ điểm ảnh (DPR) của màn hình
+CLOUDINARY_DPRS = (1, 2)
+# Các cột chứa URL ảnh (images, productImages, avatar/cover của duong)
+IMAGE_URL_COLUMNS = ("images_url", "image_url", "avatar_url", "cover_url")
+
+# secure_url của ảnh đã upload: https://res.cloudinary.com/<cloud>/image/upload/v<version>/<public_id>.<format>
+CLOUDINARY_UPLOAD_URL = re.compile(
+    r"^https?://res\.cloudinary\.com/(?P<cloud>[^/]+)/image/upload/(?:v(?P<version>\d+)/)?(?P<public_id>[^?#]+?)(?:\.(?P<format>[a-z0-9]+))?$"
+)
+
 # Cấu hình Cloudinary
 cloudinary.config(
     cloud_name=os.getenv("CLOUDINARY_CLOUD_NAME"),
@@ -14,13 +49,69 @@ cloudinary.config(
     secure=True
 )
 
+_executor = ThreadPoolExecutor(max_workers=CLOUDINARY_MAX_WORKERS, thread_name_prefix="cloudinary")
+_semaphore = asyncio.Semaphore(CLOUDINARY_MAX_WORKERS)
+_stats = {"waiting": 0, "running": 0, "completed": 0, "failed": 0, "timeouts": 0, "rejected": 0, "total_seconds": 0.0}
+
+
+def cloudinary_pool_stats() -> dict:
+    """Độ dài hàng đợi và số lời gọi Cloudinary (dùng cho monitoring)"""
+    completed = _stats["completed"]
+    return {
+        **_stats,
+        "max_workers": CLOUDINARY_MAX_WORKERS,
+        "max_queue": CLOUDINARY_MAX_QUEUE,
+        "avg_seconds": _stats["total_seconds"] / completed if completed else 0.0,
+    }
 
-async def upload_image_to_cloudinary(file_content: bytes, folder: str = "uploads", public_id: str = None):
+
+def shutdown_cloudinary_pool() -> None:
+    _executor.shutdown(wait=False, cancel_futures=True)
+
+
+async def run_in_cloudinary_pool(func, *args, **kwargs):
+    """Chạy hàm blocking của SDK Cloudinary trên thread pool riêng (không chặn event loop)"""
+    if _stats["waiting"] >= CLOUDINARY_MAX_QUEUE:
+        _stats["rejected"] += 1
+        raise HTTPException(status_code=503, detail="Cloudinary đang quá tải, vui lòng thử lại sau")
+
+    _stats["waiting"] += 1
+    try:
+        await _semaphore.acquire()
+    finally:
+        _stats["waiting"] -= 1
+
+    def release(_future) -> None:
+        _stats["running"] -= 1
+        _semaphore.release()
+
+    _stats["running"] += 1
+    start = time.perf_counter()
+    loop = asyncio.get_running_loop()
+    future = loop.run_in_executor(_executor, partial(func, *args, **kwargs))
+    # Thread không dừng được khi timeout: giữ slot (và tính là đang chạy) tới khi lời gọi thực sự kết thúc,
+    # để các lời gọi mới xếp hàng ở semaphore thay vì dồn vào hàng đợi không giới hạn của executor
+    future.add_done_callback(release)
+    try:
+        # shield: timeout/hủy request không hủy future (nếu hủy, callback sẽ nhả slot ngay)
+        result = await asyncio.wait_for(asyncio.shield(future), CLOUDINARY_TIMEOUT)
+        _stats["completed"] += 1
+        _stats["total_seconds"] += time.perf_counter() - start
+        return result
+    except asyncio.TimeoutError:
+        _stats["timeouts"] += 1
+        raise HTTPException(status_code=504, detail=f"Cloudinary không phản hồi sau {CLOUDINARY_TIMEOUT}s")
+    except Exception:
+        _stats["failed"] += 1
+        raise
+
+
+async def upload_image_to_cloudinary(file_content, folder: str = "uploads", public_id: str = None):
     """
     Upload ảnh lên Cloudinary
     
     Args:
-        file_content: Nội dung file (bytes)
+        file_content: Nội dung file (bytes hoặc file object đã mở)
         folder: Thư mục trên Cloudinary (mặc định: "uploads")
         public_id: ID công khai cho file (nếu None sẽ tự động tạo)
     
@@ -29,13 +120,15 @@ async def upload_image_to_cloudinary(file_content: bytes, folder: str = "uploads
     """
     try:
         # Upload lên Cloudinary
-        upload_result = cloudinary.uploader.upload(
+        upload_result = await run_in_cloudinary_pool(
+            cloudinary.uploader.upload,
             file_content,
             folder=folder,
             public_id=public_id,
             resource_type="image",
             overwrite=True,
-            invalidate=True
+            invalidate=True,
+            timeout=CLOUDINARY_TIMEOUT
         )
         
         # Lấy URL của ảnh
@@ -50,6 +143,8 @@ async def upload_image_to_cloudinary(file_content: bytes, folder: str = "uploads
             "height": upload_result.get("height"),
             "bytes": upload_result.get("bytes")
         }
+    except HTTPException:
+        raise
     except Exception as e:
         raise Exception(f"Cloudinary upload failed: {str(e)}")
 
@@ -65,11 +160,108 @@ async def delete_image_from_cloudinary(public_id: str):
         dict: Kết quả xóa
     """
     try:
-        result = cloudinary.uploader.destroy(public_id, resource_type="image")
+        result = await run_in_cloudinary_pool(cloudinary.uploader.destroy, public_id, resource_type="image", timeout=CLOUDINARY_TIMEOUT)
         return {
             "status": "success" if result.get("result") == "ok" else "failed",
             "result": result
         }
+    except HTTPException:
+        raise
     except Exception as e:
         raise Exception(f"Cloudinary delete failed: {str(e)}")
 
+
+def sign_upload_params(params: dict) -> dict:
+    """Ký tham số upload để client upload thẳng lên Cloudinary (byte ảnh không đi qua API server)
+
+    Returns:
+        dict: Tham số gửi kèm file tới upload_url (đã có signature và api_key)
+    """
+    config = cloudinary.config()
+    return {
+        **params,
+        "signature": api_sign_request(params, config.api_secret),
+        "api_key": config.api_key,
+        "upload_url": f"https://api.cloudinary.com/v1_1/{config.cloud_name}/image/upload",
+    }
+
+
+def verify_upload_signature(public_id: str, version, signature: str) -> bool:
+    """Kiểm tra signature trong response upload của Cloudinary (chỉ ký public_id và version)"""
+    return verify_api_response_signature(public_id, version, signature)
+
+
+async def get_cloudinary_resource(public_id: str):
+    """
+    Lấy thông tin ảnh đã upload (Admin API): bytes, width, height, format, etag, created_at, colors...
+    
+    Raises:
+        HTTPException 404 nếu ảnh không tồn tại
+    """
+    try:
+        return await run_in_cloudinary_pool(cloudinary.api.resource, public_id, resource_type="image", colors=True, timeout=CLOUDINARY_TIMEOUT)
+    except NotFound:
+        raise HTTPException(status_code=404, detail="Image not found on Cloudinary")
+
+
+# Cache URL đã tính (cloudinary_url tương đối chậm, cùng ảnh được trả về ở nhiều response)
+@lru_cache(maxsize=4096)
+def cloudinary_delivery_url(url: str, width: int, dpr: int = None) -> Optional[str]:
+    """URL Cloudinary đã tối ưu (f_auto, q_auto, giới hạn chiều rộng) tính local, không gọi API
+
+    Returns:
+        None nếu url không phải ảnh đã upload lên Cloudinary của project
+    """
+    match = CLOUDINARY_UPLOAD_URL.match(url)
+    if match is None or match["cloud"] != cloudinary.config().cloud_name:
+        return None
+    transformation = {"width": width, "crop": "limit", "fetch_format": "auto", "quality": "auto"}
+    if dpr is not None:
+        transformation["dpr"] = f"{dpr:.1f}"
+    delivery_url, _ = cloudinary_url(match["public_id"], version=match["version"], transformation=[transformation], secure=True)
+    return delivery_url
+
+
+def delivery_urls(url: str, img: str) -> Optional[Dict[str, str]]:
+    """{"src", "srcset"} của ảnh theo preset (srcset 1x/2x) hoặc theo tất cả preset (img=srcset)"""
+    if img == CLOUDINARY_SRCSET:
+        src = cloudinary_delivery_url(url, CLOUDINARY_IMAGE_PRESETS[CLOUDINARY_DEFAULT_PRESET])
+        if src is None:
+            return None
+        srcset = [f"{cloudinary_delivery_url(url, width)} {width}w" for width in sorted(CLOUDINARY_IMAGE_PRESETS.values())]
+    else:
+        width = CLOUDINARY_IMAGE_PRESETS[img]
+        src = cloudinary_delivery_url(url, width)
+        if src is None:
+            return None
+        srcset = [f"{cloudinary_delivery_url(url, width, dpr)} {dpr}x" for dpr in CLOUDINARY_DPRS]
+    return {"src": src, "srcset": ", ".join(srcset)}
+
+
+def _add_delivery_urls(value: Any, img: str) -> Any:
+    if isinstance(value, list):
+        return [_add_delivery_urls(item, img) for item in value]
+    if not isinstance(value, dict):
+        return value
+    result = {}
+    for key, item in value.items():
+        result[key] = _add_delivery_urls(item, img)
+        if key in IMAGE_URL_COLUMNS and isinstance(item, str):
+            urls = delivery_urls(item, img)
+            if urls is not None:
+                result[f"{key}_src"] = urls["src"]
+                result[f"{key}_srcset"] = urls["srcset"]
+    return result
+
+
+def with_delivery_urls(content: Any, img: Optional[str]) -> Any:
+    """Thêm <cột>_src và <cột>_srcset cạnh các cột URL ảnh trong response (img: thumb | card | full | srcset)
+
+    Trả về bản copy, không sửa content (có thể đang nằm trong public cache)
+    """
+    if not img:
+        return content
+    if img != CLOUDINARY_SRCSET and img not in CLOUDINARY_IMAGE_PRESETS:
+        options = " | ".join([*CLOUDINARY_IMAGE_PRESETS, CLOUDINARY_SRCSET])
+        raise HTTPException(status_code=400, detail=f"Invalid img: {img} (expected {options})")
+    return _add_delivery_urls(content, img)
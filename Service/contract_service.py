@@ -1,6 +1,14 @@
+from typing import List
 from fastapi import HTTPException
-from Entity.contract import CreateContractRequest, UpdateContractRequest
-from Service.base_service import get_user_and_client
+from postgrest import CountMethod, ReturnMethod
+from Entity.contract import CreateContractRequest, UpdateContractRequest, BatchUpdateContractRequest
+from Entity.batch import BatchDeleteRequest
+from Service.base_service import get_user_and_client, page_limit, select_page, page_result, allowed_columns, select_columns, update_or_select
+from Service.public_cache import get_public_cache, set_public_cache, invalidate_public_cache
+from Service.batch_service import BatchService
+
+# Các cột client được chọn qua fields=
+CONTRACT_COLUMNS = allowed_columns(CreateContractRequest, UpdateContractRequest)
 
 
 class ContractService:
@@ -8,12 +16,13 @@ class ContractService:
     async def create_contract(data: CreateContractRequest, token: str):
         """Tạo contract mới"""
         try:
-            user_id, client = get_user_and_client(token)
+            user_id, client = await get_user_and_client(token)
             insert_data = data.model_dump()
             insert_data["profile_id"] = user_id
-            response = client.table("contracts").insert(insert_data).execute()
+            response = await client.table("contracts").insert(insert_data).execute()
             if not response.data:
                 raise HTTPException(status_code=500, detail="Failed to create contract")
+            await invalidate_public_cache(user_id, "contracts")
             return {"status": "success", "message": "Contract created successfully", "data": response.data[0]}
         except HTTPException:
             raise
@@ -21,23 +30,24 @@ class ContractService:
             raise HTTPException(status_code=500, detail=f"Failed to create contract: {str(e)}")
     
     @staticmethod
-    async def get_contracts(token: str):
+    async def get_contracts(token: str, limit: int = None, cursor: str = None, fields: str = None):
         """Lấy tất cả contracts của user"""
         try:
-            user_id, client = get_user_and_client(token)
-            response = client.table("contracts").select("*").eq("profile_id", user_id).execute()
-            return {"status": "success", "data": response.data if response.data else [], "count": len(response.data) if response.data else 0}
+            user_id, client = await get_user_and_client(token)
+            limit = page_limit(limit)
+            response = await select_page(client.table("contracts"), select_columns(fields, CONTRACT_COLUMNS), limit, cursor).eq("profile_id", user_id).execute()
+            return page_result(response.data, limit, response.count)
         except HTTPException:
             raise
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Failed to get contracts: {str(e)}")
     
     @staticmethod
-    async def get_contract(contract_id: str, token: str):
+    async def get_contract(contract_id: str, token: str, fields: str = None):
         """Lấy contract theo ID"""
         try:
-            user_id, client = get_user_and_client(token)
-            response = client.table("contracts").select("*").eq("id", contract_id).eq("profile_id", user_id).execute()
+            user_id, client = await get_user_and_client(token)
+            response = await client.table("contracts").select(select_columns(fields, CONTRACT_COLUMNS)).eq("id", contract_id).eq("profile_id", user_id).execute()
             if not response.data:
                 raise HTTPException(status_code=404, detail="Contract not found")
             return {"status": "success", "data": response.data[0]}
@@ -50,15 +60,13 @@ class ContractService:
     async def update_contract(contract_id: str, data: UpdateContractRequest, token: str):
         """Cập nhật contract"""
         try:
-            user_id, client = get_user_and_client(token)
-            check = client.table("contracts").select("id").eq("id", contract_id).eq("profile_id", user_id).execute()
-            if not check.data:
-                raise HTTPException(status_code=404, detail="Contract not found")
-            
+            user_id, client = await get_user_and_client(token)
             update_data = data.model_dump(exclude_none=True)
-            response = client.table("contracts").update(update_data).eq("id", contract_id).execute()
+            response = await update_or_select(client, "contracts", update_data).eq("id", contract_id).eq("profile_id", user_id).execute()
             if not response.data:
-                raise HTTPException(status_code=500, detail="Failed to update contract")
+                raise HTTPException(status_code=404, detail="Contract not found")
+            if update_data:
+                await invalidate_public_cache(user_id, "contracts")
             return {"status": "success", "message": "Contract updated successfully", "data": response.data[0]}
         except HTTPException:
             raise
@@ -69,12 +77,12 @@ class ContractService:
     async def delete_contract(contract_id: str, token: str):
         """Xóa contract"""
         try:
-            user_id, client = get_user_and_client(token)
-            check = client.table("contracts").select("id").eq("id", contract_id).eq("profile_id", user_id).execute()
-            if not check.data:
+            user_id, client = await get_user_and_client(token)
+            # Không cần trả về dòng đã xóa, chỉ cần số dòng bị xóa
+            response = await client.table("contracts").delete(count=CountMethod.exact, returning=ReturnMethod.minimal).eq("id", contract_id).eq("profile_id", user_id).execute()
+            if not response.count:
                 raise HTTPException(status_code=404, detail="Contract not found")
-            
-            response = client.table("contracts").delete().eq("id", contract_id).execute()
+            await invalidate_public_cache(user_id, "contracts")
             return {"status": "success", "message": "Contract deleted successfully"}
         except HTTPException:
             raise
@@ -82,13 +90,56 @@ class ContractService:
             raise HTTPException(status_code=500, detail=f"Failed to delete contract: {str(e)}")
     
     @staticmethod
-    async def get_public_contracts(user_id: str):
+    async def create_contracts(data: List[CreateContractRequest], token: str):
+        """Tạo nhiều contract trong 1 câu insert"""
+        try:
+            user_id, client = await get_user_and_client(token)
+            return await BatchService.create(client, user_id, "contracts", ("contracts",), data)
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Failed to create contracts: {str(e)}")
+    
+    @staticmethod
+    async def update_contracts(data: List[BatchUpdateContractRequest], token: str):
+        """Cập nhật nhiều contract, trả về kết quả từng item"""
+        try:
+            user_id, client = await get_user_and_client(token)
+            return await BatchService.update(client, user_id, "contracts", ("contracts",), data)
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Failed to update contracts: {str(e)}")
+    
+    @staticmethod
+    async def delete_contracts(data: BatchDeleteRequest, token: str):
+        """Xóa nhiều contract trong 1 câu delete, trả về kết quả từng item"""
+        try:
+            user_id, client = await get_user_and_client(token)
+            return await BatchService.delete(client, user_id, "contracts", ("contracts",), data.ids)
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Failed to delete contracts: {str(e)}")
+    
+    @staticmethod
+    async def get_public_contracts(user_id: str, limit: int = None, cursor: str = None, fields: str = None):
         """Lấy tất cả contracts public của user (không cần token)"""
         try:
+            # Chỉ cache trang đầu với limit và fields mặc định
+            first_page = limit is None and cursor is None and fields is None
+            if first_page:
+                cached = get_public_cache(user_id, "contracts")
+                if cached is not None:
+                    return cached
             from Service.base_service import get_public_client
             client = get_public_client()
-            response = client.table("contracts").select("*").eq("profile_id", user_id).execute()
-            return {"status": "success", "data": response.data if response.data else [], "count": len(response.data) if response.data else 0}
+            limit = page_limit(limit)
+            response = await select_page(client.table("contracts"), select_columns(fields, CONTRACT_COLUMNS), limit, cursor).eq("profile_id", user_id).execute()
+            result = page_result(response.data, limit, response.count)
+            return set_public_cache(user_id, "contracts", result) if first_page else result
+        except HTTPException:
+            raise
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Failed to get public contracts: {str(e)}")
 
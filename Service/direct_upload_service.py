@@ -0,0 +1,131 @@
+import os
+import time
+import uuid
+from datetime import datetime
+from fastapi import HTTPException
+from Entity.upload import ConfirmUploadRequest
+from Service.base_service import get_user_and_client
+from Service.asset_service import AssetService
+from Service.cloudinary_service import sign_upload_params, verify_upload_signature, get_cloudinary_resource, delete_image_from_cloudinary
+from Service.upload_service import MAX_UPLOAD_BYTES, MAX_IMAGE_DIMENSION, MAX_IMAGE_PIXELS, check_dimensions
+
+# Thời gian (giây) client được dùng tham số đã ký, upload sau thời gian này bị từ chối khi xác nhận
+# (Cloudinary tự từ chối signature cũ hơn 1 giờ)
+SIGNED_UPLOAD_TTL = int(os.getenv("SIGNED_UPLOAD_TTL", "600"))
+
+# Loại ảnh -> thư mục trên Cloudinary (giống upload qua server)
+DIRECT_UPLOAD_FOLDERS = {"images": "uploads/images", "products": "uploads/products"}
+# Định dạng theo cách Cloudinary đặt tên (jpeg là "jpg")
+DIRECT_UPLOAD_FORMATS = ("jpg", "png", "gif", "webp", "avif")
+
+
+def _issued_at(public_id: str) -> int:
+    # public_id có dạng <folder>/<user_id>/<timestamp>-<nonce>
+    try:
+        return int(public_id.rsplit("/", 1)[-1].split("-", 1)[0])
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid public_id")
+
+
+def _check_resource(resource: dict, issued_at: int) -> None:
+    """Kiểm tra ảnh client đã upload: thời hạn của signature, định dạng, dung lượng, kích thước"""
+    created_at = datetime.fromisoformat(resource["created_at"].replace("Z", "+00:00")).timestamp()
+    if created_at - issued_at > SIGNED_UPLOAD_TTL:
+        raise HTTPException(status_code=400, detail="Signed upload expired")
+    if resource.get("format") not in DIRECT_UPLOAD_FORMATS:
+        raise HTTPException(status_code=415, detail="File không phải ảnh hợp lệ (jpeg, png, gif, webp, avif)")
+    if resource.get("bytes", 0) > MAX_UPLOAD_BYTES:
+        raise HTTPException(status_code=413, detail=f"File quá lớn, tối đa {MAX_UPLOAD_BYTES} bytes")
+    check_dimensions(resource.get("width", 0), resource.get("height", 0))
+
+
+class DirectUploadService:
+    @staticmethod
+    async def create_signed_upload(token: str, kind: str = "images"):
+        """Tạo tham số đã ký để client upload ảnh thẳng lên Cloudinary
+
+        public_id gắn với user và thời điểm ký nên không dùng lại được cho user khác / sau khi hết hạn
+        """
+        try:
+            user_id, _ = await get_user_and_client(token)
+            folder = DIRECT_UPLOAD_FOLDERS.get(kind)
+            if folder is None:
+                raise HTTPException(status_code=400, detail=f"Invalid upload folder: {kind}")
+            timestamp = int(time.time())
+            params = sign_upload_params({
+                "public_id": f"{folder}/{user_id}/{timestamp}-{uuid.uuid4().hex}",
+                "timestamp": timestamp,
+                "allowed_formats": ",".join(DIRECT_UPLOAD_FORMATS),
+            })
+            return {
+                "status": "success",
+                "params": params,
+                "expires_at": timestamp + SIGNED_UPLOAD_TTL,
+                # Cloudinary không giới hạn dung lượng / kích thước theo signature: client tự kiểm tra trước,
+                # server kiểm tra lại khi xác nhận
+                "max_bytes": MAX_UPLOAD_BYTES,
+                "max_dimension": MAX_IMAGE_DIMENSION,
+                "max_pixels": MAX_IMAGE_PIXELS
+            }
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Failed to sign upload: {str(e)}")
+
+    @staticmethod
+    async def confirm_upload(data: ConfirmUploadRequest, token: str):
+        """Xác nhận ảnh client đã upload thẳng lên Cloudinary và lưu vào asset index
+
+        Ảnh không hợp lệ (quá hạn, sai định dạng, quá lớn) bị xóa khỏi Cloudinary
+        """
+        try:
+            user_id, _ = await get_user_and_client(token)
+            kind = next((kind for kind, folder in DIRECT_UPLOAD_FOLDERS.items() if data.public_id.startswith(f"{folder}/{user_id}/")), None)
+            if kind is None or not verify_upload_signature(data.public_id, data.version, data.signature):
+                raise HTTPException(status_code=400, detail="Invalid upload signature")
+            issued_at = _issued_at(data.public_id)
+
+            # Không tin thông tin client gửi lên, lấy lại từ Cloudinary
+            resource = await get_cloudinary_resource(data.public_id)
+            try:
+                _check_resource(resource, issued_at)
+            except HTTPException:
+                await delete_image_from_cloudinary(data.public_id)
+                raise
+
+            # Không có file trên server nên không tính được BlurHash, màu chủ đạo lấy từ Cloudinary
+            colors = resource.get("colors") or [[None]]
+            asset = {
+                "image_url": resource["secure_url"],
+                "public_id": data.public_id,
+                "width": resource.get("width"),
+                "height": resource.get("height"),
+                "dominant_color": colors[0][0].lower() if colors[0][0] else None,
+                "blurhash": None
+            }
+            # Etag của Cloudinary là MD5 nội dung ảnh. Upload qua server dùng key "<folder>:<sha256>" (server không có
+            # MD5, Cloudinary không trả SHA-256) nên 2 cách upload có namespace riêng: cùng ảnh upload theo 2 cách
+            # được lưu 2 lần, dedup chỉ có tác dụng giữa các upload cùng cách và cùng folder
+            content_hash = f"{kind}:md5:{resource['etag']}" if resource.get("etag") else None
+            existing = await AssetService.find(content_hash) if content_hash else None
+            deduplicated = existing is not None and existing.get("public_id") != data.public_id
+            if deduplicated:
+                # Ảnh giống hệt đã có -> dùng asset cũ, xóa bản vừa upload
+                await delete_image_from_cloudinary(data.public_id)
+                asset = existing
+            elif existing is None and content_hash:
+                await AssetService.register(content_hash, asset)
+            # existing có cùng public_id: confirm lặp lại (vd: client retry), asset đã có trong index, không làm gì thêm
+
+            return {
+                "status": "success",
+                "message": "Upload thành công",
+                **asset,
+                "format": resource.get("format"),
+                "bytes": resource.get("bytes"),
+                "deduplicated": deduplicated
+            }
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Failed to confirm upload: {str(e)}")
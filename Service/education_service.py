@@ -1,6 +1,14 @@
+from typing import List
 from fastapi import HTTPException
-from Entity.education import CreateEducationRequest, UpdateEducationRequest
-from Service.base_service import get_user_and_client, serialize_dates
+from postgrest import CountMethod, ReturnMethod
+from Entity.education import CreateEducationRequest, UpdateEducationRequest, BatchUpdateEducationRequest
+from Entity.batch import BatchDeleteRequest
+from Service.base_service import get_user_and_client, serialize_dates, page_limit, select_page, page_result, allowed_columns, select_columns, update_or_select
+from Service.public_cache import get_public_cache, set_public_cache, invalidate_public_cache
+from Service.batch_service import BatchService
+
+# Các cột client được chọn qua fields=
+EDUCATION_COLUMNS = allowed_columns(CreateEducationRequest, UpdateEducationRequest)
 
 
 class EducationService:
@@ -8,14 +16,15 @@ class EducationService:
     async def create_education(data: CreateEducationRequest, token: str):
         """Tạo education mới"""
         try:
-            user_id, client = get_user_and_client(token)
+            user_id, client = await get_user_and_client(token)
             insert_data = data.model_dump()
             insert_data["profile_id"] = user_id
             # Serialize date objects thành ISO format strings
             insert_data = serialize_dates(insert_data)
-            response = client.table("educations").insert(insert_data).execute()
+            response = await client.table("educations").insert(insert_data).execute()
             if not response.data:
                 raise HTTPException(status_code=500, detail="Failed to create education")
+            await invalidate_public_cache(user_id, "educations")
             return {"status": "success", "message": "Education created successfully", "data": response.data[0]}
         except HTTPException:
             raise
@@ -23,23 +32,24 @@ class EducationService:
             raise HTTPException(status_code=500, detail=f"Failed to create education: {str(e)}")
     
     @staticmethod
-    async def get_educations(token: str):
+    async def get_educations(token: str, limit: int = None, cursor: str = None, fields: str = None):
         """Lấy tất cả educations của user"""
         try:
-            user_id, client = get_user_and_client(token)
-            response = client.table("educations").select("*").eq("profile_id", user_id).execute()
-            return {"status": "success", "data": response.data if response.data else [], "count": len(response.data) if response.data else 0}
+            user_id, client = await get_user_and_client(token)
+            limit = page_limit(limit)
+            response = await select_page(client.table("educations"), select_columns(fields, EDUCATION_COLUMNS), limit, cursor).eq("profile_id", user_id).execute()
+            return page_result(response.data, limit, response.count)
         except HTTPException:
             raise
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Failed to get educations: {str(e)}")
     
     @staticmethod
-    async def get_education(education_id: str, token: str):
+    async def get_education(education_id: str, token: str, fields: str = None):
         """Lấy education theo ID"""
         try:
-            user_id, client = get_user_and_client(token)
-            response = client.table("educations").select("*").eq("id", education_id).eq("profile_id", user_id).execute()
+            user_id, client = await get_user_and_client(token)
+            response = await client.table("educations").select(select_columns(fields, EDUCATION_COLUMNS)).eq("id", education_id).eq("profile_id", user_id).execute()
             if not response.data:
                 raise HTTPException(status_code=404, detail="Education not found")
             return {"status": "success", "data": response.data[0]}
@@ -52,17 +62,15 @@ class EducationService:
     async def update_education(education_id: str, data: UpdateEducationRequest, token: str):
         """Cập nhật education"""
         try:
-            user_id, client = get_user_and_client(token)
-            check = client.table("educations").select("id").eq("id", education_id).eq("profile_id", user_id).execute()
-            if not check.data:
-                raise HTTPException(status_code=404, detail="Education not found")
-            
+            user_id, client = await get_user_and_client(token)
             update_data = data.model_dump(exclude_none=True)
             # Serialize date objects thành ISO format strings
             update_data = serialize_dates(update_data)
-            response = client.table("educations").update(update_data).eq("id", education_id).execute()
+            response = await update_or_select(client, "educations", update_data).eq("id", education_id).eq("profile_id", user_id).execute()
             if not response.data:
-                raise HTTPException(status_code=500, detail="Failed to update education")
+                raise HTTPException(status_code=404, detail="Education not found")
+            if update_data:
+                await invalidate_public_cache(user_id, "educations")
             return {"status": "success", "message": "Education updated successfully", "data": response.data[0]}
         except HTTPException:
             raise
@@ -73,12 +81,12 @@ class EducationService:
     async def delete_education(education_id: str, token: str):
         """Xóa education"""
         try:
-            user_id, client = get_user_and_client(token)
-            check = client.table("educations").select("id").eq("id", education_id).eq("profile_id", user_id).execute()
-            if not check.data:
+            user_id, client = await get_user_and_client(token)
+            # Không cần trả về dòng đã xóa, chỉ cần số dòng bị xóa
+            response = await client.table("educations").delete(count=CountMethod.exact, returning=ReturnMethod.minimal).eq("id", education_id).eq("profile_id", user_id).execute()
+            if not response.count:
                 raise HTTPException(status_code=404, detail="Education not found")
-            
-            response = client.table("educations").delete().eq("id", education_id).execute()
+            await invalidate_public_cache(user_id, "educations")
             return {"status": "success", "message": "Education deleted successfully"}
         except HTTPException:
             raise
@@ -86,13 +94,56 @@ class EducationService:
             raise HTTPException(status_code=500, detail=f"Failed to delete education: {str(e)}")
     
     @staticmethod
-    async def get_public_educations(user_id: str):
+    async def create_educations(data: List[CreateEducationRequest], token: str):
+        """Tạo nhiều education trong 1 câu insert"""
+        try:
+            user_id, client = await get_user_and_client(token)
+            return await BatchService.create(client, user_id, "educations", ("educations",), data)
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Failed to create educations: {str(e)}")
+    
+    @staticmethod
+    async def update_educations(data: List[BatchUpdateEducationRequest], token: str):
+        """Cập nhật nhiều education, trả về kết quả từng item"""
+        try:
+            user_id, client = await get_user_and_client(token)
+            return await BatchService.update(client, user_id, "educations", ("educations",), data)
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Failed to update educations: {str(e)}")
+    
+    @staticmethod
+    async def delete_educations(data: BatchDeleteRequest, token: str):
+        """Xóa nhiều education trong 1 câu delete, trả về kết quả từng item"""
+        try:
+            user_id, client = await get_user_and_client(token)
+            return await BatchService.delete(client, user_id, "educations", ("educations",), data.ids)
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Failed to delete educations: {str(e)}")
+    
+    @staticmethod
+    async def get_public_educations(user_id: str, limit: int = None, cursor: str = None, fields: str = None):
         """Lấy tất cả educations public của user (không cần token)"""
         try:
+            # Chỉ cache trang đầu với limit và fields mặc định
+            first_page = limit is None and cursor is None and fields is None
+            if first_page:
+                cached = get_public_cache(user_id, "educations")
+                if cached is not None:
+                    return cached
             from Service.base_service import get_public_client
             client = get_public_client()
-            response = client.table("educations").select("*").eq("profile_id", user_id).execute()
-            return {"status": "success", "data": response.data if response.data else [], "count": len(response.data) if response.data else 0}
+            limit = page_limit(limit)
+            response = await select_page(client.table("educations"), select_columns(fields, EDUCATION_COLUMNS), limit, cursor).eq("profile_id", user_id).execute()
+            result = page_result(response.data, limit, response.count)
+            return set_public_cache(user_id, "educations", result) if first_page else result
+        except HTTPException:
+            raise
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Failed to get public educations: {str(e)}")
 
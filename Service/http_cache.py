@@ -0,0 +1,96 @@
+import hashlib
+import os
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Any, Optional
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+# Cache-Control cho public GET routes: browser (max-age), CDN/Vercel edge (s-maxage)
+PUBLIC_MAX_AGE = int(os.getenv("PUBLIC_MAX_AGE", "0"))
+PUBLIC_S_MAXAGE = int(os.getenv("PUBLIC_S_MAXAGE", "60"))
+PUBLIC_STALE_WHILE_REVALIDATE = int(os.getenv("PUBLIC_STALE_WHILE_REVALIDATE", "300"))
+
+PUBLIC_CACHE_CONTROL = (
+    f"public, max-age={PUBLIC_MAX_AGE}, s-maxage={PUBLIC_S_MAXAGE}, "
+    f"stale-while-revalidate={PUBLIC_STALE_WHILE_REVALIDATE}"
+)
+
+
+def compute_etag(body: bytes) -> str:
+    """Strong ETag từ hash nội dung response"""
+    return '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+
+def parse_timestamp(value: Optional[str]) -> Optional[datetime]:
+    """Parse cột timestamp của Supabase (ISO format) thành datetime UTC"""
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.astimezone(timezone.utc).replace(microsecond=0)
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    if if_none_match.strip() == "*":
+        return True
+    # If-None-Match dùng weak comparison nên bỏ prefix W/
+    candidates = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return etag in candidates
+
+
+def _not_modified_since(if_modified_since: str, last_modified: datetime) -> bool:
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+    return last_modified <= since
+
+
+def render_json(content: Any) -> bytes:
+    """Serialize content giống JSONResponse của FastAPI"""
+    return JSONResponse(jsonable_encoder(content)).body
+
+
+def conditional_response(
+    request: Request,
+    body: bytes,
+    etag: Optional[str] = None,
+    last_modified: Optional[datetime] = None,
+    cache_control: str = PUBLIC_CACHE_CONTROL,
+) -> Response:
+    """Trả về JSON body đã serialize kèm ETag/Last-Modified/Cache-Control, hoặc 304 nếu client đã có bản mới nhất"""
+    etag = etag or compute_etag(body)
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if last_modified is not None:
+        headers["Last-Modified"] = format_datetime(last_modified, usegmt=True)
+
+    if_none_match = request.headers.get("if-none-match")
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_none_match is not None:
+        not_modified = _etag_matches(if_none_match, etag)
+    elif if_modified_since is not None and last_modified is not None:
+        not_modified = _not_modified_since(if_modified_since, last_modified)
+    else:
+        not_modified = False
+
+    if not_modified:
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+def conditional_json_response(
+    request: Request,
+    content: Any,
+    last_modified: Optional[datetime] = None,
+    cache_control: str = PUBLIC_CACHE_CONTROL,
+) -> Response:
+    """Như conditional_response nhưng nhận dict/list và tự serialize"""
+    return conditional_response(request, render_json(content), last_modified=last_modified, cache_control=cache_control)
@@ -0,0 +1,240 @@
+import asyncio
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+try:
+    from PIL import Image, ImageOps, UnidentifiedImageError, features
+except ImportError:
+    Image = None
+
+from fastapi import HTTPException
+
+# Các bản resize cho local storage: tên -> chiều rộng tối đa (không phóng to ảnh nhỏ hơn)
+IMAGE_VARIANT_WIDTHS = {
+    name: int(width)
+    for name, width in (
+        item.split(":") for item in os.getenv("IMAGE_VARIANT_WIDTHS", "thumb:320,medium:768,large:1600").split(",") if item
+    )
+}
+# Định dạng của các bản resize, định dạng nào Pillow không hỗ trợ sẽ bị bỏ qua
+IMAGE_VARIANT_FORMATS = [fmt for fmt in os.getenv("IMAGE_VARIANT_FORMATS", "webp,avif").split(",") if fmt]
+IMAGE_VARIANT_QUALITY = {"webp": int(os.getenv("WEBP_QUALITY", "80")), "avif": int(os.getenv("AVIF_QUALITY", "60"))}
+IMAGE_PIPELINE_WORKERS = int(os.getenv("IMAGE_PIPELINE_WORKERS", str(min(4, os.cpu_count() or 1))))
+IMAGE_PIPELINE_ENABLED = Image is not None and os.getenv("IMAGE_PIPELINE", "on") != "off"
+
+# Định dạng của bản gốc (đã bỏ EXIF) theo định dạng phát hiện lúc upload
+ORIGINAL_SAVE_FORMATS = {"jpeg": "JPEG", "png": "PNG", "webp": "WEBP", "avif": "AVIF"}
+
+# Placeholder (màu chủ đạo + BlurHash) được tính trên bản thu nhỏ của ảnh
+PLACEHOLDER_SIZE = 32
+BLURHASH_COMPONENTS = (4, 3)
+BASE83_CHARS = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz#$%*+,-.:;=?@[]^_{|}~"
+
+_executor: Optional[ProcessPoolExecutor] = None
+
+
+def _supported_formats():
+    return [fmt for fmt in IMAGE_VARIANT_FORMATS if features.check(fmt)]
+
+
+def _base83(value: int, length: int) -> str:
+    return "".join(BASE83_CHARS[(value // 83 ** (length - index - 1)) % 83] for index in range(length))
+
+
+def _srgb_to_linear(value: int) -> float:
+    value = value / 255
+    return value / 12.92 if value <= 0.04045 else ((value + 0.055) / 1.055) ** 2.4
+
+
+def _linear_to_srgb(value: float) -> int:
+    value = max(0.0, min(1.0, value))
+    if value <= 0.0031308:
+        return int(value * 12.92 * 255 + 0.5)
+    return int((1.055 * value ** (1 / 2.4) - 0.055) * 255 + 0.5)
+
+
+def encode_blurhash(image, x_components: int = BLURHASH_COMPONENTS[0], y_components: int = BLURHASH_COMPONENTS[1]) -> str:
+    """Mã hóa ảnh RGB (đã thu nhỏ) thành chuỗi BlurHash (https://blurha.sh)"""
+    width, height = image.size
+    linear = [_srgb_to_linear(value) for value in range(256)]
+    data = image.tobytes()
+    pixels = [(linear[data[index]], linear[data[index + 1]], linear[data[index + 2]]) for index in range(0, len(data), 3)]
+    factors = []
+    for j in range(y_components):
+        cos_y = [math.cos(math.pi * j * y / height) for y in range(height)]
+        for i in range(x_components):
+            cos_x = [math.cos(math.pi * i * x / width) for x in range(width)]
+            normalisation = 1 if i == 0 and j == 0 else 2
+            red = green = blue = 0.0
+            for y in range(height):
+                for x in range(width):
+                    basis = cos_x[x] * cos_y[y]
+                    pixel = pixels[y * width + x]
+                    red += basis * pixel[0]
+                    green += basis * pixel[1]
+                    blue += basis * pixel[2]
+            scale = normalisation / (width * height)
+            factors.append((red * scale, green * scale, blue * scale))
+
+    dc, ac = factors[0], factors[1:]
+    blurhash = _base83((x_components - 1) + (y_components - 1) * 9, 1)
+    if ac:
+        quantised_max = max(0, min(82, int(math.floor(max(abs(value) for factor in ac for value in factor) * 166 - 0.5))))
+        max_value = (quantised_max + 1) / 166
+    else:
+        quantised_max, max_value = 0, 1
+    blurhash += _base83(quantised_max, 1)
+    blurhash += _base83((_linear_to_srgb(dc[0]) << 16) + (_linear_to_srgb(dc[1]) << 8) + _linear_to_srgb(dc[2]), 4)
+    for factor in ac:
+        red, green, blue = (
+            max(0, min(18, int(math.floor(math.copysign(abs(value / max_value) ** 0.5, value) * 9 + 9.5))))
+            for value in factor
+        )
+        blurhash += _base83(red * 19 * 19 + green * 19 + blue, 2)
+    return blurhash
+
+
+def _placeholder(image) -> Dict[str, Any]:
+    """Kích thước, màu chủ đạo (#rrggbb) và BlurHash của ảnh, để frontend giữ chỗ trước khi tải ảnh"""
+    small = image.convert("RGB")
+    small.thumbnail((PLACEHOLDER_SIZE, PLACEHOLDER_SIZE), Image.Resampling.BILINEAR)
+    palette_image = small.quantize(colors=5)
+    palette = palette_image.getpalette()
+    _, index = max(palette_image.getcolors())
+    return {
+        "width": image.width,
+        "height": image.height,
+        "dominant_color": "#{:02x}{:02x}{:02x}".format(*palette[index * 3:index * 3 + 3]),
+        "blurhash": encode_blurhash(small),
+    }
+
+
+def _read_placeholder(source, max_pixels: int) -> Dict[str, Any]:
+    # source: đường dẫn hoặc file object; JPEG được decode ở độ phân giải thấp (draft) cho nhanh
+    Image.MAX_IMAGE_PIXELS = max_pixels
+    with Image.open(source) as opened:
+        width, height = opened.size
+        # EXIF orientation 5-8: ảnh hiển thị bị xoay 90 độ
+        if opened.getexif().get(0x0112, 1) in (5, 6, 7, 8):
+            width, height = height, width
+        opened.draft("RGB", (PLACEHOLDER_SIZE * 4, PLACEHOLDER_SIZE * 4))
+        image = ImageOps.exif_transpose(opened)
+        return {**_placeholder(image), "width": width, "height": height}
+
+
+def _process_image(source_path: str, image_format: str, max_pixels: int) -> Dict[str, Any]:
+    """Chạy trong worker process: decode ảnh 1 lần, ghi bản gốc đã bỏ EXIF và các bản resize
+
+    Trả về {"width", "height", "dominant_color", "blurhash", "variants": {name: {"width", "height", "files": {format: filename}}}}
+    """
+    Image.MAX_IMAGE_PIXELS = max_pixels
+    source = Path(source_path)
+    with Image.open(source) as opened:
+        # Ảnh động (GIF/WebP nhiều frame) giữ nguyên file gốc, không tạo bản resize
+        if getattr(opened, "is_animated", False):
+            return {**_placeholder(opened), "variants": {}}
+        opened.load()
+        icc_profile = opened.info.get("icc_profile")
+        # Xoay ảnh theo EXIF orientation trước khi bỏ EXIF
+        image = ImageOps.exif_transpose(opened)
+
+    save_format = ORIGINAL_SAVE_FORMATS.get(image_format)
+    if save_format is not None:
+        original = image.convert("RGB") if save_format == "JPEG" and image.mode not in ("RGB", "L") else image
+        # Lưu lại không kèm EXIF (vị trí GPS, thông tin máy chụp), giữ ICC profile để đúng màu
+        original.save(source, save_format, quality=90, optimize=True, icc_profile=icc_profile)
+
+    if image.mode not in ("RGB", "RGBA"):
+        image = image.convert("RGBA" if "A" in image.getbands() or "transparency" in image.info else "RGB")
+
+    variants = {}
+    last_width = None
+    for name, max_width in sorted(IMAGE_VARIANT_WIDTHS.items(), key=lambda item: item[1]):
+        width = min(max_width, image.width)
+        # Ảnh nhỏ hơn các bản lớn thì dừng ở bản có đúng kích thước ảnh gốc
+        if width == last_width:
+            break
+        last_width = width
+        resized = image.copy()
+        resized.thumbnail((width, image.height), Image.Resampling.LANCZOS)
+        files = {}
+        for fmt in _supported_formats():
+            filename = f"{source.stem}-{name}.{fmt}"
+            resized.save(source.with_name(filename), fmt.upper(), quality=IMAGE_VARIANT_QUALITY.get(fmt, 80), icc_profile=icc_profile)
+            files[fmt] = filename
+        variants[name] = {"width": resized.width, "height": resized.height, "files": files}
+    return {**_placeholder(image), "variants": variants}
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=IMAGE_PIPELINE_WORKERS)
+    return _executor
+
+
+def shutdown_image_pipeline() -> None:
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+async def build_image_variants(source_path: Path, image_format: str, max_pixels: int) -> Optional[Dict[str, Any]]:
+    """Tạo các bản resize của ảnh đã lưu local trong process pool (CPU-bound, không chặn event loop)
+
+    Trả về None nếu pipeline bị tắt hoặc chưa cài Pillow
+    """
+    if not IMAGE_PIPELINE_ENABLED:
+        return None
+    loop = asyncio.get_running_loop()
+    try:
+        return await loop.run_in_executor(_get_executor(), _process_image, str(source_path), image_format, max_pixels)
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError, SyntaxError) as e:
+        raise HTTPException(status_code=400, detail=f"Không xử lý được ảnh: {str(e)}")
+
+
+async def build_image_placeholder(source, max_pixels: int) -> Dict[str, Any]:
+    """Kích thước, màu chủ đạo và BlurHash của ảnh (path hoặc file object, file object được seek về đầu)
+
+    Chạy trong thread (ảnh đã được thu nhỏ khi decode nên nhẹ), trả về {} nếu chưa cài Pillow
+    """
+    if Image is None:
+        return {}
+    try:
+        return await asyncio.to_thread(_read_placeholder, source, max_pixels)
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError, SyntaxError) as e:
+        raise HTTPException(status_code=400, detail=f"Không xử lý được ảnh: {str(e)}")
+    finally:
+        if hasattr(source, "seek"):
+            source.seek(0)
+
+
+def image_metadata(result: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Các cột metadata lưu cùng URL ảnh (images / productImages)"""
+    result = result or {}
+    return {key: result.get(key) for key in ("width", "height", "dominant_color", "blurhash")}
+
+
+def variant_urls(base_url: str, result: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """URL của từng bản resize: {name: {"width", "height", format: url}}"""
+    if not result:
+        return {}
+    return {
+        name: {"width": variant["width"], "height": variant["height"], **{fmt: base_url + filename for fmt, filename in variant["files"].items()}}
+        for name, variant in result["variants"].items()
+    }
+
+
+def build_srcset(base_url: str, result: Optional[Dict[str, Any]]) -> Dict[str, str]:
+    """srcset cho thẻ <img>/<source> theo từng định dạng, vd: {"webp": "a-thumb.webp 320w, a-medium.webp 768w"}"""
+    if not result:
+        return {}
+    srcset: Dict[str, list] = {}
+    for variant in result["variants"].values():
+        for fmt, filename in variant["files"].items():
+            srcset.setdefault(fmt, []).append(f"{base_url}{filename} {variant['width']}w")
+    return {fmt: ", ".join(entries) for fmt, entries in srcset.items()}
@@ -1,6 +1,14 @@
+from typing import List
 from fastapi import HTTPException
-from Entity.image import CreateImageRequest, UpdateImageRequest
-from Service.base_service import get_user_and_client
+from Entity.image import CreateImageRequest, UpdateImageRequest, BatchUpdateImageRequest
+from Entity.batch import BatchDeleteRequest
+from Service.base_service import get_user_and_client, insert_payload, page_limit, select_page, page_result, allowed_columns, select_columns, update_or_select
+from Service.public_cache import get_public_cache, set_public_cache, invalidate_public_cache
+from Service.batch_service import BatchService, current_urls
+from Service.asset_service import AssetService
+
+# Các cột client được chọn qua fields=
+IMAGE_COLUMNS = allowed_columns(CreateImageRequest, UpdateImageRequest)
 
 
 class ImageService:
@@ -8,12 +16,14 @@ class ImageService:
     async def create_image(data: CreateImageRequest, token: str):
         """Tạo image mới"""
         try:
-            user_id, client = get_user_and_client(token)
-            insert_data = data.model_dump()
+            user_id, client = await get_user_and_client(token)
+            insert_data = insert_payload(data)
             insert_data["profile_id"] = user_id
-            response = client.table("images").insert(insert_data).execute()
+            response = await client.table("images").insert(insert_data).execute()
             if not response.data:
                 raise HTTPException(status_code=500, detail="Failed to create image")
+            await invalidate_public_cache(user_id, "images")
+            await AssetService.add_references(row.get("images_url") for row in response.data)
             return {"status": "success", "message": "Image created successfully", "data": response.data[0]}
         except HTTPException:
             raise
@@ -21,23 +31,24 @@ class ImageService:
             raise HTTPException(status_code=500, detail=f"Failed to create image: {str(e)}")
     
     @staticmethod
-    async def get_images(token: str):
+    async def get_images(token: str, limit: int = None, cursor: str = None, fields: str = None):
         """Lấy tất cả images của user"""
         try:
-            user_id, client = get_user_and_client(token)
-            response = client.table("images").select("*").eq("profile_id", user_id).execute()
-            return {"status": "success", "data": response.data if response.data else [], "count": len(response.data) if response.data else 0}
+            user_id, client = await get_user_and_client(token)
+            limit = page_limit(limit)
+            response = await select_page(client.table("images"), select_columns(fields, IMAGE_COLUMNS), limit, cursor).eq("profile_id", user_id).execute()
+            return page_result(response.data, limit, response.count)
         except HTTPException:
             raise
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Failed to get images: {str(e)}")
     
     @staticmethod
-    async def get_image(image_id: str, token: str):
+    async def get_image(image_id: str, token: str, fields: str = None):
         """Lấy image theo ID"""
         try:
-            user_id, client = get_user_and_client(token)
-            response = client.table("images").select("*").eq("id", image_id).eq("profile_id", user_id).execute()
+            user_id, client = await get_user_and_client(token)
+            response = await client.table("images").select(select_columns(fields, IMAGE_COLUMNS)).eq("id", image_id).eq("profile_id", user_id).execute()
             if not response.data:
                 raise HTTPException(status_code=404, detail="Image not found")
             return {"status": "success", "data": response.data[0]}
@@ -50,16 +61,15 @@ class ImageService:
     async def update_image(image_id: str, data: UpdateImageRequest, token: str):
         """Cập nhật image"""
         try:
-            user_id, client = get_user_and_client(token)
-            # Verify ownership
-            check = client.table("images").select("id").eq("id", image_id).eq("profile_id", user_id).execute()
-            if not check.data:
-                raise HTTPException(status_code=404, detail="Image not found")
-            
+            user_id, client = await get_user_and_client(token)
             update_data = data.model_dump(exclude_none=True)
-            response = client.table("images").update(update_data).eq("id", image_id).execute()
+            old_urls = await current_urls(client, "images", "images_url", [image_id], lambda query: query.eq("profile_id", user_id)) if "images_url" in update_data else {}
+            response = await update_or_select(client, "images", update_data).eq("id", image_id).eq("profile_id", user_id).execute()
             if not response.data:
-                raise HTTPException(status_code=500, detail="Failed to update image")
+                raise HTTPException(status_code=404, detail="Image not found")
+            if update_data:
+                await invalidate_public_cache(user_id, "images")
+            await AssetService.replace_urls(old_urls, response.data, "images_url")
             return {"status": "success", "message": "Image updated successfully", "data": response.data[0]}
         except HTTPException:
             raise
@@ -70,13 +80,13 @@ class ImageService:
     async def delete_image(image_id: str, token: str):
         """Xóa image"""
         try:
-            user_id, client = get_user_and_client(token)
-            # Verify ownership
-            check = client.table("images").select("id").eq("id", image_id).eq("profile_id", user_id).execute()
-            if not check.data:
+            user_id, client = await get_user_and_client(token)
+            # Cần dòng đã xóa để lấy URL ảnh (giảm refcount của asset)
+            response = await client.table("images").delete().eq("id", image_id).eq("profile_id", user_id).execute()
+            if not response.data:
                 raise HTTPException(status_code=404, detail="Image not found")
-            
-            response = client.table("images").delete().eq("id", image_id).execute()
+            await invalidate_public_cache(user_id, "images")
+            await AssetService.release_urls(row.get("images_url") for row in response.data)
             return {"status": "success", "message": "Image deleted successfully"}
         except HTTPException:
             raise
@@ -84,14 +94,57 @@ class ImageService:
             raise HTTPException(status_code=500, detail=f"Failed to delete image: {str(e)}")
 
     @staticmethod
-    async def get_public_images(user_id: str):
+    async def create_images(data: List[CreateImageRequest], token: str):
+        """Tạo nhiều image trong 1 câu insert"""
+        try:
+            user_id, client = await get_user_and_client(token)
+            return await BatchService.create(client, user_id, "images", ("images",), data, url_column="images_url")
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Failed to create images: {str(e)}")
+    
+    @staticmethod
+    async def update_images(data: List[BatchUpdateImageRequest], token: str):
+        """Cập nhật nhiều image, trả về kết quả từng item"""
+        try:
+            user_id, client = await get_user_and_client(token)
+            return await BatchService.update(client, user_id, "images", ("images",), data, url_column="images_url")
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Failed to update images: {str(e)}")
+    
+    @staticmethod
+    async def delete_images(data: BatchDeleteRequest, token: str):
+        """Xóa nhiều image trong 1 câu delete, trả về kết quả từng item"""
+        try:
+            user_id, client = await get_user_and_client(token)
+            return await BatchService.delete(client, user_id, "images", ("images",), data.ids, url_column="images_url")
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Failed to delete images: {str(e)}")
+    
+    @staticmethod
+    async def get_public_images(user_id: str, limit: int = None, cursor: str = None, fields: str = None):
         """Lấy tất cả images public của user (không cần token)"""
         try:
+            # Chỉ cache trang đầu với limit và fields mặc định
+            first_page = limit is None and cursor is None and fields is None
+            if first_page:
+                cached = get_public_cache(user_id, "images")
+                if cached is not None:
+                    return cached
             # Tạo client mới với service role key để bypass RLS
             from Service.base_service import get_public_client
             client = get_public_client()
-            response = client.table("images").select("*").eq("profile_id", user_id).execute()
-            return {"status": "success", "data": response.data if response.data else [], "count": len(response.data) if response.data else 0}
+            limit = page_limit(limit)
+            response = await select_page(client.table("images"), select_columns(fields, IMAGE_COLUMNS), limit, cursor).eq("profile_id", user_id).execute()
+            result = page_result(response.data, limit, response.count)
+            return set_public_cache(user_id, "images", result) if first_page else result
+        except HTTPException:
+            raise
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Failed to get public images: {str(e)}")
 
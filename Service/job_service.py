@@ -1,6 +1,14 @@
+from typing import List
 from fastapi import HTTPException
-from Entity.job import CreateJobRequest, UpdateJobRequest
-from Service.base_service import get_user_and_client, serialize_dates
+from postgrest import CountMethod, ReturnMethod
+from Entity.job import CreateJobRequest, UpdateJobRequest, BatchUpdateJobRequest
+from Entity.batch import BatchDeleteRequest
+from Service.base_service import get_user_and_client, serialize_dates, page_limit, select_page, page_result, allowed_columns, select_columns, update_or_select
+from Service.public_cache import get_public_cache, set_public_cache, invalidate_public_cache
+from Service.batch_service import BatchService
+
+# Các cột client được chọn qua fields=
+JOB_COLUMNS = allowed_columns(CreateJobRequest, UpdateJobRequest)
 
 
 class JobService:
@@ -8,14 +16,15 @@ class JobService:
     async def create_job(data: CreateJobRequest, token: str):
         """Tạo job mới"""
         try:
-            user_id, client = get_user_and_client(token)
+            user_id, client = await get_user_and_client(token)
             insert_data = data.model_dump()
             insert_data["profile_id"] = user_id
             # Serialize date objects thành ISO format strings (start_date, end_date là string nên không ảnh hưởng)
             insert_data = serialize_dates(insert_data)
-            response = client.table("jobs").insert(insert_data).execute()
+            response = await client.table("jobs").insert(insert_data).execute()
             if not response.data:
                 raise HTTPException(status_code=500, detail="Failed to create job")
+            await invalidate_public_cache(user_id, "jobs")
             return {"status": "success", "message": "Job created successfully", "data": response.data[0]}
         except HTTPException:
             raise
@@ -23,23 +32,24 @@ class JobService:
             raise HTTPException(status_code=500, detail=f"Failed to create job: {str(e)}")
     
     @staticmethod
-    async def get_jobs(token: str):
+    async def get_jobs(token: str, limit: int = None, cursor: str = None, fields: str = None):
         """Lấy tất cả jobs của user"""
         try:
-            user_id, client = get_user_and_client(token)
-            response = client.table("jobs").select("*").eq("profile_id", user_id).execute()
-            return {"status": "success", "data": response.data if response.data else [], "count": len(response.data) if response.data else 0}
+            user_id, client = await get_user_and_client(token)
+            limit = page_limit(limit)
+            response = await select_page(client.table("jobs"), select_columns(fields, JOB_COLUMNS), limit, cursor).eq("profile_id", user_id).execute()
+            return page_result(response.data, limit, response.count)
         except HTTPException:
             raise
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Failed to get jobs: {str(e)}")
     
     @staticmethod
-    async def get_job(job_id: str, token: str):
+    async def get_job(job_id: str, token: str, fields: str = None):
         """Lấy job theo ID"""
         try:
-            user_id, client = get_user_and_client(token)
-            response = client.table("jobs").select("*").eq("id", job_id).eq("profile_id", user_id).execute()
+            user_id, client = await get_user_and_client(token)
+            response = await client.table("jobs").select(select_columns(fields, JOB_COLUMNS)).eq("id", job_id).eq("profile_id", user_id).execute()
             if not response.data:
                 raise HTTPException(status_code=404, detail="Job not found")
             return {"status": "success", "data": response.data[0]}
@@ -52,17 +62,15 @@ class JobService:
     async def update_job(job_id: str, data: UpdateJobRequest, token: str):
         """Cập nhật job"""
         try:
-            user_id, client = get_user_and_client(token)
-            check = client.table("jobs").select("id").eq("id", job_id).eq("profile_id", user_id).execute()
-            if not check.data:
-                raise HTTPException(status_code=404, detail="Job not found")
-            
+            user_id, client = await get_user_and_client(token)
             update_data = data.model_dump(exclude_none=True)
             # Serialize date objects thành ISO format strings (start_date, end_date là string nên không ảnh hưởng)
             update_data = serialize_dates(update_data)
-            response = client.table("jobs").update(update_data).eq("id", job_id).execute()
+            response = await update_or_select(client, "jobs", update_data).eq("id", job_id).eq("profile_id", user_id).execute()
             if not response.data:
-                raise HTTPException(status_code=500, detail="Failed to update job")
+                raise HTTPException(status_code=404, detail="Job not found")
+            if update_data:
+                await invalidate_public_cache(user_id, "jobs")
             return {"status": "success", "message": "Job updated successfully", "data": response.data[0]}
         except HTTPException:
             raise
@@ -73,12 +81,12 @@ class JobService:
     async def delete_job(job_id: str, token: str):
         """Xóa job"""
         try:
-            user_id, client = get_user_and_client(token)
-            check = client.table("jobs").select("id").eq("id", job_id).eq("profile_id", user_id).execute()
-            if not check.data:
+            user_id, client = await get_user_and_client(token)
+            # Không cần trả về dòng đã xóa, chỉ cần số dòng bị xóa
+            response = await client.table("jobs").delete(count=CountMethod.exact, returning=ReturnMethod.minimal).eq("id", job_id).eq("profile_id", user_id).execute()
+            if not response.count:
                 raise HTTPException(status_code=404, detail="Job not found")
-            
-            response = client.table("jobs").delete().eq("id", job_id).execute()
+            await invalidate_public_cache(user_id, "jobs")
             return {"status": "success", "message": "Job deleted successfully"}
         except HTTPException:
             raise
@@ -86,13 +94,56 @@ class JobService:
             raise HTTPException(status_code=500, detail=f"Failed to delete job: {str(e)}")
     
     @staticmethod
-    async def get_public_jobs(user_id: str):
+    async def create_jobs(data: List[CreateJobRequest], token: str):
+        """Tạo nhiều job trong 1 câu insert"""
+        try:
+            user_id, client = await get_user_and_client(token)
+            return await BatchService.create(client, user_id, "jobs", ("jobs",), data)
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Failed to create jobs: {str(e)}")
+    
+    @staticmethod
+    async def update_jobs(data: List[BatchUpdateJobRequest], token: str):
+        """Cập nhật nhiều job, trả về kết quả từng item"""
+        try:
+            user_id, client = await get_user_and_client(token)
+            return await BatchService.update(client, user_id, "jobs", ("jobs",), data)
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Failed to update jobs: {str(e)}")
+    
+    @staticmethod
+    async def delete_jobs(data: BatchDeleteRequest, token: str):
+        """Xóa nhiều job trong 1 câu delete, trả về kết quả từng item"""
+        try:
+            user_id, client = await get_user_and_client(token)
+            return await BatchService.delete(client, user_id, "jobs", ("jobs",), data.ids)
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Failed to delete jobs: {str(e)}")
+    
+    @staticmethod
+    async def get_public_jobs(user_id: str, limit: int = None, cursor: str = None, fields: str = None):
         """Lấy tất cả jobs public của user (không cần token)"""
         try:
+            # Chỉ cache trang đầu với limit và fields mặc định
+            first_page = limit is None and cursor is None and fields is None
+            if first_page:
+                cached = get_public_cache(user_id, "jobs")
+                if cached is not None:
+                    return cached
             from Service.base_service import get_public_client
             client = get_public_client()
-            response = client.table("jobs").select("*").eq("profile_id", user_id).execute()
-            return {"status": "success", "data": response.data if response.data else [], "count": len(response.data) if response.data else 0}
+            limit = page_limit(limit)
+            response = await select_page(client.table("jobs"), select_columns(fields, JOB_COLUMNS), limit, cursor).eq("profile_id", user_id).execute()
+            result = page_result(response.data, limit, response.count)
+            return set_public_cache(user_id, "jobs", result) if first_page else result
+        except HTTPException:
+            raise
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Failed to get public jobs: {str(e)}")
 
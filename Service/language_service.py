@@ -1,6 +1,14 @@
+from typing import List
 from fastapi import HTTPException
-from Entity.language import CreateLanguageRequest, UpdateLanguageRequest
-from Service.base_service import get_user_and_client
+from postgrest import CountMethod, ReturnMethod
+from Entity.language import CreateLanguageRequest, UpdateLanguageRequest, BatchUpdateLanguageRequest
+from Entity.batch import BatchDeleteRequest
+from Service.base_service import get_user_and_client, page_limit, select_page, page_result, allowed_columns, select_columns, update_or_select
+from Service.public_cache import get_public_cache, set_public_cache, invalidate_public_cache
+from Service.batch_service import BatchService
+
+# Các cột client được chọn qua fields=
+LANGUAGE_COLUMNS = allowed_columns(CreateLanguageRequest, UpdateLanguageRequest)
 
 
 class LanguageService:
@@ -8,12 +16,13 @@ class LanguageService:
     async def create_language(data: CreateLanguageRequest, token: str):
         """Tạo language mới"""
         try:
-            user_id, client = get_user_and_client(token)
+            user_id, client = await get_user_and_client(token)
             insert_data = data.model_dump()
             insert_data["profile_id"] = user_id
-            response = client.table("languages").insert(insert_data).execute()
+            response = await client.table("languages").insert(insert_data).execute()
             if not response.data:
                 raise HTTPException(status_code=500, detail="Failed to create language")
+            await invalidate_public_cache(user_id, "languages")
             return {"status": "success", "message": "Language created successfully", "data": response.data[0]}
         except HTTPException:
             raise
@@ -21,23 +30,24 @@ class LanguageService:
             raise HTTPException(status_code=500, detail=f"Failed to create language: {str(e)}")
     
     @staticmethod
-    async def get_languages(token: str):
+    async def get_languages(token: str, limit: int = None, cursor: str = None, fields: str = None):
         """Lấy tất cả languages của user"""
         try:
-            user_id, client = get_user_and_client(token)
-            response = client.table("languages").select("*").eq("profile_id", user_id).execute()
-            return {"status": "success", "data": response.data if response.data else [], "count": len(response.data) if response.data else 0}
+            user_id, client = await get_user_and_client(token)
+            limit = page_limit(limit)
+            response = await select_page(client.table("languages"), select_columns(fields, LANGUAGE_COLUMNS), limit, cursor).eq("profile_id", user_id).execute()
+            return page_result(response.data, limit, response.count)
         except HTTPException:
             raise
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Failed to get languages: {str(e)}")
     
     @staticmethod
-    async def get_language(language_id: str, token: str):
+    async def get_language(language_id: str, token: str, fields: str = None):
         """Lấy language theo ID"""
         try:
-            user_id, client = get_user_and_client(token)
-            response = client.table("languages").select("*").eq("id", language_id).eq("profile_id", user_id).execute()
+            user_id, client = await get_user_and_client(token)
+            response = await client.table("languages").select(select_columns(fields, LANGUAGE_COLUMNS)).eq("id", language_id).eq("profile_id", user_id).execute()
             if not response.data:
                 raise HTTPException(status_code=404, detail="Language not found")
             return {"status": "success", "data": response.data[0]}
@@ -50,15 +60,13 @@ class LanguageService:
     async def update_language(language_id: str, data: UpdateLanguageRequest, token: str):
         """Cập nhật language"""
         try:
-            user_id, client = get_user_and_client(token)
-            check = client.table("languages").select("id").eq("id", language_id).eq("profile_id", user_id).execute()
-            if not check.data:
-                raise HTTPException(status_code=404, detail="Language not found")
-            
+            user_id, client = await get_user_and_client(token)
             update_data = data.model_dump(exclude_none=True)
-            response = client.table("languages").update(update_data).eq("id", language_id).execute()
+            response = await update_or_select(client, "languages", update_data).eq("id", language_id).eq("profile_id", user_id).execute()
             if not response.data:
-                raise HTTPException(status_code=500, detail="Failed to update language")
+                raise HTTPException(status_code=404, detail="Language not found")
+            if update_data:
+                await invalidate_public_cache(user_id, "languages")
             return {"status": "success", "message": "Language updated successfully", "data": response.data[0]}
         except HTTPException:
             raise
@@ -69,12 +77,12 @@ class LanguageService:
     async def delete_language(language_id: str, token: str):
         """Xóa language"""
         try:
-            user_id, client = get_user_and_client(token)
-            check = client.table("languages").select("id").eq("id", language_id).eq("profile_id", user_id).execute()
-            if not check.data:
+            user_id, client = await get_user_and_client(token)
+            # Không cần trả về dòng đã xóa, chỉ cần số dòng bị xóa
+            response = await client.table("languages").delete(count=CountMethod.exact, returning=ReturnMethod.minimal).eq("id", language_id).eq("profile_id", user_id).execute()
+            if not response.count:
                 raise HTTPException(status_code=404, detail="Language not found")
-            
-            response = client.table("languages").delete().eq("id", language_id).execute()
+            await invalidate_public_cache(user_id, "languages")
             return {"status": "success", "message": "Language deleted successfully"}
         except HTTPException:
             raise
@@ -82,13 +90,56 @@ class LanguageService:
             raise HTTPException(status_code=500, detail=f"Failed to delete language: {str(e)}")
     
     @staticmethod
-    async def get_public_languages(user_id: str):
+    async def create_languages(data: List[CreateLanguageRequest], token: str):
+        """Tạo nhiều language trong 1 câu insert"""
+        try:
+            user_id, client = await get_user_and_client(token)
+            return await BatchService.create(client, user_id, "languages", ("languages",), data)
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Failed to create languages: {str(e)}")
+    
+    @staticmethod
+    async def update_languages(data: List[BatchUpdateLanguageRequest], token: str):
+        """Cập nhật nhiều language, trả về kết quả từng item"""
+        try:
+            user_id, client = await get_user_and_client(token)
+            return await BatchService.update(client, user_id, "languages", ("languages",), data)
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Failed to update languages: {str(e)}")
+    
+    @staticmethod
+    async def delete_languages(data: BatchDeleteRequest, token: str):
+        """Xóa nhiều language trong 1 câu delete, trả về kết quả từng item"""
+        try:
+            user_id, client = await get_user_and_client(token)
+            return await BatchService.delete(client, user_id, "languages", ("languages",), data.ids)
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Failed to delete languages: {str(e)}")
+    
+    @staticmethod
+    async def get_public_languages(user_id: str, limit: int = None, cursor: str = None, fields: str = None):
         """Lấy tất cả languages public của user (không cần token)"""
         try:
+            # Chỉ cache trang đầu với limit và fields mặc định
+            first_page = limit is None and cursor is None and fields is None
+            if first_page:
+                cached = get_public_cache(user_id, "languages")
+                if cached is not None:
+                    return cached
             from Service.base_service import get_public_client
             client = get_public_client()
-            response = client.table("languages").select("*").eq("profile_id", user_id).execute()
-            return {"status": "success", "data": response.data if response.data else [], "count": len(response.data) if response.data else 0}
+            limit = page_limit(limit)
+            response = await select_page(client.table("languages"), select_columns(fields, LANGUAGE_COLUMNS), limit, cursor).eq("profile_id", user_id).execute()
+            result = page_result(response.data, limit, response.count)
+            return set_public_cache(user_id, "languages", result) if first_page else result
+        except HTTPException:
+            raise
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Failed to get public languages: {str(e)}")
 
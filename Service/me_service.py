@@ -0,0 +1,59 @@
+from fastapi import HTTPException
+from Service.base_service import gather_sections, page_limit, select_page, page_result
+from Service.product_image_service import ProductImageService
+from Service.public_profile_service import PROFILE_SECTION_CONCURRENCY, PROFILE_SECTION_TIMEOUT
+
+# Tên section trong response -> bảng tương ứng (các bảng có cột profile_id)
+SECTION_TABLES = {
+    "images": "images",
+    "educations": "educations",
+    "jobs": "jobs",
+    "languages": "languages",
+    "contracts": "contracts",
+    "achievements": "achievements",
+    "products": "products",
+    "skills": "skills",
+    "targets": "target",
+}
+
+
+class MeService:
+    @staticmethod
+    async def get_me_all(user_id: str, client):
+        """Lấy profile và tất cả section của user đang đăng nhập (token đã được verify 1 lần bởi dependency)
+
+        Không dùng public cache vì dashboard cần dữ liệu mới nhất ngay sau khi sửa
+        """
+        try:
+            limit = page_limit()
+
+            async def load_profile():
+                response = await client.table("duong").select("*").eq("id", user_id).execute()
+                return {"status": "success", "data": response.data[0] if response.data else None}
+
+            def load_section(table: str):
+                async def load():
+                    response = await select_page(client.table(table), "*", limit).eq("profile_id", user_id).execute()
+                    return page_result(response.data, limit, response.count)
+                return load
+
+            async def load_product_images():
+                return await ProductImageService.list_owned_product_images(client, user_id, limit)
+
+            # Giữ thứ tự section giống /profile/public/all
+            loaders = {"profile": load_profile}
+            for name, table in SECTION_TABLES.items():
+                loaders[name] = load_section(table)
+                if name == "products":
+                    loaders["product_images"] = load_product_images
+
+            sections = await gather_sections(
+                loaders,
+                concurrency=PROFILE_SECTION_CONCURRENCY,
+                timeout=PROFILE_SECTION_TIMEOUT,
+            )
+            return {"status": "success", **sections}
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Failed to get user data: {str(e)}")
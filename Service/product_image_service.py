@@ -1,70 +1,132 @@
+from typing import List
 from fastapi import HTTPException
-from Entity.product_image import CreateProductImageRequest, UpdateProductImageRequest
-from Service.base_service import get_user_and_client, serialize_dates
+from supabase import PostgrestAPIError
+from Entity.product_image import CreateProductImageRequest, UpdateProductImageRequest, BatchUpdateProductImageRequest
+from Entity.batch import BatchDeleteRequest
+from Service.base_service import get_user_and_client, serialize_dates, insert_payload, image_metadata_params, page_limit, select_page, page_result, allowed_columns, select_columns
+from Service.public_cache import get_public_cache, set_public_cache, invalidate_public_cache
+from Service.batch_service import check_batch_size, unique_ids, delete_results, update_results, update_rows_by_id, current_urls
+from Service.asset_service import AssetService
+
+# Các cột client được chọn qua fields= (bảng productImages không có profile_id)
+PRODUCT_IMAGE_COLUMNS = allowed_columns(CreateProductImageRequest, UpdateProductImageRequest, base=("id",))
+# Lấy product image kèm product cha (inner join) để lọc theo chủ sở hữu trong cùng 1 request
+OWNER_EMBED = "products!inner(profile_id)"
+# PostgREST trả về mã lỗi này khi chưa tạo các function trong sql/product_image_functions.sql
+FUNCTION_NOT_FOUND_CODE = "PGRST202"
+
+_rpc_supported = True
+
+
+def _strip_owner(rows):
+    """Bỏ phần products được embed để giữ nguyên format response"""
+    for row in rows:
+        row.pop("products", None)
+    return rows
+
+
+async def _owned_write(client, function: str, params: dict, fallback):
+    """Ghi dữ liệu kèm kiểm tra quyền sở hữu bằng 1 RPC, fallback nếu database chưa có function"""
+    global _rpc_supported
+    if _rpc_supported:
+        try:
+            response = await client.rpc(function, params).execute()
+            return response.data or []
+        except PostgrestAPIError as e:
+            if e.code != FUNCTION_NOT_FOUND_CODE:
+                raise
+            _rpc_supported = False
+            print(f"Function {function} not found, falling back to join + write by id")
+    return await fallback()
+
+
+def _owned_select(fields: str = None) -> str:
+    return f"{select_columns(fields, PRODUCT_IMAGE_COLUMNS)}, {OWNER_EMBED}"
+
+
+async def _is_owned_image(client, image_id: str, user_id: str) -> bool:
+    check = await client.table("productImages").select(f"id, {OWNER_EMBED}").eq("id", image_id).eq("products.profile_id", user_id).execute()
+    return bool(check.data)
+
+
+async def _owned_image_ids(client, image_ids: List[str], user_id: str) -> List[str]:
+    """Lọc ra các image id thuộc product của user trong 1 request"""
+    response = await client.table("productImages").select(f"id, {OWNER_EMBED}").in_("id", image_ids).eq("products.profile_id", user_id).execute()
+    return [str(row["id"]) for row in response.data or []]
 
 
 class ProductImageService:
+    @staticmethod
+    async def list_owned_product_images(client, user_id: str, limit: int, cursor: str = None, fields: str = None):
+        """1 trang product images thuộc các product của user (join với products), dùng chung cho các endpoint list"""
+        response = await select_page(client.table("productImages"), _owned_select(fields), limit, cursor).eq("products.profile_id", user_id).execute()
+        return page_result(_strip_owner(response.data or []), limit, response.count)
+
     @staticmethod
     async def create_product_image(data: CreateProductImageRequest, token: str):
         """Tạo product image mới"""
         try:
-            user_id, client = get_user_and_client(token)
-            # Kiểm tra product thuộc về user
-            product = client.table("products").select("profile_id").eq("id", data.product_id).execute()
-            if not product.data or product.data[0]["profile_id"] != user_id:
-                raise HTTPException(status_code=404, detail="Product not found")
+            user_id, client = await get_user_and_client(token)
+            insert_data = insert_payload(data)
             
-            insert_data = data.model_dump()
-            insert_data = serialize_dates(insert_data)
-            response = client.table("productImages").insert(insert_data).execute()
-            if not response.data:
-                raise HTTPException(status_code=500, detail="Failed to create product image")
-            return {"status": "success", "message": "Product image created successfully", "data": response.data[0]}
+            async def fallback():
+                # Kiểm tra product thuộc về user
+                product = await client.table("products").select("id").eq("id", data.product_id).eq("profile_id", user_id).execute()
+                if not product.data:
+                    return []
+                response = await client.table("productImages").insert(insert_data).execute()
+                if not response.data:
+                    raise HTTPException(status_code=500, detail="Failed to create product image")
+                return response.data
+            
+            # Insert chỉ thành công khi product thuộc về user
+            rows = await _owned_write(client, "create_owned_product_image", {
+                "p_profile_id": user_id,
+                "p_product_id": data.product_id,
+                "p_image_url": data.image_url,
+                "p_description": data.description,
+                **image_metadata_params(data),
+            }, fallback)
+            if not rows:
+                raise HTTPException(status_code=404, detail="Product not found")
+            await invalidate_public_cache(user_id, "product_images")
+            await AssetService.add_references(row.get("image_url") for row in rows)
+            return {"status": "success", "message": "Product image created successfully", "data": rows[0]}
         except HTTPException:
             raise
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Failed to create product image: {str(e)}")
     
     @staticmethod
-    async def get_product_images(token: str, product_id: str = None):
+    async def get_product_images(token: str, product_id: str = None, limit: int = None, cursor: str = None, fields: str = None):
         """Lấy tất cả product images của user, hoặc của một product cụ thể"""
         try:
-            user_id, client = get_user_and_client(token)
+            user_id, client = await get_user_and_client(token)
+            limit = page_limit(limit)
             if product_id:
                 # Kiểm tra product thuộc về user
-                product = client.table("products").select("profile_id").eq("id", product_id).execute()
+                product = await client.table("products").select("profile_id").eq("id", product_id).execute()
                 if not product.data or product.data[0]["profile_id"] != user_id:
                     raise HTTPException(status_code=404, detail="Product not found")
-                response = client.table("productImages").select("*").eq("product_id", product_id).execute()
-            else:
-                # Lấy tất cả product images của user (thông qua products)
-                products = client.table("products").select("id").eq("profile_id", user_id).execute()
-                product_ids = [p["id"] for p in (products.data or [])]
-                if not product_ids:
-                    return {"status": "success", "data": [], "count": 0}
-                response = client.table("productImages").select("*").in_("product_id", product_ids).execute()
-            return {"status": "success", "data": response.data if response.data else [], "count": len(response.data) if response.data else 0}
+                response = await select_page(client.table("productImages"), select_columns(fields, PRODUCT_IMAGE_COLUMNS), limit, cursor).eq("product_id", product_id).execute()
+                return page_result(response.data, limit, response.count)
+            # Lấy tất cả product images của user (join với products)
+            return await ProductImageService.list_owned_product_images(client, user_id, limit, cursor, fields)
         except HTTPException:
             raise
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Failed to get product images: {str(e)}")
     
     @staticmethod
-    async def get_product_image(image_id: str, token: str):
+    async def get_product_image(image_id: str, token: str, fields: str = None):
         """Lấy product image theo ID"""
         try:
-            user_id, client = get_user_and_client(token)
-            # Kiểm tra image thuộc về product của user
-            image = client.table("productImages").select("product_id").eq("id", image_id).execute()
-            if not image.data:
-                raise HTTPException(status_code=404, detail="Product image not found")
-            
-            product = client.table("products").select("profile_id").eq("id", image.data[0]["product_id"]).execute()
-            if not product.data or product.data[0]["profile_id"] != user_id:
+            user_id, client = await get_user_and_client(token)
+            # Chỉ lấy được image thuộc product của user
+            response = await client.table("productImages").select(_owned_select(fields)).eq("id", image_id).eq("products.profile_id", user_id).execute()
+            if not response.data:
                 raise HTTPException(status_code=404, detail="Product image not found")
-            
-            response = client.table("productImages").select("*").eq("id", image_id).execute()
-            return {"status": "success", "data": response.data[0]}
+            return {"status": "success", "data": _strip_owner(response.data)[0]}
         except HTTPException:
             raise
         except Exception as e:
@@ -74,22 +136,33 @@ class ProductImageService:
     async def update_product_image(image_id: str, data: UpdateProductImageRequest, token: str):
         """Cập nhật product image"""
         try:
-            user_id, client = get_user_and_client(token)
-            # Kiểm tra image thuộc về product của user
-            image = client.table("productImages").select("product_id").eq("id", image_id).execute()
-            if not image.data:
-                raise HTTPException(status_code=404, detail="Product image not found")
-            
-            product = client.table("products").select("profile_id").eq("id", image.data[0]["product_id"]).execute()
-            if not product.data or product.data[0]["profile_id"] != user_id:
-                raise HTTPException(status_code=404, detail="Product image not found")
-            
+            user_id, client = await get_user_and_client(token)
             update_data = data.model_dump(exclude_none=True)
             update_data = serialize_dates(update_data)
-            response = client.table("productImages").update(update_data).eq("id", image_id).execute()
-            if not response.data:
-                raise HTTPException(status_code=500, detail="Failed to update product image")
-            return {"status": "success", "message": "Product image updated successfully", "data": response.data[0]}
+            old_urls = await current_urls(client, "productImages", "image_url", [image_id]) if "image_url" in update_data else {}
+            if not update_data:
+                # Không có field nào: trả về dòng hiện tại (giống batch update báo "unchanged"), không ghi
+                current = await ProductImageService.get_product_image(image_id, token)
+                return {"status": "success", "message": "Product image updated successfully", "data": current["data"]}
+            
+            async def fallback():
+                if not await _is_owned_image(client, image_id, user_id):
+                    return []
+                response = await client.table("productImages").update(update_data).eq("id", image_id).execute()
+                return response.data or []
+            
+            rows = await _owned_write(client, "update_owned_product_image", {
+                "p_profile_id": user_id,
+                "p_image_id": image_id,
+                "p_image_url": data.image_url,
+                "p_description": data.description,
+                **image_metadata_params(data),
+            }, fallback)
+            if not rows:
+                raise HTTPException(status_code=404, detail="Product image not found")
+            await invalidate_public_cache(user_id, "product_images")
+            await AssetService.replace_urls(old_urls, rows, "image_url")
+            return {"status": "success", "message": "Product image updated successfully", "data": rows[0]}
         except HTTPException:
             raise
         except Exception as e:
@@ -99,17 +172,22 @@ class ProductImageService:
     async def delete_product_image(image_id: str, token: str):
         """Xóa product image"""
         try:
-            user_id, client = get_user_and_client(token)
-            # Kiểm tra image thuộc về product của user
-            image = client.table("productImages").select("product_id").eq("id", image_id).execute()
-            if not image.data:
-                raise HTTPException(status_code=404, detail="Product image not found")
+            user_id, client = await get_user_and_client(token)
             
-            product = client.table("products").select("profile_id").eq("id", image.data[0]["product_id"]).execute()
-            if not product.data or product.data[0]["profile_id"] != user_id:
-                raise HTTPException(status_code=404, detail="Product image not found")
+            async def fallback():
+                if not await _is_owned_image(client, image_id, user_id):
+                    return []
+                response = await client.table("productImages").delete().eq("id", image_id).execute()
+                return response.data or []
             
-            response = client.table("productImages").delete().eq("id", image_id).execute()
+            rows = await _owned_write(client, "delete_owned_product_image", {
+                "p_profile_id": user_id,
+                "p_image_id": image_id,
+            }, fallback)
+            if not rows:
+                raise HTTPException(status_code=404, detail="Product image not found")
+            await invalidate_public_cache(user_id, "product_images")
+            await AssetService.release_urls(row.get("image_url") for row in rows)
             return {"status": "success", "message": "Product image deleted successfully"}
         except HTTPException:
             raise
@@ -117,20 +195,107 @@ class ProductImageService:
             raise HTTPException(status_code=500, detail=f"Failed to delete product image: {str(e)}")
     
     @staticmethod
-    async def get_public_product_images(user_id: str, product_id: str = None):
+    async def create_product_images(data: List[CreateProductImageRequest], token: str):
+        """Tạo nhiều product image: 1 request kiểm tra các product, 1 câu insert nhiều dòng"""
+        try:
+            user_id, client = await get_user_and_client(token)
+            check_batch_size(len(data))
+            product_ids = unique_ids([item.product_id for item in data])
+            products = await client.table("products").select("id").in_("id", product_ids).eq("profile_id", user_id).execute()
+            owned_product_ids = {str(row["id"]) for row in products.data or []}
+            
+            # Chỉ insert các image có product thuộc về user
+            indexes = [index for index, item in enumerate(data) if item.product_id in owned_product_ids]
+            rows = []
+            if indexes:
+                response = await client.table("productImages").insert([insert_payload(data[index]) for index in indexes]).execute()
+                rows = response.data or []
+                if len(rows) != len(indexes):
+                    raise HTTPException(status_code=500, detail="Failed to create product images")
+                await invalidate_public_cache(user_id, "product_images")
+                await AssetService.add_references(row.get("image_url") for row in rows)
+            
+            created = dict(zip(indexes, rows))
+            results = [
+                {"index": index, "status": "created", "id": created[index]["id"]} if index in created
+                else {"index": index, "status": "product_not_found"}
+                for index in range(len(data))
+            ]
+            return {"status": "success", "message": f"{len(rows)} product images created successfully", "data": rows, "results": results}
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Failed to create product images: {str(e)}")
+    
+    @staticmethod
+    async def update_product_images(data: List[BatchUpdateProductImageRequest], token: str):
+        """Cập nhật nhiều product image (chỉ image thuộc product của user), trả về kết quả từng item"""
+        try:
+            user_id, client = await get_user_and_client(token)
+            check_batch_size(len(data))
+            updates = {}
+            for item in data:
+                values = serialize_dates(item.model_dump(exclude_none=True))
+                updates[str(values.pop("id"))] = values
+            ids = list(updates)
+            unchanged_ids = {image_id for image_id, values in updates.items() if not values}
+            
+            owned_ids = set(await _owned_image_ids(client, ids, user_id))
+            owned_updates = {image_id: values for image_id, values in updates.items() if values and image_id in owned_ids}
+            old_urls = await current_urls(client, "productImages", "image_url", [image_id for image_id, values in owned_updates.items() if "image_url" in values])
+            rows = await update_rows_by_id(client, "productImages", owned_updates)
+            if rows:
+                await invalidate_public_cache(user_id, "product_images")
+            await AssetService.replace_urls(old_urls, rows, "image_url")
+            return {"status": "success", "message": f"{len(rows)} product images updated successfully", "results": update_results(ids, rows, unchanged_ids)}
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Failed to update product images: {str(e)}")
+    
+    @staticmethod
+    async def delete_product_images(data: BatchDeleteRequest, token: str):
+        """Xóa nhiều product image: 1 request lọc image thuộc về user, 1 câu delete"""
+        try:
+            user_id, client = await get_user_and_client(token)
+            ids = unique_ids(data.ids)
+            check_batch_size(len(ids))
+            owned_ids = await _owned_image_ids(client, ids, user_id)
+            deleted = []
+            if owned_ids:
+                response = await client.table("productImages").delete().in_("id", owned_ids).execute()
+                deleted = [row["id"] for row in response.data or []]
+                await invalidate_public_cache(user_id, "product_images")
+                await AssetService.release_urls(row.get("image_url") for row in response.data or [])
+            return {"status": "success", "message": f"{len(deleted)} product images deleted successfully", "results": delete_results(ids, deleted)}
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Failed to delete product images: {str(e)}")
+    
+    @staticmethod
+    async def get_public_product_images(user_id: str, product_id: str = None, limit: int = None, cursor: str = None, fields: str = None):
         """Lấy tất cả product images public của user (không cần token)"""
         try:
             from Service.base_service import get_public_client
             client = get_public_client()
             if product_id:
-                response = client.table("productImages").select("*").eq("product_id", product_id).execute()
-            else:
-                products = client.table("products").select("id").eq("profile_id", user_id).execute()
-                product_ids = [p["id"] for p in (products.data or [])]
-                if not product_ids:
-                    return {"status": "success", "data": [], "count": 0}
-                response = client.table("productImages").select("*").in_("product_id", product_ids).execute()
-            return {"status": "success", "data": response.data if response.data else [], "count": len(response.data) if response.data else 0}
+                limit = page_limit(limit)
+                response = await select_page(client.table("productImages"), select_columns(fields, PRODUCT_IMAGE_COLUMNS), limit, cursor).eq("product_id", product_id).execute()
+                return page_result(response.data, limit, response.count)
+            
+            # Chỉ cache trang đầu với limit và fields mặc định
+            first_page = limit is None and cursor is None and fields is None
+            if first_page:
+                cached = get_public_cache(user_id, "product_images")
+                if cached is not None:
+                    return cached
+            # Join với products để lọc theo profile trong 1 request
+            limit = page_limit(limit)
+            result = await ProductImageService.list_owned_product_images(client, user_id, limit, cursor, fields)
+            return set_public_cache(user_id, "product_images", result) if first_page else result
+        except HTTPException:
+            raise
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Failed to get public product images: {str(e)}")
 
@@ -1,6 +1,14 @@
+from typing import List
 from fastapi import HTTPException
-from Entity.product import CreateProductRequest, UpdateProductRequest
-from Service.base_service import get_user_and_client, serialize_dates
+from postgrest import CountMethod, ReturnMethod
+from Entity.product import CreateProductRequest, UpdateProductRequest, BatchUpdateProductRequest
+from Entity.batch import BatchDeleteRequest
+from Service.base_service import get_user_and_client, serialize_dates, page_limit, select_page, page_result, allowed_columns, select_columns, update_or_select
+from Service.public_cache import get_public_cache, set_public_cache, invalidate_public_cache
+from Service.batch_service import BatchService
+
+# Các cột client được chọn qua fields=
+PRODUCT_COLUMNS = allowed_columns(CreateProductRequest, UpdateProductRequest)
 
 
 class ProductService:
@@ -8,13 +16,14 @@ class ProductService:
     async def create_product(data: CreateProductRequest, token: str):
         """Tạo product mới"""
         try:
-            user_id, client = get_user_and_client(token)
+            user_id, client = await get_user_and_client(token)
             insert_data = data.model_dump()
             insert_data["profile_id"] = user_id
             insert_data = serialize_dates(insert_data)
-            response = client.table("products").insert(insert_data).execute()
+            response = await client.table("products").insert(insert_data).execute()
             if not response.data:
                 raise HTTPException(status_code=500, detail="Failed to create product")
+            await invalidate_public_cache(user_id, "products", "product_images")
             return {"status": "success", "message": "Product created successfully", "data": response.data[0]}
         except HTTPException:
             raise
@@ -22,23 +31,24 @@ class ProductService:
             raise HTTPException(status_code=500, detail=f"Failed to create product: {str(e)}")
     
     @staticmethod
-    async def get_products(token: str):
+    async def get_products(token: str, limit: int = None, cursor: str = None, fields: str = None):
         """Lấy tất cả products của user"""
         try:
-            user_id, client = get_user_and_client(token)
-            response = client.table("products").select("*").eq("profile_id", user_id).execute()
-            return {"status": "success", "data": response.data if response.data else [], "count": len(response.data) if response.data else 0}
+            user_id, client = await get_user_and_client(token)
+            limit = page_limit(limit)
+            response = await select_page(client.table("products"), select_columns(fields, PRODUCT_COLUMNS), limit, cursor).eq("profile_id", user_id).execute()
+            return page_result(response.data, limit, response.count)
         except HTTPException:
             raise
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Failed to get products: {str(e)}")
     
     @staticmethod
-    async def get_product(product_id: str, token: str):
+    async def get_product(product_id: str, token: str, fields: str = None):
         """Lấy product theo ID"""
         try:
-            user_id, client = get_user_and_client(token)
-            response = client.table("products").select("*").eq("id", product_id).eq("profile_id", user_id).execute()
+            user_id, client = await get_user_and_client(token)
+            response = await client.table("products").select(select_columns(fields, PRODUCT_COLUMNS)).eq("id", product_id).eq("profile_id", user_id).execute()
             if not response.data:
                 raise HTTPException(status_code=404, detail="Product not found")
             return {"status": "success", "data": response.data[0]}
@@ -51,16 +61,14 @@ class ProductService:
     async def update_product(product_id: str, data: UpdateProductRequest, token: str):
         """Cập nhật product"""
         try:
-            user_id, client = get_user_and_client(token)
-            check = client.table("products").select("id").eq("id", product_id).eq("profile_id", user_id).execute()
-            if not check.data:
-                raise HTTPException(status_code=404, detail="Product not found")
-            
+            user_id, client = await get_user_and_client(token)
             update_data = data.model_dump(exclude_none=True)
             update_data = serialize_dates(update_data)
-            response = client.table("products").update(update_data).eq("id", product_id).execute()
+            response = await update_or_select(client, "products", update_data).eq("id", product_id).eq("profile_id", user_id).execute()
             if not response.data:
-                raise HTTPException(status_code=500, detail="Failed to update product")
+                raise HTTPException(status_code=404, detail="Product not found")
+            if update_data:
+                await invalidate_public_cache(user_id, "products", "product_images")
             return {"status": "success", "message": "Product updated successfully", "data": response.data[0]}
         except HTTPException:
             raise
@@ -71,12 +79,12 @@ class ProductService:
     async def delete_product(product_id: str, token: str):
         """Xóa product"""
         try:
-            user_id, client = get_user_and_client(token)
-            check = client.table("products").select("id").eq("id", product_id).eq("profile_id", user_id).execute()
-            if not check.data:
+            user_id, client = await get_user_and_client(token)
+            # Không cần trả về dòng đã xóa, chỉ cần số dòng bị xóa
+            response = await client.table("products").delete(count=CountMethod.exact, returning=ReturnMethod.minimal).eq("id", product_id).eq("profile_id", user_id).execute()
+            if not response.count:
                 raise HTTPException(status_code=404, detail="Product not found")
-            
-            response = client.table("products").delete().eq("id", product_id).execute()
+            await invalidate_public_cache(user_id, "products", "product_images")
             return {"status": "success", "message": "Product deleted successfully"}
         except HTTPException:
             raise
@@ -84,13 +92,56 @@ class ProductService:
             raise HTTPException(status_code=500, detail=f"Failed to delete product: {str(e)}")
     
     @staticmethod
-    async def get_public_products(user_id: str):
+    async def create_products(data: List[CreateProductRequest], token: str):
+        """Tạo nhiều product trong 1 câu insert"""
+        try:
+            user_id, client = await get_user_and_client(token)
+            return await BatchService.create(client, user_id, "products", ("products", "product_images"), data)
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Failed to create products: {str(e)}")
+    
+    @staticmethod
+    async def update_products(data: List[BatchUpdateProductRequest], token: str):
+        """Cập nhật nhiều product, trả về kết quả từng item"""
+        try:
+            user_id, client = await get_user_and_client(token)
+            return await BatchService.update(client, user_id, "products", ("products", "product_images"), data)
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Failed to update products: {str(e)}")
+    
+    @staticmethod
+    async def delete_products(data: BatchDeleteRequest, token: str):
+        """Xóa nhiều product trong 1 câu delete, trả về kết quả từng item"""
+        try:
+            user_id, client = await get_user_and_client(token)
+            return await BatchService.delete(client, user_id, "products", ("products", "product_images"), data.ids)
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Failed to delete products: {str(e)}")
+    
+    @staticmethod
+    async def get_public_products(user_id: str, limit: int = None, cursor: str = None, fields: str = None):
         """Lấy tất cả products public của user (không cần token)"""
         try:
+            # Chỉ cache trang đầu với limit và fields mặc định
+            first_page = limit is None and cursor is None and fields is None
+            if first_page:
+                cached = get_public_cache(user_id, "products")
+                if cached is not None:
+                    return cached
             from Service.base_service import get_public_client
             client = get_public_client()
-            response = client.table("products").select("*").eq("profile_id", user_id).execute()
-            return {"status": "success", "data": response.data if response.data else [], "count": len(response.data) if response.data else 0}
+            limit = page_limit(limit)
+            response = await select_page(client.table("products"), select_columns(fields, PRODUCT_COLUMNS), limit, cursor).eq("profile_id", user_id).execute()
+            result = page_result(response.data, limit, response.count)
+            return set_public_cache(user_id, "products", result) if first_page else result
+        except HTTPException:
+            raise
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Failed to get public products: {str(e)}")
 
@@ -1,7 +1,14 @@
 from fastapi import HTTPException
 from datetime import datetime
 from Entity.profile import UpdateProfileRequest
-from Service.base_service import get_user_and_client, serialize_dates
+from Service.base_service import get_user_and_client, serialize_dates, allowed_columns, select_columns
+from Service.public_cache import get_public_cache, set_public_cache, invalidate_public_cache, PROFILE_SECTION
+from Service.asset_service import AssetService
+
+# Các cột của bảng duong client được chọn qua fields=
+PROFILE_COLUMNS = allowed_columns(UpdateProfileRequest, base=("id", "update_at"))
+# Các cột chứa URL ảnh upload (được đếm trong asset index)
+PROFILE_IMAGE_COLUMNS = ("avatar_url", "cover_url")
 
 
 class ProfileService:
@@ -9,7 +16,7 @@ class ProfileService:
     async def update_profile(profile_data: UpdateProfileRequest, token: str):
         """Cập nhật profile trong bảng duong (id = auth.users.id)"""
         try:
-            user_id, client = get_user_and_client(token)
+            user_id, client = await get_user_and_client(token)
             
             # Chuẩn bị data để update/insert (chỉ lấy các field không None)
             update_data = profile_data.model_dump(exclude_none=True)
@@ -19,12 +26,24 @@ class ProfileService:
             # Serialize date objects thành ISO format strings
             update_data = serialize_dates(update_data)
             
+            # URL ảnh cũ để chuyển refcount sang ảnh mới
+            image_columns = [column for column in PROFILE_IMAGE_COLUMNS if column in update_data]
+            old_profile = None
+            if image_columns and AssetService.enabled():
+                old_response = await client.table("duong").select(", ".join(image_columns)).eq("id", user_id).execute()
+                old_profile = old_response.data[0] if old_response.data else {}
+            
             # Dùng upsert để insert hoặc update (dựa trên id)
-            response = client.table("duong").upsert(update_data, on_conflict="id").execute()
+            response = await client.table("duong").upsert(update_data, on_conflict="id").execute()
             
             if not response.data:
                 raise HTTPException(status_code=500, detail="Failed to update profile")
             
+            await invalidate_public_cache(user_id, PROFILE_SECTION)
+            if old_profile is not None:
+                for column in image_columns:
+                    await AssetService.replace_urls({user_id: old_profile.get(column)}, response.data, column)
+            
             return {
                 "status": "success",
                 "message": "Profile updated successfully",
@@ -39,13 +58,13 @@ class ProfileService:
             raise HTTPException(status_code=500, detail=f"Failed to update profile: {error_message}")
     
     @staticmethod
-    async def get_profile(token: str):
+    async def get_profile(token: str, fields: str = None):
         """Lấy profile từ bảng duong (id = auth.users.id)"""
         try:
-            user_id, client = get_user_and_client(token)
+            user_id, client = await get_user_and_client(token)
             
             # Lấy profile từ bảng duong (dùng service_role key để bypass RLS)
-            response = client.table("duong").select("*").eq("id", user_id).execute()
+            response = await client.table("duong").select(select_columns(fields, PROFILE_COLUMNS)).eq("id", user_id).execute()
             
             if not response.data:
                 return {
@@ -67,18 +86,24 @@ class ProfileService:
             raise HTTPException(status_code=500, detail=f"Failed to get profile: {error_message}")
 
     @staticmethod
-    async def get_public_profile(user_id: str = None):
+    async def get_public_profile(user_id: str = None, fields: str = None):
         """Lấy profile public (không cần token) - lấy profile đầu tiên hoặc theo user_id"""
         try:
-            # Tạo client mới với service role key để bypass RLS
+            # Chỉ cache khi lấy đủ các cột
+            if fields is None:
+                cached = get_public_cache(user_id, PROFILE_SECTION)
+                if cached is not None:
+                    return cached
+            
+            # Client dùng chung với service role key để bypass RLS
             from Service.base_service import get_public_client
             client = get_public_client()
             
             if user_id:
-                response = client.table("duong").select("*").eq("id", user_id).execute()
+                response = await client.table("duong").select(select_columns(fields, PROFILE_COLUMNS)).eq("id", user_id).execute()
             else:
                 # Lấy profile đầu tiên có dữ liệu
-                response = client.table("duong").select("*").limit(1).execute()
+                response = await client.table("duong").select(select_columns(fields, PROFILE_COLUMNS)).limit(1).execute()
             
             if not response.data:
                 return {
@@ -87,10 +112,13 @@ class ProfileService:
                     "data": None
                 }
             
-            return {
+            result = {
                 "status": "success",
                 "data": response.data[0]
             }
+            return set_public_cache(user_id, PROFILE_SECTION, result) if fields is None else result
+        except HTTPException:
+            raise
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Failed to get public profile: {str(e)}")
 
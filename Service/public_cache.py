@@ -0,0 +1,43 @@
+import os
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from Service.ttl_cache import TTLCache
+
+# Cache response của các public endpoint, key = (profile_id, section)
+PUBLIC_CACHE_TTL = float(os.getenv("PUBLIC_CACHE_TTL", "300"))
+PUBLIC_CACHE_SIZE = int(os.getenv("PUBLIC_CACHE_SIZE", "512"))
+
+# Section tổng hợp, bị xóa mỗi khi bất kỳ section nào của profile thay đổi
+ALL_SECTION = "all"
+PROFILE_SECTION = "profile"
+
+public_cache = TTLCache(maxsize=PUBLIC_CACHE_SIZE, ttl=PUBLIC_CACHE_TTL)
+
+# Các hàm được gọi (và chờ) mỗi khi dữ liệu của một profile thay đổi (vd: đánh dấu snapshot stale)
+_invalidation_listeners: List[Callable[[str], Awaitable[None]]] = []
+
+
+def add_invalidation_listener(listener: Callable[[str], Awaitable[None]]) -> None:
+    _invalidation_listeners.append(listener)
+
+
+def get_public_cache(profile_id: Optional[str], section: str) -> Optional[Dict[str, Any]]:
+    """profile_id = None dùng cho các endpoint lấy profile đầu tiên (/profile/public)"""
+    return public_cache.get((profile_id, section))
+
+
+def set_public_cache(profile_id: Optional[str], section: str, value: Dict[str, Any]) -> Dict[str, Any]:
+    public_cache.set((profile_id, section), value)
+    return value
+
+
+async def invalidate_public_cache(profile_id: str, *sections: str) -> None:
+    """Xóa cache của các section vừa bị thay đổi (gọi sau create/update/delete, trước khi trả response)"""
+    for section in sections:
+        public_cache.pop((profile_id, section))
+    public_cache.pop((profile_id, ALL_SECTION))
+    # Profile đầu tiên có thể chính là profile này
+    public_cache.pop((None, ALL_SECTION))
+    if PROFILE_SECTION in sections:
+        public_cache.pop((None, PROFILE_SECTION))
+    for listener in _invalidation_listeners:
+        await listener(profile_id)
@@ -0,0 +1,174 @@
+import asyncio
+import os
+from functools import partial
+from fastapi import HTTPException
+from supabase import PostgrestAPIError
+from Service.base_service import gather_sections, get_public_client, page_limit, page_result
+from Service.public_cache import get_public_cache, set_public_cache, ALL_SECTION
+from Service.profile_service import ProfileService
+from Service.image_service import ImageService
+from Service.education_service import EducationService
+from Service.job_service import JobService
+from Service.language_service import LanguageService
+from Service.contract_service import ContractService
+from Service.achievement_service import AchievementService
+from Service.product_service import ProductService
+from Service.product_image_service import ProductImageService
+from Service.skill_service import SkillService
+from Service.target_service import TargetService
+
+# Số section được load cùng lúc và timeout (giây) cho từng section
+PROFILE_SECTION_CONCURRENCY = int(os.getenv("PROFILE_SECTION_CONCURRENCY", "10"))
+PROFILE_SECTION_TIMEOUT = float(os.getenv("PROFILE_SECTION_TIMEOUT", "5"))
+
+# "aggregate": 1 request duy nhất (PostgREST resource embedding), "sections": mỗi section 1 request
+PUBLIC_PROFILE_MODE = os.getenv("PUBLIC_PROFILE_MODE", "aggregate")
+
+PUBLIC_SECTION_LOADERS = {
+    "images": ImageService.get_public_images,
+    "educations": EducationService.get_public_educations,
+    "jobs": JobService.get_public_jobs,
+    "languages": LanguageService.get_public_languages,
+    "contracts": ContractService.get_public_contracts,
+    "achievements": AchievementService.get_public_achievements,
+    "products": ProductService.get_public_products,
+    "product_images": ProductImageService.get_public_product_images,
+    "skills": SkillService.get_public_skills,
+    "targets": TargetService.get_public_targets,
+}
+
+# Tên bảng được embed -> tên section trong response
+AGGREGATE_EMBEDS = {
+    "images": "images",
+    "educations": "educations",
+    "jobs": "jobs",
+    "languages": "languages",
+    "contracts": "contracts",
+    "achievements": "achievements",
+    "products": "products",
+    "skills": "skills",
+    "target": "targets",
+}
+# productImages không embed qua products: giới hạn theo từng product sẽ làm mất ảnh của các product sau trang đầu
+AGGREGATE_SELECT = ", ".join(["*"] + [f"{table}(*)" for table in AGGREGATE_EMBEDS])
+# Lỗi PostgREST khi không tìm thấy relationship (thiếu foreign key) -> tắt aggregate mode
+RELATIONSHIP_ERROR_CODES = ("PGRST200", "PGRST201")
+
+_aggregate_supported = True
+
+
+def _section(rows, limit: int) -> dict:
+    """Trang đầu của section (embed không có count từ database nên chỉ biết count khi hết dữ liệu)"""
+    rows = rows or []
+    return page_result(rows, limit, len(rows) if len(rows) <= limit else None)
+
+
+class PublicProfileService:
+    @staticmethod
+    async def get_public_profile_aggregate(user_id: str = None):
+        """Lấy profile và tất cả section trong 1 request (embed các bảng con vào bảng duong)
+
+        product_images được load riêng (join với products, giống section mode) trong request thứ 2,
+        chạy đồng thời nếu đã biết user_id. Trả về cùng format với get_public_profile_all, hoặc None nếu không có profile
+        """
+        client = get_public_client()
+        limit = page_limit()
+        query = client.table("duong").select(AGGREGATE_SELECT)
+        # Mỗi bảng con cũng được sort theo id và giới hạn như trang đầu của từng section
+        for table in AGGREGATE_EMBEDS:
+            query = query.order("id", foreign_table=table).limit(limit + 1, foreign_table=table)
+        if user_id:
+            query = query.eq("id", user_id)
+            response, product_images = await asyncio.gather(
+                query.limit(1).execute(),
+                ProductImageService.list_owned_product_images(client, user_id, limit),
+            )
+            if not response.data:
+                return None
+        else:
+            response = await query.limit(1).execute()
+            if not response.data:
+                return None
+            product_images = await ProductImageService.list_owned_product_images(client, response.data[0]["id"], limit)
+
+        row = dict(response.data[0])
+        sections = {name: _section(row.pop(table, None), limit) for table, name in AGGREGATE_EMBEDS.items()}
+        sections["product_images"] = product_images
+
+        return {
+            "status": "success",
+            "profile": {"status": "success", "data": row},
+            **{name: sections[name] for name in PUBLIC_SECTION_LOADERS},
+        }
+
+    @staticmethod
+    async def get_public_profile_sections(user_id: str = None):
+        """Lấy profile rồi load từng section bằng service tương ứng (các section chạy đồng thời)"""
+        # Lấy profile đầu tiên hoặc theo user_id
+        profile_res = await ProfileService.get_public_profile(user_id)
+
+        if not profile_res or not profile_res.get("data"):
+            return None
+
+        user_id = profile_res["data"]["id"]
+
+        # Lấy tất cả dữ liệu của user đó, section lỗi/chậm trả về error marker
+        sections = await gather_sections(
+            {name: partial(loader, user_id) for name, loader in PUBLIC_SECTION_LOADERS.items()},
+            concurrency=PROFILE_SECTION_CONCURRENCY,
+            timeout=PROFILE_SECTION_TIMEOUT,
+        )
+
+        return {
+            "status": "success",
+            "profile": profile_res,
+            **sections,
+        }
+
+    @staticmethod
+    async def build_public_profile(user_id: str = None):
+        """Load toàn bộ dữ liệu public của profile (aggregate nếu được, fallback sang từng section)
+
+        Trả về None nếu không có profile
+        """
+        global _aggregate_supported
+        if PUBLIC_PROFILE_MODE == "aggregate" and _aggregate_supported:
+            try:
+                return await PublicProfileService.get_public_profile_aggregate(user_id)
+            except PostgrestAPIError as e:
+                if e.code in RELATIONSHIP_ERROR_CODES:
+                    _aggregate_supported = False
+                print(f"Aggregate public profile failed, falling back to sections: {e}")
+            except Exception as e:
+                print(f"Aggregate public profile failed, falling back to sections: {e}")
+        return await PublicProfileService.get_public_profile_sections(user_id)
+
+    @staticmethod
+    def has_section_errors(result) -> bool:
+        return any(result[name].get("status") == "error" for name in PUBLIC_SECTION_LOADERS)
+
+    @staticmethod
+    async def get_public_profile_all():
+        """Lấy profile public và tất cả section của profile đó"""
+        try:
+            cached = get_public_cache(None, ALL_SECTION)
+            if cached is not None:
+                return cached
+
+            result = await PublicProfileService.build_public_profile()
+
+            if result is None:
+                return {
+                    "status": "success",
+                    "message": "No profile found",
+                    "profile": None,
+                    **{name: {"data": []} for name in PUBLIC_SECTION_LOADERS},
+                }
+            # Không cache khi có section bị lỗi để lần sau load lại
+            if PublicProfileService.has_section_errors(result):
+                return result
+            return set_public_cache(None, ALL_SECTION, result)
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Failed to get public profile all: {str(e)}")
@@ -0,0 +1,245 @@
+import asyncio
+import base64
+import hashlib
+import json
+import os
+import re
+import tempfile
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Dict, NamedTuple, Optional, Set
+from fastapi import HTTPException, Request, UploadFile
+from starlette.requests import ClientDisconnect
+from Service.base_service import get_user_and_client
+from Service.upload_service import MAX_UPLOAD_BYTES, UPLOAD_CHUNK_SIZE, ImageStreamValidator, UploadedImage
+
+# Upload resumable theo giao thức tus 1.0.0 (core + creation + termination)
+TUS_VERSION = "1.0.0"
+TUS_CONTENT_TYPE = "application/offset+octet-stream"
+# Thư mục tạm chứa các upload chưa xong (không nằm trong uploads/ vì thư mục đó được serve public)
+RESUMABLE_UPLOAD_DIR = Path(os.getenv("RESUMABLE_UPLOAD_DIR", os.path.join(tempfile.gettempdir(), "resumable-uploads")))
+# Upload không hoàn thành sau thời gian này (giây) bị xóa
+RESUMABLE_UPLOAD_TTL = int(os.getenv("RESUMABLE_UPLOAD_TTL", str(24 * 3600)))
+RESUMABLE_FOLDERS = ("images", "products")
+
+UPLOAD_ID_PATTERN = re.compile(r"^[0-9a-f]{32}$")
+
+
+class AppendResult(NamedTuple):
+    offset: int
+    folder: str
+    upload: Optional[UploadedImage]  # Khác None khi đã nhận đủ file
+
+
+class _StreamState:
+    """Trạng thái kiểm tra/hash của phần đã nhận, giữ trong RAM để không phải đọc lại file ở mỗi PATCH"""
+
+    def __init__(self):
+        self.validator = ImageStreamValidator()
+        self.hasher = hashlib.sha256()
+        self.offset = 0
+
+    def feed(self, data: bytes) -> None:
+        self.validator.feed(data)
+        self.hasher.update(data)
+        self.offset += len(data)
+
+
+_states: Dict[str, _StreamState] = {}
+_locks: Dict[str, asyncio.Lock] = {}
+# Upload đã nhận đủ và đang được lưu (Cloudinary / local) bởi PATCH cuối
+_finalizing: Set[str] = set()
+
+
+def _paths(upload_id: str):
+    if not UPLOAD_ID_PATTERN.match(upload_id):
+        raise HTTPException(status_code=404, detail="Upload not found")
+    return RESUMABLE_UPLOAD_DIR / f"{upload_id}.part", RESUMABLE_UPLOAD_DIR / f"{upload_id}.json"
+
+
+def _load_meta(upload_id: str) -> Dict[str, Any]:
+    _, meta_path = _paths(upload_id)
+    try:
+        return json.loads(meta_path.read_text())
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Upload not found")
+
+
+def _save_meta(upload_id: str, meta: Dict[str, Any]) -> None:
+    _, meta_path = _paths(upload_id)
+    tmp_path = meta_path.with_suffix(".tmp")
+    tmp_path.write_text(json.dumps(meta))
+    os.replace(tmp_path, meta_path)
+
+
+def _remove(upload_id: str) -> None:
+    for path in _paths(upload_id):
+        path.unlink(missing_ok=True)
+    _states.pop(upload_id, None)
+    _locks.pop(upload_id, None)
+    _finalizing.discard(upload_id)
+
+
+def _remove_expired() -> None:
+    now = time.time()
+    for meta_path in RESUMABLE_UPLOAD_DIR.glob("*.json"):
+        try:
+            if json.loads(meta_path.read_text())["created_at"] + RESUMABLE_UPLOAD_TTL < now:
+                _remove(meta_path.stem)
+        except (OSError, ValueError, KeyError):
+            continue
+
+
+def _replay(part_path: Path) -> _StreamState:
+    """Dựng lại trạng thái từ phần đã ghi (chỉ khi process vừa khởi động lại hoặc lần ghi trước bị lỗi)"""
+    state = _StreamState()
+    with part_path.open("rb") as part:
+        while chunk := part.read(UPLOAD_CHUNK_SIZE):
+            state.feed(chunk)
+    return state
+
+
+def _parse_metadata(header: str) -> Dict[str, str]:
+    # Upload-Metadata: "filename ZXhhbXBsZS5qcGc=,filetype aW1hZ2UvanBlZw=="
+    metadata = {}
+    for item in header.split(","):
+        key, _, value = item.strip().partition(" ")
+        if key:
+            try:
+                metadata[key] = base64.b64decode(value).decode("utf-8") if value else ""
+            except ValueError:
+                raise HTTPException(status_code=400, detail="Invalid Upload-Metadata")
+    return metadata
+
+
+class ResumableUploadService:
+    @staticmethod
+    async def create(request: Request, token: str = None, folder: str = "images") -> str:
+        """Tạo upload mới (POST), trả về upload_id"""
+        if token:
+            await get_user_and_client(token)
+        if folder not in RESUMABLE_FOLDERS:
+            raise HTTPException(status_code=400, detail=f"Invalid upload folder: {folder}")
+        length = request.headers.get("upload-length", "")
+        if not length.isdigit() or int(length) == 0:
+            raise HTTPException(status_code=400, detail="Upload-Length header is required")
+        if int(length) > MAX_UPLOAD_BYTES:
+            raise HTTPException(status_code=413, detail=f"File quá lớn, tối đa {MAX_UPLOAD_BYTES} bytes")
+        metadata = _parse_metadata(request.headers.get("upload-metadata", ""))
+
+        RESUMABLE_UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
+        await asyncio.to_thread(_remove_expired)
+        upload_id = uuid.uuid4().hex
+        part_path, _ = _paths(upload_id)
+        part_path.touch()
+        _save_meta(upload_id, {
+            "length": int(length),
+            "folder": folder,
+            "filename": metadata.get("filename"),
+            "created_at": time.time(),
+            "result": None,
+        })
+        _states[upload_id] = _StreamState()
+        return upload_id
+
+    @staticmethod
+    def get_status(upload_id: str) -> Dict[str, Any]:
+        """Offset hiện tại (HEAD) và kết quả nếu upload đã hoàn thành
+
+        Đã nhận đủ nhưng chưa lưu xong (đang lưu, lưu lỗi hoặc process bị tắt giữa chừng) thì báo thiếu 1 byte:
+        client tus chỉ coi là xong khi Upload-Offset = Upload-Length, gửi lại byte cuối để lưu lại
+        """
+        meta = _load_meta(upload_id)
+        part_path, _ = _paths(upload_id)
+        if meta["result"] is not None:
+            offset = meta["length"]
+        else:
+            offset = min(part_path.stat().st_size, meta["length"] - 1)
+        return {"offset": offset, "length": meta["length"], "completed": meta["result"] is not None, "result": meta["result"]}
+
+    @staticmethod
+    async def append(upload_id: str, request: Request) -> AppendResult:
+        """Ghi tiếp chunk (PATCH) vào cuối file tạm, kiểm tra ảnh theo từng chunk như upload thường
+
+        Kết nối bị ngắt giữa chừng thì phần đã nhận được giữ lại, client HEAD để biết offset và gửi tiếp
+        """
+        meta = _load_meta(upload_id)
+        if meta["result"] is not None:
+            raise HTTPException(status_code=409, detail="Upload already completed")
+        if request.headers.get("content-type") != TUS_CONTENT_TYPE:
+            raise HTTPException(status_code=415, detail=f"Content-Type must be {TUS_CONTENT_TYPE}")
+        offset_header = request.headers.get("upload-offset", "")
+        if not offset_header.isdigit():
+            raise HTTPException(status_code=400, detail="Upload-Offset header is required")
+
+        lock = _locks.setdefault(upload_id, asyncio.Lock())
+        if lock.locked():
+            raise HTTPException(status_code=409, detail="Upload is being written by another request")
+        async with lock:
+            if upload_id in _finalizing:
+                raise HTTPException(status_code=409, detail="Upload is being finalized")
+            part_path, _ = _paths(upload_id)
+            offset = part_path.stat().st_size
+            if offset >= meta["length"]:
+                # Lần lưu trước không thành công: bỏ byte cuối để client gửi lại (giống offset báo ở HEAD)
+                offset = meta["length"] - 1
+                await asyncio.to_thread(os.truncate, part_path, offset)
+                _states.pop(upload_id, None)
+            if int(offset_header) != offset:
+                raise HTTPException(status_code=409, detail=f"Upload-Offset mismatch, current offset is {offset}")
+
+            length = meta["length"]
+            try:
+                state = _states.get(upload_id)
+                if state is None or state.offset != offset:
+                    state = await asyncio.to_thread(_replay, part_path)
+                    _states[upload_id] = state
+
+                # Chỉ append vào cuối file, không đọc lại phần đã nhận
+                with part_path.open("ab") as part:
+                    try:
+                        async for chunk in request.stream():
+                            if not chunk:
+                                continue
+                            if state.offset + len(chunk) > length:
+                                raise HTTPException(status_code=413, detail="Dữ liệu vượt quá Upload-Length")
+                            state.feed(chunk)
+                            await asyncio.to_thread(part.write, chunk)
+                    except ClientDisconnect:
+                        pass
+
+                if state.offset < length:
+                    return AppendResult(state.offset, meta["folder"], None)
+                state.validator.finish()
+            except HTTPException:
+                # File không hợp lệ -> hủy cả upload
+                _remove(upload_id)
+                raise
+
+            width, height = state.validator.dimensions or (None, None)
+            upload = UploadFile(file=part_path.open("rb"), size=length, filename=meta["filename"])
+            _finalizing.add(upload_id)
+            return AppendResult(length, meta["folder"], UploadedImage(upload, state.validator.format, width, height, state.hasher.hexdigest()))
+
+    @staticmethod
+    def end_finalize(upload_id: str) -> None:
+        """PATCH cuối đã kết thúc (thành công hoặc lỗi); nếu chưa complete, PATCH tiếp theo gửi lại byte cuối để lưu lại"""
+        _finalizing.discard(upload_id)
+
+    @staticmethod
+    def complete(upload_id: str, result: Dict[str, Any]) -> None:
+        """Lưu kết quả (để client đã mất kết nối lấy lại bằng GET) và xóa file tạm"""
+        meta = _load_meta(upload_id)
+        meta["result"] = result
+        _save_meta(upload_id, meta)
+        part_path, _ = _paths(upload_id)
+        part_path.unlink(missing_ok=True)
+        _states.pop(upload_id, None)
+        _locks.pop(upload_id, None)
+
+    @staticmethod
+    def terminate(upload_id: str) -> None:
+        """Hủy upload (DELETE)"""
+        _load_meta(upload_id)
+        _remove(upload_id)
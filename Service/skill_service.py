@@ -1,18 +1,28 @@
+from typing import List
 from fastapi import HTTPException
-from Entity.skill import CreateSkillRequest, UpdateSkillRequest
-from Service.base_service import get_user_and_client, get_public_client
+from postgrest import CountMethod, ReturnMethod
+from Entity.skill import CreateSkillRequest, UpdateSkillRequest, BatchUpdateSkillRequest
+from Entity.batch import BatchDeleteRequest
+from Service.base_service import get_user_and_client, get_public_client, page_limit, select_page, page_result, allowed_columns, select_columns, update_or_select
+from Service.public_cache import get_public_cache, set_public_cache, invalidate_public_cache
+from Service.batch_service import BatchService
+
+# Các cột client được chọn qua fields=
+SKILL_COLUMNS = allowed_columns(CreateSkillRequest, UpdateSkillRequest)
+
 
 class SkillService:
     @staticmethod
     async def create_skill(data: CreateSkillRequest, token: str):
         """Tạo skill mới"""
         try:
-            user_id, client = get_user_and_client(token)
+            user_id, client = await get_user_and_client(token)
             insert_data = data.model_dump()
             insert_data["profile_id"] = user_id
-            response = client.table("skills").insert(insert_data).execute()
+            response = await client.table("skills").insert(insert_data).execute()
             if not response.data:
                 raise HTTPException(status_code=500, detail="Failed to create skill")
+            await invalidate_public_cache(user_id, "skills")
             return {"status": "success", "message": "Skill created successfully", "data": response.data[0]}
         except HTTPException:
             raise
@@ -20,23 +30,24 @@ class SkillService:
             raise HTTPException(status_code=500, detail=f"Failed to create skill: {str(e)}")
     
     @staticmethod
-    async def get_skills(token: str):
+    async def get_skills(token: str, limit: int = None, cursor: str = None, fields: str = None):
         """Lấy tất cả skills của user"""
         try:
-            user_id, client = get_user_and_client(token)
-            response = client.table("skills").select("*").eq("profile_id", user_id).execute()
-            return {"status": "success", "data": response.data if response.data else [], "count": len(response.data) if response.data else 0}
+            user_id, client = await get_user_and_client(token)
+            limit = page_limit(limit)
+            response = await select_page(client.table("skills"), select_columns(fields, SKILL_COLUMNS), limit, cursor).eq("profile_id", user_id).execute()
+            return page_result(response.data, limit, response.count)
         except HTTPException:
             raise
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Failed to get skills: {str(e)}")
     
     @staticmethod
-    async def get_skill(skill_id: str, token: str):
+    async def get_skill(skill_id: str, token: str, fields: str = None):
         """Lấy skill theo ID"""
         try:
-            user_id, client = get_user_and_client(token)
-            response = client.table("skills").select("*").eq("id", skill_id).eq("profile_id", user_id).execute()
+            user_id, client = await get_user_and_client(token)
+            response = await client.table("skills").select(select_columns(fields, SKILL_COLUMNS)).eq("id", skill_id).eq("profile_id", user_id).execute()
             if not response.data:
                 raise HTTPException(status_code=404, detail="Skill not found")
             return {"status": "success", "data": response.data[0]}
@@ -49,11 +60,13 @@ class SkillService:
     async def update_skill(skill_id: str, data: UpdateSkillRequest, token: str):
         """Cập nhật skill"""
         try:
-            user_id, client = get_user_and_client(token)
+            user_id, client = await get_user_and_client(token)
             update_data = data.model_dump(exclude_none=True)
-            response = client.table("skills").update(update_data).eq("id", skill_id).eq("profile_id", user_id).execute()
+            response = await update_or_select(client, "skills", update_data).eq("id", skill_id).eq("profile_id", user_id).execute()
             if not response.data:
                 raise HTTPException(status_code=404, detail="Skill not found")
+            if update_data:
+                await invalidate_public_cache(user_id, "skills")
             return {"status": "success", "message": "Skill updated successfully", "data": response.data[0]}
         except HTTPException:
             raise
@@ -64,19 +77,68 @@ class SkillService:
     async def delete_skill(skill_id: str, token: str):
         """Xóa skill"""
         try:
-            user_id, client = get_user_and_client(token)
-            response = client.table("skills").delete().eq("id", skill_id).eq("profile_id", user_id).execute()
+            user_id, client = await get_user_and_client(token)
+            # Không cần trả về dòng đã xóa, chỉ cần số dòng bị xóa
+            response = await client.table("skills").delete(count=CountMethod.exact, returning=ReturnMethod.minimal).eq("id", skill_id).eq("profile_id", user_id).execute()
+            if not response.count:
+                raise HTTPException(status_code=404, detail="Skill not found")
+            await invalidate_public_cache(user_id, "skills")
             return {"status": "success", "message": "Skill deleted successfully"}
+        except HTTPException:
+            raise
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Failed to delete skill: {str(e)}")
     
     @staticmethod
-    async def get_public_skills(user_id: str):
+    async def create_skills(data: List[CreateSkillRequest], token: str):
+        """Tạo nhiều skill trong 1 câu insert"""
+        try:
+            user_id, client = await get_user_and_client(token)
+            return await BatchService.create(client, user_id, "skills", ("skills",), data)
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Failed to create skills: {str(e)}")
+    
+    @staticmethod
+    async def update_skills(data: List[BatchUpdateSkillRequest], token: str):
+        """Cập nhật nhiều skill, trả về kết quả từng item"""
+        try:
+            user_id, client = await get_user_and_client(token)
+            return await BatchService.update(client, user_id, "skills", ("skills",), data)
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Failed to update skills: {str(e)}")
+    
+    @staticmethod
+    async def delete_skills(data: BatchDeleteRequest, token: str):
+        """Xóa nhiều skill trong 1 câu delete, trả về kết quả từng item"""
+        try:
+            user_id, client = await get_user_and_client(token)
+            return await BatchService.delete(client, user_id, "skills", ("skills",), data.ids)
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Failed to delete skills: {str(e)}")
+    
+    @staticmethod
+    async def get_public_skills(user_id: str, limit: int = None, cursor: str = None, fields: str = None):
         """Lấy tất cả skills public của user (không cần token)"""
         try:
+            # Chỉ cache trang đầu với limit và fields mặc định
+            first_page = limit is None and cursor is None and fields is None
+            if first_page:
+                cached = get_public_cache(user_id, "skills")
+                if cached is not None:
+                    return cached
             client = get_public_client()
-            response = client.table("skills").select("*").eq("profile_id", user_id).execute()
-            return {"status": "success", "data": response.data if response.data else [], "count": len(response.data) if response.data else 0}
+            limit = page_limit(limit)
+            response = await select_page(client.table("skills"), select_columns(fields, SKILL_COLUMNS), limit, cursor).eq("profile_id", user_id).execute()
+            result = page_result(response.data, limit, response.count)
+            return set_public_cache(user_id, "skills", result) if first_page else result
+        except HTTPException:
+            raise
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Failed to get public skills: {str(e)}")
 
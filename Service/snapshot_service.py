@@ -0,0 +1,258 @@
+import asyncio
+import os
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+from Service.base_service import get_public_client
+from Service.http_cache import compute_etag, render_json, parse_timestamp
+from Service.profile_service import ProfileService
+from Service.public_cache import add_invalidation_listener
+from Service.public_profile_service import PublicProfileService
+
+# Snapshot = toàn bộ JSON của /profile/public/all cho 1 profile, đã serialize sẵn thành bytes
+# "file": lưu trong SNAPSHOT_DIR, "table": lưu trong bảng Supabase, "off": tắt
+# Trên Vercel mặc định "table": /tmp của mỗi instance riêng biệt, instance khác sẽ không biết snapshot bị stale
+SNAPSHOT_STORE = os.getenv("SNAPSHOT_STORE", "table" if os.getenv("VERCEL") == "1" else "file")
+SNAPSHOT_DIR = Path(os.getenv("SNAPSHOT_DIR", "/tmp/snapshots" if os.getenv("VERCEL") == "1" else "snapshots"))
+SNAPSHOT_TABLE = os.getenv("SNAPSHOT_TABLE", "public_snapshots")
+# Snapshot cũ hơn SNAPSHOT_MAX_AGE (giây) bị coi là stale (phòng khi dữ liệu bị sửa trực tiếp trong database)
+SNAPSHOT_MAX_AGE = float(os.getenv("SNAPSHOT_MAX_AGE", "3600"))
+# Gom nhiều thao tác ghi liên tiếp thành 1 lần rebuild
+SNAPSHOT_REBUILD_DELAY = float(os.getenv("SNAPSHOT_REBUILD_DELAY", "0.5"))
+
+# SQL tạo bảng cho SNAPSHOT_STORE=table:
+#   create table public_snapshots (
+#       profile_id uuid primary key references duong(id) on delete cascade,
+#       body text not null,
+#       etag text not null,
+#       built_at timestamptz not null default now(),
+#       invalidated_at timestamptz
+#   );
+# Bảng tạo từ phiên bản trước:
+#   alter table public_snapshots add column if not exists invalidated_at timestamptz;
+#
+# built_at là thời điểm bắt đầu build (trước khi đọc dữ liệu), invalidated_at là lần ghi dữ liệu gần nhất:
+# snapshot chỉ còn mới khi built_at > invalidated_at, kể cả khi bản build cũ được lưu sau lần ghi
+# hoặc rebuild bị lỗi / không chạy xong (vd: instance serverless bị đóng băng sau response)
+
+
+class FileSnapshotStore:
+    """Lưu snapshot thành file <profile_id>.json (mtime = built_at), <profile_id>.etag và <profile_id>.stale"""
+
+    def __init__(self, directory: Path):
+        self.directory = directory
+
+    async def read(self, profile_id: str) -> Optional[Dict[str, Any]]:
+        body_path = self.directory / f"{profile_id}.json"
+        etag_path = self.directory / f"{profile_id}.etag"
+        stale_path = self.directory / f"{profile_id}.stale"
+        try:
+            built_at = body_path.stat().st_mtime
+            snapshot = {"body": body_path.read_bytes(), "etag": etag_path.read_text(), "built_at": built_at}
+        except (FileNotFoundError, NotADirectoryError):
+            return None
+        try:
+            snapshot["invalidated_at"] = float(stale_path.read_text())
+        except (FileNotFoundError, ValueError):
+            snapshot["invalidated_at"] = None
+        return snapshot
+
+    async def write(self, profile_id: str, body: bytes, etag: str, built_at: float) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        # Ghi ra file tạm rồi rename để reader không bao giờ đọc phải file ghi dở
+        for suffix, content in ((".etag", etag.encode()), (".json", body)):
+            path = self.directory / f"{profile_id}{suffix}"
+            tmp_path = path.with_suffix(suffix + ".tmp")
+            tmp_path.write_bytes(content)
+            if suffix == ".json":
+                os.utime(tmp_path, (built_at, built_at))
+            os.replace(tmp_path, path)
+
+    async def invalidate(self, profile_id: str, invalidated_at: float) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self.directory / f"{profile_id}.stale"
+        tmp_path = path.with_suffix(".stale.tmp")
+        tmp_path.write_text(repr(invalidated_at))
+        os.replace(tmp_path, path)
+
+
+def _timestamp(value) -> Optional[float]:
+    parsed = parse_timestamp(value) if value else None
+    return parsed.timestamp() if parsed else None
+
+
+def _isoformat(timestamp: float) -> str:
+    return datetime.fromtimestamp(timestamp, timezone.utc).isoformat()
+
+
+class TableSnapshotStore:
+    """Lưu snapshot trong bảng Supabase (dùng chung giữa các instance, vd: Vercel)"""
+
+    def __init__(self, table: str):
+        self.table = table
+
+    async def read(self, profile_id: str) -> Optional[Dict[str, Any]]:
+        client = get_public_client()
+        response = await client.table(self.table).select("body, etag, built_at, invalidated_at").eq("profile_id", profile_id).execute()
+        if not response.data:
+            return None
+        row = response.data[0]
+        return {
+            "body": row["body"].encode(),
+            "etag": row["etag"],
+            "built_at": _timestamp(row["built_at"]) or 0,
+            "invalidated_at": _timestamp(row["invalidated_at"]),
+        }
+
+    async def write(self, profile_id: str, body: bytes, etag: str, built_at: float) -> None:
+        # Không ghi invalidated_at: lần ghi dữ liệu xảy ra trong lúc build vẫn giữ snapshot stale
+        client = get_public_client()
+        await client.table(self.table).upsert({
+            "profile_id": profile_id,
+            "body": body.decode(),
+            "etag": etag,
+            "built_at": _isoformat(built_at),
+        }, on_conflict="profile_id").execute()
+
+    async def invalidate(self, profile_id: str, invalidated_at: float) -> None:
+        client = get_public_client()
+        await client.table(self.table).update({"invalidated_at": _isoformat(invalidated_at)}).eq("profile_id", profile_id).execute()
+
+
+def _create_store():
+    if SNAPSHOT_STORE == "file":
+        return FileSnapshotStore(SNAPSHOT_DIR)
+    if SNAPSHOT_STORE == "table":
+        return TableSnapshotStore(SNAPSHOT_TABLE)
+    return None
+
+
+snapshot_store = _create_store()
+
+# profile_id -> số lần dữ liệu bị thay đổi; rebuild chỉ coi là xong khi không có thay đổi mới
+_generations: Dict[str, int] = {}
+_rebuild_tasks: Dict[str, asyncio.Task] = {}
+
+
+class SnapshotService:
+    @staticmethod
+    async def build(profile_id: str) -> Optional[bytes]:
+        """Build JSON public của profile; None nếu không có profile hoặc có section lỗi"""
+        result = await PublicProfileService.build_public_profile(profile_id)
+        if result is None or PublicProfileService.has_section_errors(result):
+            return None
+        return render_json(result)
+
+    @staticmethod
+    async def rebuild(profile_id: str) -> bool:
+        """Build lại và lưu snapshot của profile, trả về True nếu thành công (lỗi thì snapshot vẫn stale)"""
+        if snapshot_store is None:
+            return False
+        # Lấy thời điểm trước khi đọc dữ liệu: lần ghi xảy ra trong lúc build làm snapshot này stale
+        built_at = time.time()
+        body = await SnapshotService.build(profile_id)
+        if body is None:
+            return False
+        await snapshot_store.write(profile_id, body, compute_etag(body), built_at)
+        return True
+
+    @staticmethod
+    async def invalidate(profile_id: str) -> None:
+        """Đánh dấu snapshot đã lưu là stale (chờ xong trước khi trả response của thao tác ghi), rồi rebuild ở background
+
+        Mọi instance đọc snapshot đều thấy stale ngay; rebuild chỉ làm snapshot mới trở lại
+        """
+        if snapshot_store is None or not profile_id:
+            return
+        await snapshot_store.invalidate(profile_id, time.time())
+        SnapshotService.schedule_rebuild(profile_id)
+
+    @staticmethod
+    def schedule_rebuild(profile_id: str) -> None:
+        """Lên lịch rebuild snapshot ở background (gom các lần gọi liên tiếp)"""
+        if snapshot_store is None or not profile_id:
+            return
+        _generations[profile_id] = _generations.get(profile_id, 0) + 1
+        task = _rebuild_tasks.get(profile_id)
+        if task is not None and not task.done():
+            # Task đang chạy sẽ thấy generation mới và rebuild thêm lần nữa
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        _rebuild_tasks[profile_id] = loop.create_task(SnapshotService._rebuild_until_current(profile_id))
+
+    @staticmethod
+    async def _rebuild_until_current(profile_id: str) -> None:
+        try:
+            while True:
+                generation = _generations.get(profile_id, 0)
+                await asyncio.sleep(SNAPSHOT_REBUILD_DELAY)
+                await SnapshotService.rebuild(profile_id)
+                if _generations.get(profile_id, 0) == generation:
+                    break
+        except Exception as e:
+            print(f"Failed to rebuild snapshot for {profile_id}: {e}")
+        finally:
+            _rebuild_tasks.pop(profile_id, None)
+
+    @staticmethod
+    def is_stale(profile_id: str, snapshot: Dict[str, Any]) -> bool:
+        invalidated_at = snapshot.get("invalidated_at")
+        if invalidated_at is not None and invalidated_at >= snapshot["built_at"]:
+            return True
+        task = _rebuild_tasks.get(profile_id)
+        if task is not None and not task.done():
+            return True
+        return time.time() - snapshot["built_at"] > SNAPSHOT_MAX_AGE
+
+    @staticmethod
+    async def get_public_snapshot() -> Optional[Dict[str, Any]]:
+        """Lấy snapshot còn mới của profile public đầu tiên; None nếu chưa có hoặc stale (sẽ được rebuild)"""
+        if snapshot_store is None:
+            return None
+        try:
+            profile_res = await ProfileService.get_public_profile()
+            profile = profile_res.get("data") if profile_res else None
+            if not profile:
+                return None
+            profile_id = profile["id"]
+            snapshot = await snapshot_store.read(profile_id)
+        except Exception as e:
+            print(f"Failed to read snapshot: {e}")
+            return None
+
+        if snapshot is None or SnapshotService.is_stale(profile_id, snapshot):
+            SnapshotService.schedule_rebuild(profile_id)
+            return None
+        return snapshot
+
+    @staticmethod
+    async def list_profile_ids() -> List[str]:
+        client = get_public_client()
+        response = await client.table("duong").select("id").execute()
+        return [row["id"] for row in (response.data or [])]
+
+    @staticmethod
+    async def find_stale() -> List[str]:
+        """So sánh snapshot đã lưu với bản build mới, trả về các profile_id bị thiếu hoặc stale"""
+        stale = []
+        for profile_id in await SnapshotService.list_profile_ids():
+            snapshot = await snapshot_store.read(profile_id)
+            body = await SnapshotService.build(profile_id)
+            if body is None:
+                continue
+            invalidated = snapshot is not None and (snapshot.get("invalidated_at") or 0) >= snapshot["built_at"]
+            if snapshot is None or invalidated or snapshot["etag"] != compute_etag(body):
+                stale.append(profile_id)
+        return stale
+
+    @staticmethod
+    async def rebuild_all() -> Dict[str, bool]:
+        """Build lại snapshot cho tất cả profile"""
+        return {profile_id: await SnapshotService.rebuild(profile_id) for profile_id in await SnapshotService.list_profile_ids()}
+
+
+add_invalidation_listener(SnapshotService.invalidate)
@@ -0,0 +1,199 @@
+import asyncio
+import os
+import re
+import stat
+from email.utils import formatdate
+from pathlib import Path
+from typing import Optional, Tuple
+from starlette.datastructures import Headers
+from starlette.responses import Response
+from starlette.types import Receive, Scope, Send
+
+# File upload có tên theo hash nội dung (không bao giờ bị ghi đè) nên cache được vĩnh viễn
+UPLOAD_CACHE_CONTROL = os.getenv("UPLOAD_CACHE_CONTROL", "public, max-age=31536000, immutable")
+STATIC_CHUNK_SIZE = int(os.getenv("STATIC_CHUNK_SIZE", str(256 * 1024)))
+
+# Chỉ serve ảnh trong các thư mục upload (không lộ file khác trong uploads/, vd: assets.json)
+STATIC_FOLDERS = ("images", "products")
+MEDIA_TYPES = {
+    ".jpg": "image/jpeg",
+    ".jpeg": "image/jpeg",
+    ".png": "image/png",
+    ".gif": "image/gif",
+    ".webp": "image/webp",
+    ".avif": "image/avif",
+}
+# Định dạng thay thế (cùng tên file, khác extension) theo thứ tự ưu tiên khi client Accept
+NEGOTIATED_FORMATS = ((".avif", "image/avif"), (".webp", "image/webp"))
+NEGOTIABLE_SUFFIXES = (".jpg", ".jpeg", ".png", ".webp")
+
+RANGE_PATTERN = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def _stat(path: Path) -> Optional[os.stat_result]:
+    try:
+        result = path.stat()
+    except (FileNotFoundError, NotADirectoryError):
+        return None
+    return result if stat.S_ISREG(result.st_mode) else None
+
+
+def _etag(path: Path, file_stat: os.stat_result) -> str:
+    # Tên file là hash nội dung nên tên + kích thước đủ làm strong ETag (không phụ thuộc mtime/instance)
+    return f'"{path.name}-{file_stat.st_size:x}"'
+
+
+def _parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """(start, end) của header Range 1 khoảng, None nếu không hợp lệ / không thỏa mãn được"""
+    match = RANGE_PATTERN.match(header.strip())
+    if match is None:
+        return None
+    start, end = match.groups()
+    if not start:
+        # bytes=-N: N byte cuối
+        if not end or int(end) == 0:
+            return None
+        return max(0, size - int(end)), size - 1
+    start = int(start)
+    end = min(int(end), size - 1) if end else size - 1
+    if start >= size or start > end:
+        return None
+    return start, end
+
+
+def _accepts(headers: Headers, media_type: str) -> bool:
+    accept = headers.get("accept", "")
+    return any(item.split(";")[0].strip() == media_type for item in accept.split(","))
+
+
+def _select_file(path: Path, headers: Headers) -> Tuple[Path, Optional[os.stat_result], str, bool]:
+    """Chọn file phù hợp nhất với Accept (vd: x-medium.webp -> x-medium.avif nếu client hỗ trợ)
+
+    Trả về (path, stat, media type, có negotiate theo Accept hay không)
+    """
+    suffix = path.suffix.lower()
+    negotiable = suffix in NEGOTIABLE_SUFFIXES
+    if negotiable:
+        for alternative_suffix, media_type in NEGOTIATED_FORMATS:
+            if alternative_suffix == suffix:
+                break
+            if _accepts(headers, media_type):
+                alternative = path.with_suffix(alternative_suffix)
+                alternative_stat = _stat(alternative)
+                if alternative_stat is not None:
+                    return alternative, alternative_stat, media_type, True
+    return path, _stat(path), MEDIA_TYPES[suffix], negotiable
+
+
+class UploadStaticFiles:
+    """Serve ảnh trong uploads/ (local development) thay cho StaticFiles
+
+    - Cache-Control immutable và strong ETag (If-None-Match -> 304)
+    - Range request 1 khoảng (206 / 416), hỗ trợ If-Range
+    - Zero-copy (sendfile) nếu ASGI server hỗ trợ extension http.response.zerocopysend
+    - Chọn bản AVIF/WebP cùng tên theo header Accept
+    """
+
+    def __init__(self, directory):
+        self.directory = Path(directory).resolve()
+
+    def _resolve(self, scope: Scope) -> Optional[Path]:
+        route_path = scope["path"]
+        root_path = scope.get("root_path", "")
+        if root_path and route_path.startswith(root_path):
+            route_path = route_path[len(root_path):]
+        parts = [part for part in route_path.split("/") if part]
+        if len(parts) < 2 or parts[0] not in STATIC_FOLDERS:
+            return None
+        if any(part.startswith(".") for part in parts):
+            return None
+        path = self.directory.joinpath(*parts)
+        if path.suffix.lower() not in MEDIA_TYPES:
+            return None
+        return path
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        assert scope["type"] == "http"
+        if scope["method"] not in ("GET", "HEAD"):
+            await Response("Method Not Allowed", status_code=405, headers={"Allow": "GET, HEAD"})(scope, receive, send)
+            return
+
+        path = self._resolve(scope)
+        if path is None:
+            await Response("Not Found", status_code=404)(scope, receive, send)
+            return
+        headers = Headers(scope=scope)
+        path, file_stat, media_type, negotiated = await asyncio.to_thread(_select_file, path, headers)
+        if file_stat is None:
+            await Response("Not Found", status_code=404)(scope, receive, send)
+            return
+
+        etag = _etag(path, file_stat)
+        response_headers = {
+            "cache-control": UPLOAD_CACHE_CONTROL,
+            "etag": etag,
+            "last-modified": formatdate(file_stat.st_mtime, usegmt=True),
+            "accept-ranges": "bytes",
+        }
+        if negotiated:
+            response_headers["vary"] = "Accept"
+
+        if_none_match = headers.get("if-none-match")
+        if if_none_match and etag in [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]:
+            await Response(status_code=304, headers=response_headers)(scope, receive, send)
+            return
+
+        size = file_stat.st_size
+        start, end, status_code = 0, size - 1, 200
+        range_header = headers.get("range")
+        if_range = headers.get("if-range")
+        # If-Range khác ETag hiện tại -> file đã đổi, trả về toàn bộ file; nhiều khoảng -> bỏ qua Range
+        if range_header and "," not in range_header and (not if_range or if_range.strip() == etag):
+            byte_range = _parse_range(range_header, size)
+            if byte_range is None:
+                await Response(
+                    status_code=416, headers={**response_headers, "content-range": f"bytes */{size}"}
+                )(scope, receive, send)
+                return
+            start, end = byte_range
+            status_code = 206
+            response_headers["content-range"] = f"bytes {start}-{end}/{size}"
+
+        count = end - start + 1 if size else 0
+        response_headers["content-type"] = media_type
+        response_headers["content-length"] = str(count)
+        await send({
+            "type": "http.response.start",
+            "status": status_code,
+            "headers": [(name.encode("latin-1"), value.encode("latin-1")) for name, value in response_headers.items()],
+        })
+        if scope["method"] == "HEAD" or count == 0:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+        await self._send_file(scope, send, path, start, count)
+
+    async def _send_file(self, scope: Scope, send: Send, path: Path, start: int, count: int) -> None:
+        file = await asyncio.to_thread(open, path, "rb")
+        try:
+            if "http.response.zerocopysend" in scope.get("extensions", {}):
+                # Server gửi thẳng từ file descriptor (sendfile), không copy qua Python
+                await send({
+                    "type": "http.response.zerocopysend",
+                    "file": file,
+                    "offset": start,
+                    "count": count,
+                    "more_body": False,
+                })
+                return
+            await asyncio.to_thread(file.seek, start)
+            remaining = count
+            while remaining > 0:
+                chunk = await asyncio.to_thread(file.read, min(STATIC_CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                await send({"type": "http.response.body", "body": chunk, "more_body": remaining > 0})
+            if remaining > 0:
+                await send({"type": "http.response.body", "body": b"", "more_body": False})
+        finally:
+            await asyncio.to_thread(file.close)
@@ -1,18 +1,28 @@
+from typing import List
 from fastapi import HTTPException
-from Entity.target import CreateTargetRequest, UpdateTargetRequest
-from Service.base_service import get_user_and_client, get_public_client
+from postgrest import CountMethod, ReturnMethod
+from Entity.target import CreateTargetRequest, UpdateTargetRequest, BatchUpdateTargetRequest
+from Entity.batch import BatchDeleteRequest
+from Service.base_service import get_user_and_client, get_public_client, page_limit, select_page, page_result, allowed_columns, select_columns, update_or_select
+from Service.public_cache import get_public_cache, set_public_cache, invalidate_public_cache
+from Service.batch_service import BatchService
+
+# Các cột client được chọn qua fields=
+TARGET_COLUMNS = allowed_columns(CreateTargetRequest, UpdateTargetRequest)
+
 
 class TargetService:
     @staticmethod
     async def create_target(data: CreateTargetRequest, token: str):
         """Tạo target mới"""
         try:
-            user_id, client = get_user_and_client(token)
+            user_id, client = await get_user_and_client(token)
             insert_data = data.model_dump()
             insert_data["profile_id"] = user_id
-            response = client.table("target").insert(insert_data).execute()
+            response = await client.table("target").insert(insert_data).execute()
             if not response.data:
                 raise HTTPException(status_code=500, detail="Failed to create target")
+            await invalidate_public_cache(user_id, "targets")
             return {"status": "success", "message": "Target created successfully", "data": response.data[0]}
         except HTTPException:
             raise
@@ -20,23 +30,24 @@ class TargetService:
             raise HTTPException(status_code=500, detail=f"Failed to create target: {str(e)}")
     
     @staticmethod
-    async def get_targets(token: str):
+    async def get_targets(token: str, limit: int = None, cursor: str = None, fields: str = None):
         """Lấy tất cả targets của user"""
         try:
-            user_id, client = get_user_and_client(token)
-            response = client.table("target").select("*").eq("profile_id", user_id).execute()
-            return {"status": "success", "data": response.data if response.data else [], "count": len(response.data) if response.data else 0}
+            user_id, client = await get_user_and_client(token)
+            limit = page_limit(limit)
+            response = await select_page(client.table("target"), select_columns(fields, TARGET_COLUMNS), limit, cursor).eq("profile_id", user_id).execute()
+            return page_result(response.data, limit, response.count)
         except HTTPException:
             raise
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Failed to get targets: {str(e)}")
     
     @staticmethod
-    async def get_target(target_id: str, token: str):
+    async def get_target(target_id: str, token: str, fields: str = None):
         """Lấy target theo ID"""
         try:
-            user_id, client = get_user_and_client(token)
-            response = client.table("target").select("*").eq("id", target_id).eq("profile_id", user_id).execute()
+            user_id, client = await get_user_and_client(token)
+            response = await client.table("target").select(select_columns(fields, TARGET_COLUMNS)).eq("id", target_id).eq("profile_id", user_id).execute()
             if not response.data:
                 raise HTTPException(status_code=404, detail="Target not found")
             return {"status": "success", "data": response.data[0]}
@@ -49,11 +60,13 @@ class TargetService:
     async def update_target(target_id: str, data: UpdateTargetRequest, token: str):
         """Cập nhật target"""
         try:
-            user_id, client = get_user_and_client(token)
+            user_id, client = await get_user_and_client(token)
             update_data = data.model_dump(exclude_none=True)
-            response = client.table("target").update(update_data).eq("id", target_id).eq("profile_id", user_id).execute()
+            response = await update_or_select(client, "target", update_data).eq("id", target_id).eq("profile_id", user_id).execute()
             if not response.data:
                 raise HTTPException(status_code=404, detail="Target not found")
+            if update_data:
+                await invalidate_public_cache(user_id, "targets")
             return {"status": "success", "message": "Target updated successfully", "data": response.data[0]}
         except HTTPException:
             raise
@@ -64,19 +77,68 @@ class TargetService:
     async def delete_target(target_id: str, token: str):
         """Xóa target"""
         try:
-            user_id, client = get_user_and_client(token)
-            response = client.table("target").delete().eq("id", target_id).eq("profile_id", user_id).execute()
+            user_id, client = await get_user_and_client(token)
+            # Không cần trả về dòng đã xóa, chỉ cần số dòng bị xóa
+            response = await client.table("target").delete(count=CountMethod.exact, returning=ReturnMethod.minimal).eq("id", target_id).eq("profile_id", user_id).execute()
+            if not response.count:
+                raise HTTPException(status_code=404, detail="Target not found")
+            await invalidate_public_cache(user_id, "targets")
             return {"status": "success", "message": "Target deleted successfully"}
+        except HTTPException:
+            raise
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Failed to delete target: {str(e)}")
     
     @staticmethod
-    async def get_public_targets(user_id: str):
+    async def create_targets(data: List[CreateTargetRequest], token: str):
+        """Tạo nhiều target trong 1 câu insert"""
+        try:
+            user_id, client = await get_user_and_client(token)
+            return await BatchService.create(client, user_id, "target", ("targets",), data)
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Failed to create targets: {str(e)}")
+    
+    @staticmethod
+    async def update_targets(data: List[BatchUpdateTargetRequest], token: str):
+        """Cập nhật nhiều target, trả về kết quả từng item"""
+        try:
+            user_id, client = await get_user_and_client(token)
+            return await BatchService.update(client, user_id, "target", ("targets",), data)
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Failed to update targets: {str(e)}")
+    
+    @staticmethod
+    async def delete_targets(data: BatchDeleteRequest, token: str):
+        """Xóa nhiều target trong 1 câu delete, trả về kết quả từng item"""
+        try:
+            user_id, client = await get_user_and_client(token)
+            return await BatchService.delete(client, user_id, "target", ("targets",), data.ids)
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Failed to delete targets: {str(e)}")
+    
+    @staticmethod
+    async def get_public_targets(user_id: str, limit: int = None, cursor: str = None, fields: str = None):
         """Lấy tất cả targets public của user (không cần token)"""
         try:
+            # Chỉ cache trang đầu với limit và fields mặc định
+            first_page = limit is None and cursor is None and fields is None
+            if first_page:
+                cached = get_public_cache(user_id, "targets")
+                if cached is not None:
+                    return cached
             client = get_public_client()
-            response = client.table("target").select("*").eq("profile_id", user_id).execute()
-            return {"status": "success", "data": response.data if response.data else [], "count": len(response.data) if response.data else 0}
+            limit = page_limit(limit)
+            response = await select_page(client.table("target"), select_columns(fields, TARGET_COLUMNS), limit, cursor).eq("profile_id", user_id).execute()
+            result = page_result(response.data, limit, response.count)
+            return set_public_cache(user_id, "targets", result) if first_page else result
+        except HTTPException:
+            raise
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Failed to get public targets: {str(e)}")
 
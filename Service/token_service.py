@@ -0,0 +1,129 @@
+import asyncio
+import os
+import time
+from typing import Any, Dict, Optional
+
+import jwt
+from fastapi import HTTPException
+from supabase import AuthApiError
+from Connection import connection
+from Service.ttl_cache import TTLCache
+
+# Secret HS256 của project (Supabase Dashboard > Settings > API > JWT Secret)
+SUPABASE_JWT_SECRET = os.getenv("SUPABASE_JWT_SECRET")
+SUPABASE_JWT_AUDIENCE = os.getenv("SUPABASE_JWT_AUDIENCE", "authenticated")
+SUPABASE_JWKS_URL = f"{connection.SUPABASE_URL.rstrip('/')}/auth/v1/.well-known/jwks.json"
+
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "2048"))
+# Token sai được nhớ trong thời gian ngắn để traffic rác không gọi lên Supabase Auth
+INVALID_TOKEN_TTL = float(os.getenv("INVALID_TOKEN_TTL", "30"))
+JWKS_CACHE_TTL = int(os.getenv("JWKS_CACHE_TTL", "600"))
+
+ASYMMETRIC_ALGORITHMS = ("RS256", "ES256")
+
+# token -> user (hết hạn đúng vào exp của token)
+_token_cache = TTLCache(maxsize=TOKEN_CACHE_SIZE, ttl=3600)
+_invalid_token_cache = TTLCache(maxsize=TOKEN_CACHE_SIZE, ttl=INVALID_TOKEN_TTL)
+_jwks_client: Optional[jwt.PyJWKClient] = None
+
+
+def _get_jwks_client() -> jwt.PyJWKClient:
+    global _jwks_client
+    if _jwks_client is None:
+        _jwks_client = jwt.PyJWKClient(SUPABASE_JWKS_URL, cache_keys=True, lifespan=JWKS_CACHE_TTL)
+    return _jwks_client
+
+
+async def _decode_locally(token: str) -> Optional[Dict[str, Any]]:
+    """Verify chữ ký JWT tại server. Trả về None nếu không có key để verify (cần hỏi Supabase Auth)"""
+    header = jwt.get_unverified_header(token)
+    algorithm = header.get("alg")
+    if algorithm == "HS256":
+        if not SUPABASE_JWT_SECRET:
+            return None
+        key = SUPABASE_JWT_SECRET
+    elif algorithm in ASYMMETRIC_ALGORITHMS:
+        try:
+            # PyJWKClient tải JWKS bằng urllib (blocking) nên chạy trong thread
+            signing_key = await asyncio.to_thread(_get_jwks_client().get_signing_key_from_jwt, token)
+            key = signing_key.key
+        except jwt.PyJWKClientConnectionError:
+            return None
+    else:
+        raise jwt.InvalidAlgorithmError(f"Unsupported algorithm: {algorithm}")
+
+    return jwt.decode(
+        token,
+        key,
+        algorithms=[algorithm],
+        audience=SUPABASE_JWT_AUDIENCE,
+        options={"require": ["exp", "sub"]},
+    )
+
+
+async def _fetch_user_upstream(token: str) -> Dict[str, Any]:
+    """Fallback: hỏi Supabase Auth khi không verify được token tại server"""
+    client = connection.get_supabase_client()
+    try:
+        user_response = await client.auth.get_user(token)
+    except AuthApiError:
+        user_response = None
+    if user_response is None or user_response.user is None:
+        raise jwt.InvalidTokenError("Token rejected by Supabase Auth")
+    return {
+        "id": user_response.user.id,
+        "email": user_response.user.email,
+        "created_at": user_response.user.created_at,
+    }
+
+
+def remember_token(token: str, user: Dict[str, Any], expires_at: Optional[float] = None) -> None:
+    """Lưu token -> user vào cache cho tới khi token hết hạn"""
+    if expires_at is None:
+        claims = jwt.decode(token, options={"verify_signature": False})
+        expires_at = claims.get("exp", 0)
+    _token_cache.set(token, user, ttl=expires_at - time.time())
+    _invalid_token_cache.pop(token)
+
+
+async def resolve_user(token: str) -> Dict[str, Any]:
+    """Verify token và trả về user (id, email, created_at), raise 401 nếu token không hợp lệ"""
+    if not token:
+        raise HTTPException(status_code=401, detail="Invalid token")
+
+    user = _token_cache.get(token)
+    if user is not None:
+        return user
+    if _invalid_token_cache.get(token):
+        raise HTTPException(status_code=401, detail="Invalid token")
+
+    try:
+        claims = await _decode_locally(token)
+        if claims is None:
+            user = await _fetch_user_upstream(token)
+            remember_token(token, user)
+        else:
+            # JWT không chứa created_at, chỉ có khi token được lưu lúc login
+            user = {"id": claims["sub"], "email": claims.get("email"), "created_at": None}
+            remember_token(token, user, claims["exp"])
+    except jwt.PyJWTError:
+        _invalid_token_cache.set(token, True)
+        raise HTTPException(status_code=401, detail="Invalid token")
+
+    return user
+
+
+async def resolve_user_details(token: str) -> Dict[str, Any]:
+    """Như resolve_user nhưng luôn có created_at
+
+    Token verify tại server không có created_at (JWT không chứa) -> hỏi Supabase Auth 1 lần và lưu lại vào cache
+    """
+    user = await resolve_user(token)
+    if user.get("created_at") is not None:
+        return user
+    try:
+        user = await _fetch_user_upstream(token)
+    except jwt.PyJWTError:
+        raise HTTPException(status_code=401, detail="Invalid token")
+    remember_token(token, user)
+    return user
@@ -0,0 +1,404 @@
+import hashlib
+import os
+import shutil
+import struct
+from pathlib import Path
+from tempfile import SpooledTemporaryFile
+from typing import List, NamedTuple, Optional, Tuple, Union
+from fastapi import HTTPException, Request, UploadFile
+from multipart.multipart import MultipartParser, parse_options_header
+from starlette.datastructures import Headers
+
+# Giới hạn upload, được kiểm tra ngay khi từng chunk tới (không đợi nhận hết file)
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(10 * 1024 * 1024)))
+MAX_IMAGE_DIMENSION = int(os.getenv("MAX_IMAGE_DIMENSION", "8000"))
+MAX_IMAGE_PIXELS = int(os.getenv("MAX_IMAGE_PIXELS", str(40_000_000)))
+# File nhỏ hơn UPLOAD_SPOOL_SIZE nằm trong RAM, lớn hơn thì được ghi ra file tạm trên disk
+UPLOAD_SPOOL_SIZE = int(os.getenv("UPLOAD_SPOOL_SIZE", str(1024 * 1024)))
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", str(64 * 1024)))
+# Số cấp thư mục con theo prefix của tên file (mỗi cấp 2 ký tự hex), tránh 1 thư mục chứa hàng trăm nghìn file
+UPLOAD_SHARD_DEPTH = int(os.getenv("UPLOAD_SHARD_DEPTH", "2"))
+# Upload nhiều file: số file tối đa mỗi request và số file được xử lý/upload đồng thời
+MAX_UPLOAD_FILES = int(os.getenv("MAX_UPLOAD_FILES", "10"))
+UPLOAD_CONCURRENCY = int(os.getenv("UPLOAD_CONCURRENCY", "4"))
+# Số byte đầu file tối đa được giữ lại để đọc kích thước ảnh (JPEG có thể có EXIF lớn trước SOF)
+HEADER_SCAN_BYTES = 512 * 1024
+# Phần dư cho boundary và header của multipart khi kiểm tra Content-Length
+MULTIPART_OVERHEAD = 16 * 1024
+
+# format -> (content type, extension)
+IMAGE_FORMATS = {
+    "jpeg": ("image/jpeg", ".jpg"),
+    "png": ("image/png", ".png"),
+    "gif": ("image/gif", ".gif"),
+    "webp": ("image/webp", ".webp"),
+    "avif": ("image/avif", ".avif"),
+}
+
+# OpenAPI schema cho các route upload đọc body trực tiếp (không khai báo UploadFile)
+UPLOAD_OPENAPI = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "multipart/form-data": {
+                "schema": {
+                    "type": "object",
+                    "properties": {"file": {"type": "string", "format": "binary"}},
+                    "required": ["file"],
+                }
+            }
+        },
+    }
+}
+
+UPLOAD_MULTI_OPENAPI = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "multipart/form-data": {
+                "schema": {
+                    "type": "object",
+                    "properties": {"files": {"type": "array", "items": {"type": "string", "format": "binary"}}},
+                    "required": ["files"],
+                }
+            }
+        },
+    }
+}
+
+
+class UploadedImage(NamedTuple):
+    file: UploadFile  # Đã seek về đầu file
+    format: str
+    width: Optional[int]
+    height: Optional[int]
+    sha256: str  # Hash nội dung, tính trong lúc nhận file (dùng để chống upload trùng)
+
+    @property
+    def content_type(self) -> str:
+        return IMAGE_FORMATS[self.format][0]
+
+    @property
+    def extension(self) -> str:
+        return IMAGE_FORMATS[self.format][1]
+
+
+class RejectedUpload(NamedTuple):
+    """File bị từ chối khi upload nhiều file (các file khác trong request vẫn được nhận)"""
+    filename: Optional[str]
+    error: HTTPException
+
+
+def sharded_path(directory: Path, filename: str) -> Path:
+    """uploads/images/ab/cd/abcd....png: thư mục con theo prefix hash của tên file"""
+    shards = [filename[level * 2:level * 2 + 2] for level in range(UPLOAD_SHARD_DEPTH)]
+    return directory.joinpath(*shards, filename)
+
+
+def copy_to_path(source, path) -> None:
+    """Ghi file upload ra disk theo từng chunk (chạy trong thread, không chặn event loop)"""
+    source.seek(0)
+    with open(path, "wb") as buffer:
+        shutil.copyfileobj(source, buffer, UPLOAD_CHUNK_SIZE)
+
+
+def detect_image_format(head: bytes) -> Optional[str]:
+    """Nhận diện định dạng ảnh từ magic bytes (không tin Content-Type do client gửi)"""
+    if head.startswith(b"\xff\xd8\xff"):
+        return "jpeg"
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "png"
+    if head[:6] in (b"GIF87a", b"GIF89a"):
+        return "gif"
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "webp"
+    if head[4:8] == b"ftyp" and head[8:12] in (b"avif", b"avis"):
+        return "avif"
+    return None
+
+
+def _jpeg_dimensions(head: bytes) -> Optional[Tuple[int, int]]:
+    # Duyệt các segment tới marker SOF (chứa height, width)
+    offset = 2
+    while offset + 9 <= len(head):
+        if head[offset] != 0xFF:
+            return None
+        marker = head[offset + 1]
+        if marker == 0xFF:
+            offset += 1
+            continue
+        if marker in (0xD8, 0x01) or 0xD0 <= marker <= 0xD7:
+            offset += 2
+            continue
+        length = struct.unpack(">H", head[offset + 2:offset + 4])[0]
+        if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+            height, width = struct.unpack(">HH", head[offset + 5:offset + 9])
+            return width, height
+        offset += 2 + length
+    return None
+
+
+def _webp_dimensions(head: bytes) -> Optional[Tuple[int, int]]:
+    chunk = head[12:16]
+    if chunk == b"VP8 " and len(head) >= 30:
+        width, height = struct.unpack("<HH", head[26:30])
+        return width & 0x3FFF, height & 0x3FFF
+    if chunk == b"VP8L" and len(head) >= 25:
+        bits = int.from_bytes(head[21:25], "little")
+        return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+    if chunk == b"VP8X" and len(head) >= 30:
+        return int.from_bytes(head[24:27], "little") + 1, int.from_bytes(head[27:30], "little") + 1
+    return None
+
+
+def _avif_dimensions(head: bytes) -> Optional[Tuple[int, int]]:
+    # Box "ispe": size(4) type(4) version/flags(4) width(4) height(4)
+    index = head.find(b"ispe")
+    if index < 0 or index + 16 > len(head):
+        return None
+    return struct.unpack(">II", head[index + 8:index + 16])
+
+
+def image_dimensions(head: bytes, image_format: str) -> Optional[Tuple[int, int]]:
+    """Đọc (width, height) từ phần đầu file, None nếu chưa đủ dữ liệu"""
+    if image_format == "png":
+        return struct.unpack(">II", head[16:24]) if len(head) >= 24 else None
+    if image_format == "gif":
+        return struct.unpack("<HH", head[6:10]) if len(head) >= 10 else None
+    if image_format == "jpeg":
+        return _jpeg_dimensions(head)
+    if image_format == "webp":
+        return _webp_dimensions(head)
+    if image_format == "avif":
+        return _avif_dimensions(head)
+    return None
+
+
+def check_dimensions(width: int, height: int) -> None:
+    if width > MAX_IMAGE_DIMENSION or height > MAX_IMAGE_DIMENSION or width * height > MAX_IMAGE_PIXELS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Ảnh quá lớn ({width}x{height}), tối đa {MAX_IMAGE_DIMENSION}px mỗi cạnh và {MAX_IMAGE_PIXELS} pixel",
+        )
+
+
+class ImageStreamValidator:
+    """Kiểm tra ảnh khi từng chunk tới: magic bytes, dung lượng, kích thước (width/height)"""
+
+    def __init__(self):
+        self.size = 0
+        self.head = b""
+        self.format: Optional[str] = None
+        self.dimensions: Optional[Tuple[int, int]] = None
+
+    def feed(self, data: bytes) -> None:
+        self.size += len(data)
+        if self.size > MAX_UPLOAD_BYTES:
+            raise HTTPException(status_code=413, detail=f"File quá lớn, tối đa {MAX_UPLOAD_BYTES} bytes")
+        if self.dimensions is not None:
+            return
+        # Chỉ giữ phần đầu file cho tới khi đọc được kích thước ảnh
+        self.head += data[:HEADER_SCAN_BYTES - len(self.head)]
+        if self.format is None and len(self.head) >= 16:
+            self.format = detect_image_format(self.head)
+            if self.format is None:
+                raise HTTPException(status_code=415, detail="File không phải ảnh hợp lệ (jpeg, png, gif, webp, avif)")
+        if self.format is not None:
+            self.dimensions = image_dimensions(self.head, self.format)
+            if self.dimensions is not None:
+                check_dimensions(*self.dimensions)
+                self.head = b""
+
+    def finish(self) -> None:
+        if self.size == 0:
+            raise HTTPException(status_code=400, detail="File rỗng")
+        if self.format is None:
+            self.format = detect_image_format(self.head)
+            if self.format is None:
+                raise HTTPException(status_code=415, detail="File không phải ảnh hợp lệ (jpeg, png, gif, webp, avif)")
+        # AVIF có thể đặt box ispe ở cuối file, các định dạng khác bắt buộc phải đọc được kích thước
+        if self.dimensions is None and self.format != "avif":
+            raise HTTPException(status_code=400, detail="Không đọc được kích thước ảnh")
+
+
+class _MultipartFileReceiver:
+    """Callbacks cho python-multipart: chỉ lấy dữ liệu của field file, bỏ qua các field khác"""
+
+    def __init__(self, field_name: str, max_files: int = 1):
+        self.field_name = field_name
+        self.max_files = max_files
+        self.header_field = b""
+        self.header_value = b""
+        self.headers: List[Tuple[bytes, bytes]] = []
+        # (filename, headers) của các file theo thứ tự trong body
+        self.files: List[Tuple[str, Headers]] = []
+        self.current: Optional[int] = None
+        self.too_many = False
+        self.ended = 0
+        # (vị trí file, dữ liệu) chờ được ghi
+        self.pending: List[Tuple[int, bytes]] = []
+
+    def on_part_begin(self) -> None:
+        self.headers = []
+
+    def on_header_field(self, data: bytes, start: int, end: int) -> None:
+        self.header_field += data[start:end]
+
+    def on_header_value(self, data: bytes, start: int, end: int) -> None:
+        self.header_value += data[start:end]
+
+    def on_header_end(self) -> None:
+        self.headers.append((self.header_field.lower(), self.header_value))
+        self.header_field = b""
+        self.header_value = b""
+
+    def on_headers_finished(self) -> None:
+        disposition = dict(self.headers).get(b"content-disposition", b"")
+        _, options = parse_options_header(disposition)
+        name = options.get(b"name", b"").decode("latin-1")
+        self.current = None
+        if name != self.field_name or b"filename" not in options:
+            return
+        if len(self.files) >= self.max_files:
+            self.too_many = True
+            return
+        self.files.append((options[b"filename"].decode("utf-8", errors="replace"), Headers(raw=self.headers)))
+        self.current = len(self.files) - 1
+
+    def on_part_data(self, data: bytes, start: int, end: int) -> None:
+        if self.current is not None:
+            self.pending.append((self.current, data[start:end]))
+
+    def on_part_end(self) -> None:
+        if self.current is not None:
+            self.current = None
+            self.ended += 1
+
+    def callbacks(self) -> dict:
+        return {
+            "on_part_begin": self.on_part_begin,
+            "on_header_field": self.on_header_field,
+            "on_header_value": self.on_header_value,
+            "on_header_end": self.on_header_end,
+            "on_headers_finished": self.on_headers_finished,
+            "on_part_data": self.on_part_data,
+            "on_part_end": self.on_part_end,
+        }
+
+
+class _IncomingFile:
+    """1 file đang được nhận: ghi vào file tạm, kiểm tra và tính hash theo từng chunk"""
+
+    def __init__(self, filename: str, headers: Headers):
+        self.upload = UploadFile(
+            file=SpooledTemporaryFile(max_size=UPLOAD_SPOOL_SIZE),
+            size=0,
+            filename=filename,
+            headers=headers,
+        )
+        self.validator = ImageStreamValidator()
+        self.hasher = hashlib.sha256()
+        self.error: Optional[HTTPException] = None
+
+    async def write(self, data: bytes) -> None:
+        self.validator.feed(data)
+        self.hasher.update(data)
+        # UploadFile.write chuyển sang threadpool khi file đã được ghi ra disk
+        await self.upload.write(data)
+
+    async def finish(self) -> UploadedImage:
+        self.validator.finish()
+        await self.upload.seek(0)
+        width, height = self.validator.dimensions or (None, None)
+        return UploadedImage(self.upload, self.validator.format, width, height, self.hasher.hexdigest())
+
+
+def _multipart_boundary(request: Request, max_bytes: int) -> bytes:
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    if content_type != b"multipart/form-data" or b"boundary" not in params:
+        raise HTTPException(status_code=400, detail="Request phải là multipart/form-data")
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > max_bytes + MULTIPART_OVERHEAD:
+        raise HTTPException(status_code=413, detail=f"File quá lớn, tối đa {max_bytes} bytes")
+    return params[b"boundary"]
+
+
+async def receive_image_upload(request: Request, field_name: str = "file") -> UploadedImage:
+    """Đọc file ảnh từ multipart body theo từng chunk và kiểm tra ngay khi dữ liệu tới
+
+    File quá lớn / không phải ảnh bị từ chối ở chunk đầu tiên vi phạm, phần còn lại của body
+    không được đọc. RAM dùng cho mỗi upload tối đa khoảng UPLOAD_SPOOL_SIZE + 1 chunk.
+    """
+    receiver = _MultipartFileReceiver(field_name)
+    parser = MultipartParser(_multipart_boundary(request, MAX_UPLOAD_BYTES), receiver.callbacks())
+    incoming: Optional[_IncomingFile] = None
+
+    try:
+        async for chunk in request.stream():
+            parser.write(chunk)
+            if receiver.files and incoming is None:
+                incoming = _IncomingFile(*receiver.files[0])
+            for _, data in receiver.pending:
+                await incoming.write(data)
+            receiver.pending.clear()
+            if receiver.ended:
+                break
+        parser.finalize()
+
+        if incoming is None:
+            raise HTTPException(status_code=400, detail=f"Thiếu field '{field_name}'")
+        return await incoming.finish()
+    except Exception:
+        if incoming is not None:
+            await incoming.upload.close()
+        raise
+
+
+async def receive_image_uploads(
+    request: Request, field_name: str = "files", max_files: int = MAX_UPLOAD_FILES
+) -> List[Union[UploadedImage, RejectedUpload]]:
+    """Đọc nhiều file ảnh từ 1 multipart body theo từng chunk, kết quả theo thứ tự file trong body
+
+    File không hợp lệ được trả về dạng RejectedUpload và phần dữ liệu còn lại của nó bị bỏ qua,
+    các file khác vẫn được nhận bình thường.
+    """
+    receiver = _MultipartFileReceiver(field_name, max_files)
+    parser = MultipartParser(_multipart_boundary(request, max_files * MAX_UPLOAD_BYTES), receiver.callbacks())
+    incoming: List[_IncomingFile] = []
+
+    try:
+        async for chunk in request.stream():
+            parser.write(chunk)
+            if receiver.too_many:
+                raise HTTPException(status_code=400, detail=f"Tối đa {max_files} file mỗi request")
+            while len(incoming) < len(receiver.files):
+                incoming.append(_IncomingFile(*receiver.files[len(incoming)]))
+            for index, data in receiver.pending:
+                item = incoming[index]
+                if item.error is not None:
+                    continue
+                try:
+                    await item.write(data)
+                except HTTPException as e:
+                    item.error = e
+                    await item.upload.close()
+            receiver.pending.clear()
+        parser.finalize()
+
+        if not incoming:
+            raise HTTPException(status_code=400, detail=f"Thiếu field '{field_name}'")
+        results: List[Union[UploadedImage, RejectedUpload]] = []
+        for item in incoming:
+            if item.error is None:
+                try:
+                    results.append(await item.finish())
+                    continue
+                except HTTPException as e:
+                    item.error = e
+                    await item.upload.close()
+            results.append(RejectedUpload(item.upload.filename, item.error))
+        return results
+    except Exception:
+        for item in incoming:
+            await item.upload.close()
+        raise
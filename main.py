@@ -1,24 +1,28 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException
+from fastapi import FastAPI, HTTPException, Request, Depends
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, JSONResponse, Response
+import asyncio
+import json
 import os
-import uuid
+from contextlib import asynccontextmanager
+from typing import List
 from pathlib import Path
 from Connection import connection
-from Service.cloudinary_service import upload_image_to_cloudinary
+from Service.cloudinary_service import upload_image_to_cloudinary, cloudinary_pool_stats, shutdown_cloudinary_pool, with_delivery_urls
 from Entity.auth import LoginRequest, RegisterRequest
 from Entity.profile import UpdateProfileRequest
-from Entity.image import CreateImageRequest, UpdateImageRequest
-from Entity.education import CreateEducationRequest, UpdateEducationRequest
-from Entity.job import CreateJobRequest, UpdateJobRequest
-from Entity.language import CreateLanguageRequest, UpdateLanguageRequest
-from Entity.contract import CreateContractRequest, UpdateContractRequest
-from Entity.achievement import CreateAchievementRequest, UpdateAchievementRequest
-from Entity.product import CreateProductRequest, UpdateProductRequest
-from Entity.product_image import CreateProductImageRequest, UpdateProductImageRequest
-from Entity.skill import CreateSkillRequest, UpdateSkillRequest
-from Entity.target import CreateTargetRequest, UpdateTargetRequest
+from Entity.image import CreateImageRequest, UpdateImageRequest, BatchUpdateImageRequest
+from Entity.education import CreateEducationRequest, UpdateEducationRequest, BatchUpdateEducationRequest
+from Entity.job import CreateJobRequest, UpdateJobRequest, BatchUpdateJobRequest
+from Entity.language import CreateLanguageRequest, UpdateLanguageRequest, BatchUpdateLanguageRequest
+from Entity.contract import CreateContractRequest, UpdateContractRequest, BatchUpdateContractRequest
+from Entity.achievement import CreateAchievementRequest, UpdateAchievementRequest, BatchUpdateAchievementRequest
+from Entity.product import CreateProductRequest, UpdateProductRequest, BatchUpdateProductRequest
+from Entity.product_image import CreateProductImageRequest, UpdateProductImageRequest, BatchUpdateProductImageRequest
+from Entity.skill import CreateSkillRequest, UpdateSkillRequest, BatchUpdateSkillRequest
+from Entity.target import CreateTargetRequest, UpdateTargetRequest, BatchUpdateTargetRequest
+from Entity.batch import BatchDeleteRequest, BatchRequest
+from Entity.upload import ConfirmUploadRequest
 from Service.auth_service import AuthService
 from Service.profile_service import ProfileService
 from Service.image_service import ImageService
@@ -31,11 +35,41 @@ from Service.product_service import ProductService
 from Service.product_image_service import ProductImageService
 from Service.skill_service import SkillService
 from Service.target_service import TargetService
+from Service.public_profile_service import PublicProfileService
+from Service.me_service import MeService
+from Service.batch_request_service import BatchRequestService
+from Service.direct_upload_service import DirectUploadService
+from Service.resumable_upload_service import ResumableUploadService, TUS_VERSION
+from Service.public_cache import public_cache
+from Service.base_service import page_limit, select_page, page_result, get_user_context, UserContext
+from Service.http_cache import conditional_response, conditional_json_response, parse_timestamp
+from Service.snapshot_service import SnapshotService
+from Service.upload_service import (
+    receive_image_upload, receive_image_uploads, copy_to_path, sharded_path, RejectedUpload,
+    UPLOAD_OPENAPI, UPLOAD_MULTI_OPENAPI, MAX_IMAGE_PIXELS, UPLOAD_CONCURRENCY
+)
+from Service.asset_service import AssetService
+from Service.static_service import UploadStaticFiles
+from Service.image_pipeline import (
+    build_image_variants, build_image_placeholder, image_metadata, variant_urls, build_srcset, shutdown_image_pipeline
+)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Khởi tạo connection pool Supabase khi start và đóng khi shutdown"""
+    connection.manager.start()
+    yield
+    await connection.manager.close()
+    shutdown_cloudinary_pool()
+    shutdown_image_pipeline()
+
 
 app = FastAPI(
     title="Profile API",
     description="API for Profile Management",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Kiểm tra xem có đang chạy trên Vercel không
@@ -74,8 +108,8 @@ if not USE_CLOUDINARY and not IS_VERCEL:
     try:
         UPLOAD_IMAGES_DIR.mkdir(parents=True, exist_ok=True)
         UPLOAD_PRODUCTS_DIR.mkdir(parents=True, exist_ok=True)
-        # Mount static files để serve ảnh (chỉ khi không phải Vercel)
-        app.mount("/uploads", StaticFiles(directory="uploads"), name="uploads")
+        # Serve ảnh đã upload (chỉ khi không phải Vercel): cache immutable, ETag, Range, chọn AVIF/WebP theo Accept
+        app.mount("/uploads", UploadStaticFiles(UPLOAD_DIR), name="uploads")
     except Exception as e:
         print(f"Warning: Could not create upload directories or mount static files: {e}")
         print("Local file uploads will not be available. Please use Cloudinary instead.")
@@ -98,6 +132,8 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Header của upload resumable (tus) mà client trên browser cần đọc
+    expose_headers=["Location", "Upload-Offset", "Upload-Length", "Tus-Resumable"],
 )
 
 
@@ -115,21 +151,39 @@ async def root():
     }
 
 @app.get("/all")
-async def all_():
-    """Lấy tất cả dữ liệu từ bảng duong (test endpoint)"""
+async def all_(limit: int = None, cursor: str = None):
+    """Lấy dữ liệu từ bảng duong theo trang (test endpoint)"""
     try:
-        client = connection.get_supabase_client()
-        response = client.table("duong").select("*").execute()
+        client = connection.get_service_client()
+        limit = page_limit(limit)
+        response = await select_page(client.table("duong"), "*", limit, cursor).execute()
         
-        return {
-            "data": response.data,
-            "status": "success",
-            "count": len(response.data) if response.data else 0
-        }
+        return page_result(response.data, limit, response.count)
+    except HTTPException:
+        raise
     except Exception as e:
         return {"error": str(e), "status": "error"}
 
 
+@app.get("/cache/stats")
+async def cache_stats():
+    """Thống kê hit/miss của cache public"""
+    return {"status": "success", "public_cache": public_cache.stats()}
+
+
+@app.get("/upload/stats")
+async def upload_stats():
+    """Hàng đợi và số lời gọi Cloudinary (đang chờ, đang chạy, timeout, bị từ chối)"""
+    return {"status": "success", "cloudinary": cloudinary_pool_stats()}
+
+
+# ========== BATCH ROUTES ==========
+@app.post("/batch")
+async def batch(data: BatchRequest, request: Request):
+    """Chạy nhiều request (method, path, body) trong 1 lần gọi, trả về kết quả của từng request"""
+    return await BatchRequestService.execute(app, data, request.headers)
+
+
 # ========== AUTH ROUTES ==========
 @app.post("/login")
 async def login(credentials: LoginRequest):
@@ -157,186 +211,281 @@ async def update_profile(profile_data: UpdateProfileRequest, token: str):
 
 
 @app.get("/profile")
-async def get_profile(token: str):
-    """Lấy profile từ bảng duong"""
-    return await ProfileService.get_profile(token)
+async def get_profile(token: str, fields: str = None, img: str = None):
+    """Lấy profile từ bảng duong (img: thêm URL Cloudinary đã tối ưu cho avatar/cover)"""
+    return with_delivery_urls(await ProfileService.get_profile(token, fields), img)
+
+
+@app.get("/me/all")
+async def get_me_all(user: UserContext = Depends(get_user_context)):
+    """Lấy profile và tất cả section của user đang đăng nhập trong 1 request (dùng cho trang chỉnh sửa)"""
+    return await MeService.get_me_all(user.user_id, user.client)
 
 
 @app.get("/profile/public")
-async def get_public_profile():
+async def get_public_profile(request: Request, fields: str = None, img: str = None):
     """Lấy profile public (không cần token) - lấy profile đầu tiên"""
-    return await ProfileService.get_public_profile()
+    result = await ProfileService.get_public_profile(fields=fields)
+    profile = result.get("data") or {}
+    return conditional_json_response(request, with_delivery_urls(result, img), last_modified=parse_timestamp(profile.get("update_at")))
 
 
 @app.get("/profile/public/all")
-async def get_public_profile_all():
-    """Lấy tất cả dữ liệu public (profile, images, educations, jobs, languages, contracts)"""
-    try:
-        # Lấy profile đầu tiên
-        profile_res = await ProfileService.get_public_profile()
-        
-        if not profile_res or not profile_res.get("data"):
-            return {
-                "status": "success",
-                "message": "No profile found",
-                "profile": None,
-                "images": {"data": []},
-                "educations": {"data": []},
-                "jobs": {"data": []},
-                "languages": {"data": []},
-                "contracts": {"data": []},
-                "achievements": {"data": []},
-                "products": {"data": []},
-                "product_images": {"data": []}
-            }
-        
-        user_id = profile_res["data"]["id"]
-        
-        # Lấy tất cả dữ liệu của user đó
-        images = await ImageService.get_public_images(user_id)
-        educations = await EducationService.get_public_educations(user_id)
-        jobs = await JobService.get_public_jobs(user_id)
-        languages = await LanguageService.get_public_languages(user_id)
-        contracts = await ContractService.get_public_contracts(user_id)
-        
-        achievements = await AchievementService.get_public_achievements(user_id)
-        products = await ProductService.get_public_products(user_id)
-        product_images = await ProductImageService.get_public_product_images(user_id)
-        skills = await SkillService.get_public_skills(user_id)
-        targets = await TargetService.get_public_targets(user_id)
-
-        return {
-            "status": "success",
-            "profile": profile_res,
-            "images": images,
-            "educations": educations,
-            "jobs": jobs,
-            "languages": languages,
-            "contracts": contracts,
-            "achievements": achievements,
-            "products": products,
-            "product_images": product_images,
-            "skills": skills,
-            "targets": targets
-        }
-    except Exception as e:
-        from fastapi import HTTPException
-        raise HTTPException(status_code=500, detail=f"Failed to get public profile all: {str(e)}")
+async def get_public_profile_all(request: Request, img: str = None):
+    """Lấy tất cả dữ liệu public (profile, images, educations, jobs, languages, contracts, ...)
+
+    img (thumb | card | full | srcset): thêm URL Cloudinary đã tối ưu cạnh các URL ảnh
+    """
+    # Ưu tiên trả về snapshot đã serialize sẵn (được build lại mỗi khi dữ liệu thay đổi)
+    snapshot = await SnapshotService.get_public_snapshot()
+    if snapshot is not None:
+        if img:
+            return conditional_json_response(request, with_delivery_urls(json.loads(snapshot["body"]), img))
+        return conditional_response(request, snapshot["body"], etag=snapshot["etag"])
+    
+    # Không có Last-Modified vì update_at chỉ thay đổi theo bảng duong, không theo các section
+    result = await PublicProfileService.get_public_profile_all()
+    return conditional_json_response(request, with_delivery_urls(result, img))
 
 
 # ========== UPLOAD ROUTES ==========
-@app.post("/upload/image")
-async def upload_image(file: UploadFile = File(...), token: str = None):
-    """Upload ảnh và trả về đường dẫn"""
+async def save_local_upload(upload, directory: Path, folder: str):
+    """Lưu ảnh upload vào uploads/<folder> và tạo các bản resize (thumb/medium/large) WebP/AVIF"""
+    # Tên file theo hash nội dung, extension theo định dạng thật của file
+    unique_filename = f"{upload.sha256[:32]}{upload.extension}"
+    file_path = sharded_path(directory, unique_filename)
+    
+    await asyncio.to_thread(file_path.parent.mkdir, parents=True, exist_ok=True)
+    await asyncio.to_thread(copy_to_path, upload.file.file, file_path)
     try:
-        # Kiểm tra token nếu có
-        if token:
-            from Service.base_service import get_user_and_client
-            get_user_and_client(token)
-        
-        # Kiểm tra file type
-        if not file.content_type or not file.content_type.startswith('image/'):
-            raise HTTPException(status_code=400, detail="File phải là ảnh")
-        
-        # Đọc nội dung file
-        content = await file.read()
-        
-        # Upload lên Cloudinary hoặc lưu local
+        variants = await build_image_variants(file_path, upload.format, MAX_IMAGE_PIXELS)
+        # Pipeline bị tắt: vẫn tính kích thước, màu chủ đạo và BlurHash
+        metadata = image_metadata(variants or await build_image_placeholder(file_path, MAX_IMAGE_PIXELS))
+    except HTTPException:
+        for path in [file_path, *file_path.parent.glob(f"{file_path.stem}-*")]:
+            path.unlink(missing_ok=True)
+        raise
+    
+    # Trả về đường dẫn (full URL)
+    base_url = f"http://127.0.0.1:8000/uploads/{folder}/{file_path.parent.relative_to(directory).as_posix()}/"
+    return {
+        "image_url": base_url + unique_filename,
+        "filename": unique_filename,
+        "folder": folder,
+        **metadata,
+        "variants": variant_urls(base_url, variants),
+        "srcset": build_srcset(base_url, variants)
+    }
+
+
+async def store_upload(upload, folder: str, directory: Path = None):
+    """Lưu ảnh lên Cloudinary hoặc local, ảnh trùng nội dung với ảnh đã lưu thì dùng lại asset cũ"""
+    # Ảnh giống hệt đã được upload vào cùng folder trước đó -> trả về luôn, không ghi file / gọi Cloudinary
+    # (key gồm cả folder: cùng ảnh upload vào images/ và products/ là 2 asset riêng, URL đúng folder)
+    content_hash = f"{folder}:{upload.sha256}"
+    asset = await AssetService.find(content_hash)
+    deduplicated = asset is not None
+    
+    if asset is None:
         if USE_CLOUDINARY:
-            # Upload lên Cloudinary
-            file_ext = os.path.splitext(file.filename)[1] if file.filename else '.jpg'
-            public_id = f"images/{uuid.uuid4()}"
-            
+            # Màu chủ đạo và BlurHash tính trên server (Cloudinary chỉ trả về width/height)
+            metadata = image_metadata(await build_image_placeholder(upload.file.file, MAX_IMAGE_PIXELS))
+            # Upload lên Cloudinary (đọc trực tiếp từ file tạm, không load cả file vào RAM)
             result = await upload_image_to_cloudinary(
-                file_content=content,
-                folder="uploads/images",
-                public_id=public_id
+                file_content=upload.file.file,
+                folder=f"uploads/{folder}",
+                public_id=upload.sha256[:32]
             )
-            
-            return {
-                "status": "success",
-                "message": "Upload thành công",
+            asset = {
                 "image_url": result["image_url"],
-                "public_id": result["public_id"]
+                "public_id": result["public_id"],
+                **metadata,
+                "width": result["width"] or metadata["width"] or upload.width,
+                "height": result["height"] or metadata["height"] or upload.height
             }
         else:
-            # Lưu local (development)
-            file_ext = os.path.splitext(file.filename)[1] if file.filename else '.jpg'
-            unique_filename = f"{uuid.uuid4()}{file_ext}"
-            file_path = UPLOAD_IMAGES_DIR / unique_filename
-            
-            with open(file_path, "wb") as buffer:
-                buffer.write(content)
-            
-            # Trả về đường dẫn (full URL)
-            image_url = f"http://127.0.0.1:8000/uploads/images/{unique_filename}"
-            return {
-                "status": "success",
-                "message": "Upload thành công",
-                "image_url": image_url,
-                "filename": unique_filename
-            }
+            # Lưu local (development) kèm các bản resize
+            asset = await save_local_upload(upload, directory, folder)
+        await AssetService.register(content_hash, asset)
+    
+    return {
+        "status": "success",
+        "message": "Upload thành công",
+        **asset,
+        "deduplicated": deduplicated
+    }
+
+
+async def handle_upload(request: Request, token: str, folder: str, directory: Path = None):
+    upload = None
+    try:
+        # Kiểm tra token nếu có
+        if token:
+            from Service.base_service import get_user_and_client
+            await get_user_and_client(token)
+        
+        # Đọc file theo từng chunk, kiểm tra định dạng (magic bytes), dung lượng và kích thước ngay khi nhận
+        upload = await receive_image_upload(request)
+        return await store_upload(upload, folder, directory)
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Upload thất bại: {str(e)}")
+    finally:
+        if upload is not None:
+            await upload.file.close()
 
 
-@app.post("/upload/product-image")
-async def upload_product_image(file: UploadFile = File(...), token: str = None):
+@app.post("/upload/image", openapi_extra=UPLOAD_OPENAPI)
+async def upload_image(request: Request, token: str = None):
+    """Upload ảnh và trả về đường dẫn"""
+    return await handle_upload(request, token, "images", None if USE_CLOUDINARY else UPLOAD_IMAGES_DIR)
+
+
+@app.post("/upload/product-image", openapi_extra=UPLOAD_OPENAPI)
+async def upload_product_image(request: Request, token: str = None):
     """Upload ảnh sản phẩm và trả về đường dẫn"""
+    return await handle_upload(request, token, "products", None if USE_CLOUDINARY else UPLOAD_PRODUCTS_DIR)
+
+
+@app.post("/upload/product-images", openapi_extra=UPLOAD_MULTI_OPENAPI)
+async def upload_product_images(request: Request, token: str = None, product_id: str = None):
+    """Upload nhiều ảnh sản phẩm trong 1 request (field 'files'), xử lý/upload đồng thời
+
+    Nếu có product_id: tạo luôn các dòng productImages cho những ảnh upload thành công (1 câu insert)
+    """
+    uploads = []
     try:
-        # Kiểm tra token nếu có
+        # Tạo productImages cần token
+        if product_id and not token:
+            raise HTTPException(status_code=401, detail="Token is required to create product images")
         if token:
             from Service.base_service import get_user_and_client
-            get_user_and_client(token)
+            await get_user_and_client(token)
         
-        # Kiểm tra file type
-        if not file.content_type or not file.content_type.startswith('image/'):
-            raise HTTPException(status_code=400, detail="File phải là ảnh")
+        uploads = await receive_image_uploads(request)
+        directory = None if USE_CLOUDINARY else UPLOAD_PRODUCTS_DIR
+        semaphore = asyncio.Semaphore(UPLOAD_CONCURRENCY)
         
-        # Đọc nội dung file
-        content = await file.read()
+        async def process(index: int, upload):
+            if isinstance(upload, RejectedUpload):
+                return {"index": index, "original_filename": upload.filename, "status": "error", "status_code": upload.error.status_code, "detail": upload.error.detail}
+            async with semaphore:
+                try:
+                    result = await store_upload(upload, "products", directory)
+                except HTTPException as e:
+                    return {"index": index, "original_filename": upload.file.filename, "status": "error", "status_code": e.status_code, "detail": e.detail}
+                except Exception as e:
+                    return {"index": index, "original_filename": upload.file.filename, "status": "error", "status_code": 500, "detail": f"Upload thất bại: {str(e)}"}
+            return {"index": index, "original_filename": upload.file.filename, **result}
         
-        # Upload lên Cloudinary hoặc lưu local
-        if USE_CLOUDINARY:
-            # Upload lên Cloudinary
-            file_ext = os.path.splitext(file.filename)[1] if file.filename else '.jpg'
-            public_id = f"products/{uuid.uuid4()}"
-            
-            result = await upload_image_to_cloudinary(
-                file_content=content,
-                folder="uploads/products",
-                public_id=public_id
+        results = await asyncio.gather(*(process(index, upload) for index, upload in enumerate(uploads)))
+        uploaded = [result for result in results if result["status"] == "success"]
+        
+        if product_id and uploaded:
+            created = await ProductImageService.create_product_images(
+                [
+                    CreateProductImageRequest(product_id=product_id, image_url=result["image_url"], **image_metadata(result))
+                    for result in uploaded
+                ],
+                token
             )
-            
-            return {
-                "status": "success",
-                "message": "Upload thành công",
-                "image_url": result["image_url"],
-                "public_id": result["public_id"]
-            }
+            for result, item in zip(uploaded, created["results"]):
+                result["product_image"] = {key: value for key, value in item.items() if key != "index"}
+        
+        return {
+            "status": "success",
+            "message": f"{len(uploaded)}/{len(results)} ảnh upload thành công",
+            "results": results
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Upload thất bại: {str(e)}")
+    finally:
+        for upload in uploads:
+            if not isinstance(upload, RejectedUpload):
+                await upload.file.close()
+
+
+# ========== RESUMABLE UPLOAD ROUTES (tus 1.0.0) ==========
+TUS_HEADERS = {"Tus-Resumable": TUS_VERSION}
+
+
+@app.post("/upload/resumable")
+async def create_resumable_upload(request: Request, token: str = None, folder: str = "images"):
+    """Tạo upload resumable: gửi header Upload-Length, nhận Location để gửi các chunk bằng PATCH"""
+    upload_id = await ResumableUploadService.create(request, token, folder)
+    return Response(status_code=201, headers={**TUS_HEADERS, "Location": f"/upload/resumable/{upload_id}", "Upload-Offset": "0"})
+
+
+@app.head("/upload/resumable/{upload_id}")
+async def get_resumable_upload_offset(upload_id: str):
+    """Offset đã nhận, client gửi tiếp từ offset này sau khi mất kết nối"""
+    status = ResumableUploadService.get_status(upload_id)
+    return Response(headers={
+        **TUS_HEADERS,
+        "Upload-Offset": str(status["offset"]),
+        "Upload-Length": str(status["length"]),
+        "Cache-Control": "no-store"
+    })
+
+
+@app.get("/upload/resumable/{upload_id}")
+async def get_resumable_upload(upload_id: str):
+    """Trạng thái upload, kèm kết quả (URL ảnh) khi đã hoàn thành"""
+    return ResumableUploadService.get_status(upload_id)
+
+
+@app.patch("/upload/resumable/{upload_id}")
+async def append_resumable_upload(upload_id: str, request: Request):
+    """Gửi chunk tiếp theo (Content-Type: application/offset+octet-stream, header Upload-Offset)
+
+    Chunk cuối cùng: lưu ảnh như upload thường (Cloudinary hoặc local) và trả về kết quả
+    """
+    appended = await ResumableUploadService.append(upload_id, request)
+    headers = {**TUS_HEADERS, "Upload-Offset": str(appended.offset)}
+    if appended.upload is None:
+        return Response(status_code=204, headers=headers)
+    try:
+        if USE_CLOUDINARY:
+            directory = None
         else:
-            # Lưu local (development)
-            file_ext = os.path.splitext(file.filename)[1] if file.filename else '.jpg'
-            unique_filename = f"{uuid.uuid4()}{file_ext}"
-            file_path = UPLOAD_PRODUCTS_DIR / unique_filename
-            
-            with open(file_path, "wb") as buffer:
-                buffer.write(content)
-            
-            # Trả về đường dẫn (full URL)
-            image_url = f"http://127.0.0.1:8000/uploads/products/{unique_filename}"
-            return {
-                "status": "success",
-                "message": "Upload thành công",
-                "image_url": image_url,
-                "filename": unique_filename
-            }
+            directory = UPLOAD_IMAGES_DIR if appended.folder == "images" else UPLOAD_PRODUCTS_DIR
+        result = await store_upload(appended.upload, appended.folder, directory)
+        ResumableUploadService.complete(upload_id, result)
+        return JSONResponse(result, headers=headers)
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Upload thất bại: {str(e)}")
+    finally:
+        await appended.upload.file.close()
+        # Lưu lỗi: HEAD báo thiếu byte cuối để client tus gửi lại thay vì coi như đã xong
+        ResumableUploadService.end_finalize(upload_id)
+
+
+@app.delete("/upload/resumable/{upload_id}")
+async def delete_resumable_upload(upload_id: str):
+    """Hủy upload resumable"""
+    ResumableUploadService.terminate(upload_id)
+    return Response(status_code=204, headers=TUS_HEADERS)
+
+
+@app.post("/upload/signature")
+async def create_upload_signature(token: str, folder: str = "images"):
+    """Tạo tham số đã ký để client upload ảnh thẳng lên Cloudinary (folder: images | products)"""
+    if not USE_CLOUDINARY:
+        raise HTTPException(status_code=400, detail="Direct upload requires Cloudinary")
+    return await DirectUploadService.create_signed_upload(token, folder)
+
+
+@app.post("/upload/confirm")
+async def confirm_upload(data: ConfirmUploadRequest, token: str):
+    """Xác nhận ảnh đã upload thẳng lên Cloudinary, trả về URL"""
+    if not USE_CLOUDINARY:
+        raise HTTPException(status_code=400, detail="Direct upload requires Cloudinary")
+    return await DirectUploadService.confirm_upload(data, token)
 
 
 # ========== IMAGES ROUTES ==========
@@ -346,16 +495,34 @@ async def create_image(data: CreateImageRequest, token: str):
     return await ImageService.create_image(data, token)
 
 
+@app.post("/images/batch")
+async def create_images(data: List[CreateImageRequest], token: str):
+    """Tạo nhiều images trong 1 request"""
+    return await ImageService.create_images(data, token)
+
+
+@app.put("/images/batch")
+async def update_images(data: List[BatchUpdateImageRequest], token: str):
+    """Cập nhật nhiều images trong 1 request"""
+    return await ImageService.update_images(data, token)
+
+
+@app.delete("/images/batch")
+async def delete_images(data: BatchDeleteRequest, token: str):
+    """Xóa nhiều images trong 1 request"""
+    return await ImageService.delete_images(data, token)
+
+
 @app.get("/images")
-async def get_images(token: str):
-    """Lấy tất cả images của user"""
-    return await ImageService.get_images(token)
+async def get_images(token: str, limit: int = None, cursor: str = None, fields: str = None, img: str = None):
+    """Lấy tất cả images của user (img: thumb | card | full | srcset)"""
+    return with_delivery_urls(await ImageService.get_images(token, limit, cursor, fields), img)
 
 
 @app.get("/images/{image_id}")
-async def get_image(image_id: str, token: str):
+async def get_image(image_id: str, token: str, fields: str = None, img: str = None):
     """Lấy image theo ID"""
-    return await ImageService.get_image(image_id, token)
+    return with_delivery_urls(await ImageService.get_image(image_id, token, fields), img)
 
 
 @app.put("/images/{image_id}")
@@ -377,16 +544,34 @@ async def create_education(data: CreateEducationRequest, token: str):
     return await EducationService.create_education(data, token)
 
 
+@app.post("/educations/batch")
+async def create_educations(data: List[CreateEducationRequest], token: str):
+    """Tạo nhiều educations trong 1 request"""
+    return await EducationService.create_educations(data, token)
+
+
+@app.put("/educations/batch")
+async def update_educations(data: List[BatchUpdateEducationRequest], token: str):
+    """Cập nhật nhiều educations trong 1 request"""
+    return await EducationService.update_educations(data, token)
+
+
+@app.delete("/educations/batch")
+async def delete_educations(data: BatchDeleteRequest, token: str):
+    """Xóa nhiều educations trong 1 request"""
+    return await EducationService.delete_educations(data, token)
+
+
 @app.get("/educations")
-async def get_educations(token: str):
+async def get_educations(token: str, limit: int = None, cursor: str = None, fields: str = None):
     """Lấy tất cả educations của user"""
-    return await EducationService.get_educations(token)
+    return await EducationService.get_educations(token, limit, cursor, fields)
 
 
 @app.get("/educations/{education_id}")
-async def get_education(education_id: str, token: str):
+async def get_education(education_id: str, token: str, fields: str = None):
     """Lấy education theo ID"""
-    return await EducationService.get_education(education_id, token)
+    return await EducationService.get_education(education_id, token, fields)
 
 
 @app.put("/educations/{education_id}")
@@ -408,16 +593,34 @@ async def create_job(data: CreateJobRequest, token: str):
     return await JobService.create_job(data, token)
 
 
+@app.post("/jobs/batch")
+async def create_jobs(data: List[CreateJobRequest], token: str):
+    """Tạo nhiều jobs trong 1 request"""
+    return await JobService.create_jobs(data, token)
+
+
+@app.put("/jobs/batch")
+async def update_jobs(data: List[BatchUpdateJobRequest], token: str):
+    """Cập nhật nhiều jobs trong 1 request"""
+    return await JobService.update_jobs(data, token)
+
+
+@app.delete("/jobs/batch")
+async def delete_jobs(data: BatchDeleteRequest, token: str):
+    """Xóa nhiều jobs trong 1 request"""
+    return await JobService.delete_jobs(data, token)
+
+
 @app.get("/jobs")
-async def get_jobs(token: str):
+async def get_jobs(token: str, limit: int = None, cursor: str = None, fields: str = None):
     """Lấy tất cả jobs của user"""
-    return await JobService.get_jobs(token)
+    return await JobService.get_jobs(token, limit, cursor, fields)
 
 
 @app.get("/jobs/{job_id}")
-async def get_job(job_id: str, token: str):
+async def get_job(job_id: str, token: str, fields: str = None):
     """Lấy job theo ID"""
-    return await JobService.get_job(job_id, token)
+    return await JobService.get_job(job_id, token, fields)
 
 
 @app.put("/jobs/{job_id}")
@@ -439,16 +642,34 @@ async def create_language(data: CreateLanguageRequest, token: str):
     return await LanguageService.create_language(data, token)
 
 
+@app.post("/languages/batch")
+async def create_languages(data: List[CreateLanguageRequest], token: str):
+    """Tạo nhiều languages trong 1 request"""
+    return await LanguageService.create_languages(data, token)
+
+
+@app.put("/languages/batch")
+async def update_languages(data: List[BatchUpdateLanguageRequest], token: str):
+    """Cập nhật nhiều languages trong 1 request"""
+    return await LanguageService.update_languages(data, token)
+
+
+@app.delete("/languages/batch")
+async def delete_languages(data: BatchDeleteRequest, token: str):
+    """Xóa nhiều languages trong 1 request"""
+    return await LanguageService.delete_languages(data, token)
+
+
 @app.get("/languages")
-async def get_languages(token: str):
+async def get_languages(token: str, limit: int = None, cursor: str = None, fields: str = None):
     """Lấy tất cả languages của user"""
-    return await LanguageService.get_languages(token)
+    return await LanguageService.get_languages(token, limit, cursor, fields)
 
 
 @app.get("/languages/{language_id}")
-async def get_language(language_id: str, token: str):
+async def get_language(language_id: str, token: str, fields: str = None):
     """Lấy language theo ID"""
-    return await LanguageService.get_language(language_id, token)
+    return await LanguageService.get_language(language_id, token, fields)
 
 
 @app.put("/languages/{language_id}")
@@ -470,16 +691,34 @@ async def create_contract(data: CreateContractRequest, token: str):
     return await ContractService.create_contract(data, token)
 
 
+@app.post("/contracts/batch")
+async def create_contracts(data: List[CreateContractRequest], token: str):
+    """Tạo nhiều contracts trong 1 request"""
+    return await ContractService.create_contracts(data, token)
+
+
+@app.put("/contracts/batch")
+async def update_contracts(data: List[BatchUpdateContractRequest], token: str):
+    """Cập nhật nhiều contracts trong 1 request"""
+    return await ContractService.update_contracts(data, token)
+
+
+@app.delete("/contracts/batch")
+async def delete_contracts(data: BatchDeleteRequest, token: str):
+    """Xóa nhiều contracts trong 1 request"""
+    return await ContractService.delete_contracts(data, token)
+
+
 @app.get("/contracts")
-async def get_contracts(token: str):
+async def get_contracts(token: str, limit: int = None, cursor: str = None, fields: str = None):
     """Lấy tất cả contracts của user"""
-    return await ContractService.get_contracts(token)
+    return await ContractService.get_contracts(token, limit, cursor, fields)
 
 
 @app.get("/contracts/{contract_id}")
-async def get_contract(contract_id: str, token: str):
+async def get_contract(contract_id: str, token: str, fields: str = None):
     """Lấy contract theo ID"""
-    return await ContractService.get_contract(contract_id, token)
+    return await ContractService.get_contract(contract_id, token, fields)
 
 
 @app.put("/contracts/{contract_id}")
@@ -501,16 +740,34 @@ async def create_achievement(data: CreateAchievementRequest, token: str):
     return await AchievementService.create_achievement(data, token)
 
 
+@app.post("/achievements/batch")
+async def create_achievements(data: List[CreateAchievementRequest], token: str):
+    """Tạo nhiều achievements trong 1 request"""
+    return await AchievementService.create_achievements(data, token)
+
+
+@app.put("/achievements/batch")
+async def update_achievements(data: List[BatchUpdateAchievementRequest], token: str):
+    """Cập nhật nhiều achievements trong 1 request"""
+    return await AchievementService.update_achievements(data, token)
+
+
+@app.delete("/achievements/batch")
+async def delete_achievements(data: BatchDeleteRequest, token: str):
+    """Xóa nhiều achievements trong 1 request"""
+    return await AchievementService.delete_achievements(data, token)
+
+
 @app.get("/achievements")
-async def get_achievements(token: str):
+async def get_achievements(token: str, limit: int = None, cursor: str = None, fields: str = None):
     """Lấy tất cả achievements của user"""
-    return await AchievementService.get_achievements(token)
+    return await AchievementService.get_achievements(token, limit, cursor, fields)
 
 
 @app.get("/achievements/{achievement_id}")
-async def get_achievement(achievement_id: str, token: str):
+async def get_achievement(achievement_id: str, token: str, fields: str = None):
     """Lấy achievement theo ID"""
-    return await AchievementService.get_achievement(achievement_id, token)
+    return await AchievementService.get_achievement(achievement_id, token, fields)
 
 
 @app.put("/achievements/{achievement_id}")
@@ -532,16 +789,34 @@ async def create_product(data: CreateProductRequest, token: str):
     return await ProductService.create_product(data, token)
 
 
+@app.post("/products/batch")
+async def create_products(data: List[CreateProductRequest], token: str):
+    """Tạo nhiều products trong 1 request"""
+    return await ProductService.create_products(data, token)
+
+
+@app.put("/products/batch")
+async def update_products(data: List[BatchUpdateProductRequest], token: str):
+    """Cập nhật nhiều products trong 1 request"""
+    return await ProductService.update_products(data, token)
+
+
+@app.delete("/products/batch")
+async def delete_products(data: BatchDeleteRequest, token: str):
+    """Xóa nhiều products trong 1 request"""
+    return await ProductService.delete_products(data, token)
+
+
 @app.get("/products")
-async def get_products(token: str):
+async def get_products(token: str, limit: int = None, cursor: str = None, fields: str = None):
     """Lấy tất cả products của user"""
-    return await ProductService.get_products(token)
+    return await ProductService.get_products(token, limit, cursor, fields)
 
 
 @app.get("/products/{product_id}")
-async def get_product(product_id: str, token: str):
+async def get_product(product_id: str, token: str, fields: str = None):
     """Lấy product theo ID"""
-    return await ProductService.get_product(product_id, token)
+    return await ProductService.get_product(product_id, token, fields)
 
 
 @app.put("/products/{product_id}")
@@ -563,16 +838,34 @@ async def create_product_image(data: CreateProductImageRequest, token: str):
     return await ProductImageService.create_product_image(data, token)
 
 
+@app.post("/product-images/batch")
+async def create_product_images(data: List[CreateProductImageRequest], token: str):
+    """Tạo nhiều product images trong 1 request"""
+    return await ProductImageService.create_product_images(data, token)
+
+
+@app.put("/product-images/batch")
+async def update_product_images(data: List[BatchUpdateProductImageRequest], token: str):
+    """Cập nhật nhiều product images trong 1 request"""
+    return await ProductImageService.update_product_images(data, token)
+
+
+@app.delete("/product-images/batch")
+async def delete_product_images(data: BatchDeleteRequest, token: str):
+    """Xóa nhiều product images trong 1 request"""
+    return await ProductImageService.delete_product_images(data, token)
+
+
 @app.get("/product-images")
-async def get_product_images(token: str, product_id: str = None):
-    """Lấy tất cả product images của user, hoặc của một product cụ thể"""
-    return await ProductImageService.get_product_images(token, product_id)
+async def get_product_images(token: str, product_id: str = None, limit: int = None, cursor: str = None, fields: str = None, img: str = None):
+    """Lấy tất cả product images của user, hoặc của một product cụ thể (img: thumb | card | full | srcset)"""
+    return with_delivery_urls(await ProductImageService.get_product_images(token, product_id, limit, cursor, fields), img)
 
 
 @app.get("/product-images/{image_id}")
-async def get_product_image(image_id: str, token: str):
+async def get_product_image(image_id: str, token: str, fields: str = None, img: str = None):
     """Lấy product image theo ID"""
-    return await ProductImageService.get_product_image(image_id, token)
+    return with_delivery_urls(await ProductImageService.get_product_image(image_id, token, fields), img)
 
 
 @app.put("/product-images/{image_id}")
@@ -594,16 +887,34 @@ async def create_skill(data: CreateSkillRequest, token: str):
     return await SkillService.create_skill(data, token)
 
 
+@app.post("/skills/batch")
+async def create_skills(data: List[CreateSkillRequest], token: str):
+    """Tạo nhiều skills trong 1 request"""
+    return await SkillService.create_skills(data, token)
+
+
+@app.put("/skills/batch")
+async def update_skills(data: List[BatchUpdateSkillRequest], token: str):
+    """Cập nhật nhiều skills trong 1 request"""
+    return await SkillService.update_skills(data, token)
+
+
+@app.delete("/skills/batch")
+async def delete_skills(data: BatchDeleteRequest, token: str):
+    """Xóa nhiều skills trong 1 request"""
+    return await SkillService.delete_skills(data, token)
+
+
 @app.get("/skills")
-async def get_skills(token: str):
+async def get_skills(token: str, limit: int = None, cursor: str = None, fields: str = None):
     """Lấy tất cả skills của user"""
-    return await SkillService.get_skills(token)
+    return await SkillService.get_skills(token, limit, cursor, fields)
 
 
 @app.get("/skills/{skill_id}")
-async def get_skill(skill_id: str, token: str):
+async def get_skill(skill_id: str, token: str, fields: str = None):
     """Lấy skill theo ID"""
-    return await SkillService.get_skill(skill_id, token)
+    return await SkillService.get_skill(skill_id, token, fields)
 
 
 @app.put("/skills/{skill_id}")
@@ -625,16 +936,34 @@ async def create_target(data: CreateTargetRequest, token: str):
     return await TargetService.create_target(data, token)
 
 
+@app.post("/targets/batch")
+async def create_targets(data: List[CreateTargetRequest], token: str):
+    """Tạo nhiều targets trong 1 request"""
+    return await TargetService.create_targets(data, token)
+
+
+@app.put("/targets/batch")
+async def update_targets(data: List[BatchUpdateTargetRequest], token: str):
+    """Cập nhật nhiều targets trong 1 request"""
+    return await TargetService.update_targets(data, token)
+
+
+@app.delete("/targets/batch")
+async def delete_targets(data: BatchDeleteRequest, token: str):
+    """Xóa nhiều targets trong 1 request"""
+    return await TargetService.delete_targets(data, token)
+
+
 @app.get("/targets")
-async def get_targets(token: str):
+async def get_targets(token: str, limit: int = None, cursor: str = None, fields: str = None):
     """Lấy tất cả targets của user"""
-    return await TargetService.get_targets(token)
+    return await TargetService.get_targets(token, limit, cursor, fields)
 
 
 @app.get("/targets/{target_id}")
-async def get_target(target_id: str, token: str):
+async def get_target(target_id: str, token: str, fields: str = None):
     """Lấy target theo ID"""
-    return await TargetService.get_target(target_id, token)
+    return await TargetService.get_target(target_id, token, fields)
 
 
 @app.put("/targets/{target_id}")
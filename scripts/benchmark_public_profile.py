@@ -0,0 +1,56 @@
+"""So sánh latency của /profile/public/all giữa 2 chế độ load dữ liệu
+
+- aggregate: 1 request tới PostgREST (embed các bảng con vào bảng duong)
+- sections: 1 request cho profile + 1 request cho mỗi section (chạy đồng thời)
+
+Chạy từ thư mục gốc (cần file .env với SUPABASE_URL và SUPABASE_SERVICE_ROLE_KEY):
+    python scripts/benchmark_public_profile.py --iterations 20
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from Connection import connection
+from Service.public_profile_service import PublicProfileService
+
+
+async def measure(loader, iterations: int):
+    latencies = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        await loader()
+        latencies.append((time.perf_counter() - start) * 1000)
+    latencies.sort()
+    return statistics.mean(latencies), statistics.median(latencies), latencies[-1]
+
+
+async def main(iterations: int):
+    connection.manager.start()
+    try:
+        modes = {
+            "aggregate": PublicProfileService.get_public_profile_aggregate,
+            "sections": PublicProfileService.get_public_profile_sections,
+        }
+        # Warm-up connection pool trước khi đo
+        for loader in modes.values():
+            await loader()
+
+        print(f"{'mode':>10} {'mean ms':>9} {'p50 ms':>9} {'max ms':>9}")
+        for mode, loader in modes.items():
+            mean, p50, worst = await measure(loader, iterations)
+            print(f"{mode:>10} {mean:>9.1f} {p50:>9.1f} {worst:>9.1f}")
+    finally:
+        await connection.manager.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark aggregate vs sections cho public profile")
+    parser.add_argument("--iterations", type=int, default=20)
+    args = parser.parse_args()
+
+    asyncio.run(main(args.iterations))
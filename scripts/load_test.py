@@ -0,0 +1,69 @@
+"""Load test đơn giản: đo throughput của một endpoint theo từng mức concurrency
+
+Nếu service layer không chặn event loop thì req/s phải tăng theo concurrency
+thay vì đứng yên ở mức 1 / latency của Supabase.
+
+Chạy (API đang chạy ở local):
+    python scripts/load_test.py --url http://127.0.0.1:8000/profile/public --requests 200 --concurrency 1,5,10,20
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+
+async def run_level(client: httpx.AsyncClient, url: str, total: int, concurrency: int):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    errors = 0
+
+    async def one_request():
+        nonlocal errors
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                response = await client.get(url)
+                if response.status_code >= 500:
+                    errors += 1
+            except httpx.HTTPError:
+                errors += 1
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one_request() for _ in range(total)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "concurrency": concurrency,
+        "rps": total / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p95_ms": latencies[int(len(latencies) * 0.95) - 1] * 1000,
+        "errors": errors,
+    }
+
+
+async def main(url: str, total: int, levels):
+    limits = httpx.Limits(max_connections=max(levels), max_keepalive_connections=max(levels))
+    async with httpx.AsyncClient(limits=limits, timeout=60) as client:
+        # Warm-up để không tính thời gian mở connection đầu tiên
+        await client.get(url)
+        print(f"{'concurrency':>11} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'errors':>7}")
+        for concurrency in levels:
+            result = await run_level(client, url, total, concurrency)
+            print(
+                f"{result['concurrency']:>11} {result['rps']:>9.1f} "
+                f"{result['p50_ms']:>9.1f} {result['p95_ms']:>9.1f} {result['errors']:>7}"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Đo throughput của API theo concurrency")
+    parser.add_argument("--url", default="http://127.0.0.1:8000/profile/public")
+    parser.add_argument("--requests", type=int, default=200, help="Số request cho mỗi mức concurrency")
+    parser.add_argument("--concurrency", default="1,5,10,20", help="Các mức concurrency, cách nhau bởi dấu phẩy")
+    args = parser.parse_args()
+
+    asyncio.run(main(args.url, args.requests, [int(c) for c in args.concurrency.split(",")]))
@@ -0,0 +1,44 @@
+"""Build lại snapshot /profile/public/all cho tất cả profile
+
+Chạy từ thư mục gốc:
+    python scripts/rebuild_snapshots.py          # rebuild tất cả
+    python scripts/rebuild_snapshots.py --check  # chỉ liệt kê snapshot bị thiếu/stale
+"""
+import argparse
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from Connection import connection
+from Service.snapshot_service import SnapshotService, SNAPSHOT_STORE, snapshot_store
+
+
+async def main(check_only: bool):
+    if snapshot_store is None:
+        print(f"Snapshot store is disabled (SNAPSHOT_STORE={SNAPSHOT_STORE})")
+        return 1
+    connection.manager.start()
+    try:
+        if check_only:
+            stale = await SnapshotService.find_stale()
+            for profile_id in stale:
+                print(f"stale: {profile_id}")
+            print(f"{len(stale)} stale snapshot(s)")
+            return 1 if stale else 0
+
+        results = await SnapshotService.rebuild_all()
+        for profile_id, ok in results.items():
+            print(f"{'rebuilt' if ok else 'skipped'}: {profile_id}")
+        return 0
+    finally:
+        await connection.manager.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild snapshot public profile")
+    parser.add_argument("--check", action="store_true", help="Chỉ kiểm tra snapshot stale, không rebuild")
+    args = parser.parse_args()
+
+    sys.exit(asyncio.run(main(args.check)))
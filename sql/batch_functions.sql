@@ -0,0 +1,50 @@
+-- Cập nhật nhiều dòng (mỗi dòng một giá trị khác nhau) của một bảng section trong 1 lần gọi RPC
+-- (1 round trip từ backend; bên trong hàm vẫn chạy 1 câu update cho mỗi dòng, trong cùng 1 transaction)
+-- (dùng bởi Service/batch_service.py, chạy trong Supabase SQL Editor)
+-- Nếu chưa tạo hàm này, service sẽ tự fallback sang nhiều câu update chạy đồng thời
+--
+-- p_rows: [{"id": ..., "<column>": <value>, ...}, ...], chỉ cập nhật dòng có profile_id = p_profile_id
+
+create or replace function update_owned_rows(
+    p_table text,
+    p_profile_id duong.id%type,
+    p_rows jsonb
+)
+returns setof jsonb
+language plpgsql
+as $$
+declare
+    v_row jsonb;
+    v_set text;
+    v_result jsonb;
+begin
+    if p_table not in ('images', 'educations', 'jobs', 'languages', 'contracts', 'achievements', 'products', 'skills', 'target') then
+        raise exception 'Table % is not allowed', p_table;
+    end if;
+
+    for v_row in select value from jsonb_array_elements(p_rows) loop
+        -- Chỉ set các cột có trong payload, giá trị được ép kiểu theo bảng bằng jsonb_populate_record
+        select string_agg(format('%I = (jsonb_populate_record(null::%I, $1)).%I', key, p_table, key), ', ')
+        into v_set
+        from jsonb_object_keys(v_row - 'id' - 'profile_id') as key;
+
+        if v_set is null then
+            continue;
+        end if;
+
+        execute format(
+            'update %I t set %s where t.id = (jsonb_populate_record(null::%I, $1)).id and t.profile_id = $2 returning to_jsonb(t.*)',
+            p_table, v_set, p_table
+        )
+        into v_result
+        using v_row, p_profile_id;
+
+        if v_result is not null then
+            return next v_result;
+        end if;
+    end loop;
+end;
+$$;
+
+-- Chỉ backend (service_role) được gọi hàm này
+revoke execute on function update_owned_rows from public, anon, authenticated;
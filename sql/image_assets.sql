@@ -0,0 +1,78 @@
+-- Index chống upload trùng: "<folder>:<hash nội dung ảnh>" -> asset đã lưu, kèm số dòng dữ liệu (images, productImages, duong) đang dùng URL
+-- (dùng bởi Service/asset_service.py khi ASSET_INDEX=table, chạy trong Supabase SQL Editor)
+
+create table if not exists image_assets (
+    hash text primary key,
+    url text not null unique,
+    data jsonb not null,
+    refcount integer not null default 0,
+    created_at timestamptz not null default now()
+);
+
+-- Không cho anon/authenticated đọc trực tiếp (backend dùng service_role nên bypass RLS)
+alter table image_assets enable row level security;
+
+-- Phiên bản trước tăng refcount theo số lần upload
+drop function if exists acquire_image_asset(text);
+drop function if exists release_image_asset(text);
+
+-- Tìm asset có cùng nội dung (không đổi refcount)
+create or replace function find_image_asset(p_hash text)
+returns setof image_assets
+language sql
+stable
+as $$
+    select * from image_assets where hash = p_hash;
+$$;
+
+-- Lưu asset vừa upload với refcount = 0 (request khác vừa lưu cùng nội dung thì bỏ qua)
+create or replace function register_image_asset(p_hash text, p_url text, p_data jsonb)
+returns setof image_assets
+language sql
+as $$
+    insert into image_assets (hash, url, data, refcount)
+    values (p_hash, p_url, p_data, 0)
+    on conflict do nothing
+    returning *;
+$$;
+
+-- Tăng refcount khi dòng dữ liệu được tạo / đổi sang URL (mỗi phần tử của p_urls là 1 dòng)
+create or replace function reference_image_assets(p_urls text[])
+returns void
+language sql
+as $$
+    update image_assets a
+    set refcount = a.refcount + c.total
+    from (select url, count(*)::integer as total from unnest(p_urls) as url group by url) c
+    where a.url = c.url;
+$$;
+
+-- Giảm refcount khi dòng dữ liệu bị xóa / đổi sang URL khác; refcount về 0 thì xóa asset khỏi index
+-- (trả về các asset bị xóa để backend xóa file trên storage; asset đang có refcount 0 không bị đụng tới)
+create or replace function release_image_assets(p_urls text[])
+returns setof image_assets
+language plpgsql
+as $$
+declare
+    v_url text;
+    v_asset image_assets;
+begin
+    foreach v_url in array p_urls loop
+        update image_assets
+        set refcount = refcount - 1
+        where url = v_url and refcount > 0
+        returning * into v_asset;
+
+        if found and v_asset.refcount = 0 then
+            delete from image_assets where hash = v_asset.hash and refcount = 0;
+            return next v_asset;
+        end if;
+    end loop;
+end;
+$$;
+
+-- Chỉ backend (service_role) được gọi các hàm này
+revoke execute on function find_image_asset from public, anon, authenticated;
+revoke execute on function register_image_asset from public, anon, authenticated;
+revoke execute on function reference_image_assets from public, anon, authenticated;
+revoke execute on function release_image_assets from public, anon, authenticated;
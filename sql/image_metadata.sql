@@ -0,0 +1,18 @@
+-- Kích thước và placeholder (màu chủ đạo, BlurHash) của ảnh, tính 1 lần lúc upload
+-- (chạy trong Supabase SQL Editor trước khi deploy, sau đó chạy lại sql/product_image_functions.sql)
+
+alter table images
+    add column if not exists width integer,
+    add column if not exists height integer,
+    add column if not exists dominant_color text,
+    add column if not exists blurhash text;
+
+alter table "productImages"
+    add column if not exists width integer,
+    add column if not exists height integer,
+    add column if not exists dominant_color text,
+    add column if not exists blurhash text;
+
+-- Xóa phiên bản cũ (ít tham số hơn) của các hàm trong sql/product_image_functions.sql
+drop function if exists create_owned_product_image(products.profile_id%type, products.id%type, text, text);
+drop function if exists update_owned_product_image(products.profile_id%type, "productImages".id%type, text, text);
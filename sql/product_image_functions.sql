@@ -0,0 +1,61 @@
+-- Các hàm kiểm tra quyền sở hữu product image và ghi dữ liệu trong 1 câu lệnh
+-- (dùng bởi Service/product_image_service.py, chạy trong Supabase SQL Editor)
+-- Nếu chưa tạo các hàm này, service sẽ tự fallback sang 2 request (join + ghi theo id)
+
+create or replace function create_owned_product_image(
+    p_profile_id products.profile_id%type,
+    p_product_id products.id%type,
+    p_image_url text,
+    p_description text default null,
+    p_width integer default null,
+    p_height integer default null,
+    p_dominant_color text default null,
+    p_blurhash text default null
+)
+returns setof "productImages"
+language sql
+as $$
+    insert into "productImages" (product_id, image_url, description, width, height, dominant_color, blurhash)
+    select p.id, p_image_url, p_description, p_width, p_height, p_dominant_color, p_blurhash
+    from products p
+    where p.id = p_product_id and p.profile_id = p_profile_id
+    returning *;
+$$;
+
+create or replace function update_owned_product_image(
+    p_profile_id products.profile_id%type,
+    p_image_id "productImages".id%type,
+    p_image_url text default null,
+    p_description text default null,
+    p_width integer default null,
+    p_height integer default null,
+    p_dominant_color text default null,
+    p_blurhash text default null
+)
+returns setof "productImages"
+language sql
+as $$
+    update "productImages" pi
+    set image_url = coalesce(p_image_url, pi.image_url),
+        description = coalesce(p_description, pi.description),
+        width = coalesce(p_width, pi.width),
+        height = coalesce(p_height, pi.height),
+        dominant_color = coalesce(p_dominant_color, pi.dominant_color),
+        blurhash = coalesce(p_blurhash, pi.blurhash)
+    from products p
+    where pi.id = p_image_id and p.id = pi.product_id and p.profile_id = p_profile_id
+    returning pi.*;
+$$;
+
+create or replace function delete_owned_product_image(
+    p_profile_id products.profile_id%type,
+    p_image_id "productImages".id%type
+)
+returns setof "productImages"
+language sql
+as $$
+    delete from "productImages" pi
+    using products p
+    where pi.id = p_image_id and p.id = pi.product_id and p.profile_id = p_profile_id
+    returning pi.*;
+$$;
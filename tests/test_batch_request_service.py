@@ -0,0 +1,50 @@
+import asyncio
+import httpx
+import pytest
+from fastapi import FastAPI, HTTPException, Request
+from Entity.batch import BatchRequest, SubRequest
+from Service.batch_request_service import BatchRequestService, _sub_request_url
+
+
+def _batch_app() -> FastAPI:
+    app = FastAPI()
+
+    @app.post("/batch")
+    async def batch(data: BatchRequest, request: Request):
+        return await BatchRequestService.execute(app, data, request.headers)
+
+    @app.get("/ping")
+    async def ping():
+        return {"status": "success"}
+
+    return app
+
+
+async def _post_batch(app: FastAPI, payload: dict) -> httpx.Response:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        return await client.post("/batch", json=payload)
+
+
+@pytest.mark.parametrize("path", ["/batch", "/batch/", "/%62atch", "/%62%61%74%63%68/", "/batch?token=x"])
+def test_nested_batch_path_is_rejected(path):
+    with pytest.raises(HTTPException) as error:
+        _sub_request_url(SubRequest(method="POST", path=path))
+    assert error.value.status_code == 400
+
+
+def test_sub_request_url_appends_token():
+    assert _sub_request_url(SubRequest(path="/jobs?limit=10"), "abc") == "/jobs?limit=10&token=abc"
+
+
+def test_nested_batch_is_rejected_when_path_check_is_bypassed():
+    # Path không khớp "/batch" khi kiểm tra nhưng vẫn được route tới /batch: bị chặn nhờ header của sub-request
+    app = _batch_app()
+    response = asyncio.run(_post_batch(app, {"requests": [
+        {"method": "POST", "path": "/./batch", "body": {"requests": [{"path": "/ping"}]}},
+        {"path": "/ping"},
+    ]}))
+    assert response.status_code == 200
+    nested, ping = response.json()["results"]
+    assert nested["status"] == 400
+    assert ping["status"] == 200